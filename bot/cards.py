@@ -0,0 +1,172 @@
+"""Order card texts shared by the admin bot handlers and the new-order monitor.
+
+Two views:
+- "summary": compact card used in new-order alerts and opened from lists
+- "detail": expanded card with contacts, delivery and items
+
+Rendered texts are memoized in a bounded LRU keyed by (order id, updated_at,
+view), so every write that changes what a card shows must bump updated_at;
+all order writes in data/operations.py do, and so must the client bot's
+(payment checks included). The summary view only needs the fields of the
+"card" projection, the detail view needs the full order.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from data.models import Order
+from utils.helpers import format_uzbekistan_datetime
+
+RENDER_CACHE_SIZE = 512
+
+
+class RenderCache:
+    """Plain LRU of rendered card texts"""
+
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+        self.misses += 1
+        text = render()
+        self._entries[key] = text
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+render_cache = RenderCache()
+
+
+def customer_name(order: Order) -> Optional[str]:
+    """Customer name from any of the contact formats (None if unknown)"""
+    if order.customer_name:
+        # Latest format: customer_* fields
+        return order.customer_name
+    if order.name:
+        # New format: separate fields
+        return order.name
+    if order.contact:
+        # Old format: "Name, Phone, Address"
+        return order.contact.split(',')[0].strip() or None
+    return None
+
+
+def customer_contacts(order: Order) -> Tuple[Optional[str], Optional[str]]:
+    """(phone, address) from any of the contact formats"""
+    if order.customer_phone or order.customer_address:
+        return order.customer_phone, order.customer_address
+    if order.phone or order.address:
+        return order.phone, order.address
+    if order.contact and ',' in order.contact:
+        parts = [part.strip() for part in order.contact.split(',')]
+        return (parts[1] or None), (parts[2] if len(parts) >= 3 and parts[2] else None)
+    return None, None
+
+
+def is_card_payment(order: Order) -> bool:
+    method = order.method.lower()
+    return "карт" in method or "card" in method
+
+
+def _render_summary(order: Order) -> str:
+    lines = []
+
+    # Add payment verification warning for card payments
+    if order.requires_payment_check:
+        lines.append("⚠️ ТРЕБУЕТ ПРОВЕРКИ ОПЛАТЫ")
+
+    lines.append(f"🆔 {order.id}")
+    lines.append(f"👤 {customer_name(order) or '—'}")
+
+    # Determine payment method clearly
+    if is_card_payment(order):
+        payment_method = "💳 Оплата картой"
+        if order.payment_verified:
+            payment_method += " ✅"
+        elif order.requires_payment_check:
+            payment_method += " ⏳"
+    else:
+        payment_method = "💵 Наличные"
+
+    lines.append(f"💰 {order.total:,} сум")
+    lines.append(f"💳 {payment_method}")
+
+    # Show claimed payment amount if card payment
+    if order.requires_payment_check and order.payment_amount:
+        lines.append(f"⚠️ Клиент указал: {order.payment_amount:,} сум")
+
+    lines.append(f"📦 {len(order.items)} позиций")
+    lines.append(f"📅 {format_uzbekistan_datetime(order.created_at)}")
+
+    return "\n".join(lines)
+
+
+def _render_detail(order: Order) -> str:
+    # Name at the top (most important info)
+    lines = [f"👤 {customer_name(order) or 'Имя не указано'}"]
+
+    lines.append(f"🆔 {order.id}")
+    lines.append(f"💰 {order.total:,} сум")
+
+    # Payment verification status (if card payment)
+    if is_card_payment(order):
+        if order.payment_verified:
+            lines.append("💳 ✅ Оплата подтверждена")
+        else:
+            lines.append("💳 ⏳ Требует проверки оплаты")
+            if order.requires_payment_check and order.payment_amount:
+                lines.append(f"⚠️ Клиент указал: {order.payment_amount:,} сум")
+
+    phone, address = customer_contacts(order)
+    if phone:
+        lines.append(f"📞 {phone}")
+    if address:
+        lines.append(f"📍 {address}")
+
+    # Delivery info (clean up duplicate emojis)
+    delivery_text = order.delivery.replace("🚚", "").strip()
+    lines.append(f"🚚 {delivery_text}")
+    lines.append(f"⏰ {order.time}")
+
+    # Payment method (clean up duplicate emojis)
+    method_text = order.method.replace("💳", "").replace("💰", "").strip()
+    lines.append(f"💳 {method_text}")
+
+    lines.append("\n📦 Заказ:")
+    for key, qty in order.items.items():
+        lines.append(f"• {key}: {qty} шт")
+
+    # Clean summary (remove HTML tags) - only if it contains useful info beyond the order items
+    if order.summary:
+        clean_summary = order.summary.replace('<b>', '').replace('</b>', '').replace('<br>', '\n')
+        if not any(key in clean_summary.lower() for key in order.items.keys()):
+            lines.append(f"\n📄 {clean_summary}")
+
+    return "\n".join(lines)
+
+
+VIEWS: Dict[str, Callable[[Order], str]] = {
+    "summary": _render_summary,
+    "detail": _render_detail,
+}
+
+def render_order(order: Order, view: str = "summary") -> str:
+    """Card text for an order in the given view, from the render cache when possible"""
+    render = VIEWS[view]
+    if order.id is None:
+        return render(order)
+    return render_cache.get_or_render((order.id, order.updated_at, view), lambda: render(order))
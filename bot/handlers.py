@@ -1,37 +1,59 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
 from aiogram import types, Router
 from aiogram.filters import Command
-from data.config import ADMIN_IDS, WORK_HOURS
+from data.config import ADMIN_IDS, ORDERS_PAGE_SIZE, WORK_HOURS
 from data.operations import (
-    is_admin,
-    get_new_orders,
-    get_active_orders,
+    ACTIVE_STATUSES,
+    count_orders,
+    get_orders_page,
     get_inventory,
-    get_inventory_keys,
     get_admins,
-    get_availability_dict,
+    get_catalog,
     set_availability_item,
     get_order,
     update_order_status,
-    inventory_key_exists,
+    bulk_update_order_status,
+    update_order_message_ids,
+    BulkStatusResult,
     create_client_notification,
     analytics_summary,
     analytics_earnings,
+    analytics_cache,
+    CatalogSnapshot,
 )
 from aiogram import Bot
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from data.models import OrderStatus
-from utils.helpers import format_uzbekistan_datetime
+from data.query_log import query_log
+from bot.cards import customer_name, render_order
+from bot.orders import get_demand_chart
+from utils.export import EXPORT_FORMATS, export_filename, export_orders
+from utils.helpers import format_uzbekistan_datetime, local_day_start_utc, parse_local_date
+from utils.metrics import (
+    handler_errors,
+    handler_latency,
+    monitor_backlog,
+    monitor_event_lag,
+    monitor_tick_latency,
+    operation_errors,
+    operation_latency,
+    summarize,
+    telegram_errors,
+    telegram_latency,
+)
+from utils.sender import OutboundSender
 
 router = Router()
 
 # 1. Authentication & Main Menu
 @router.message(Command("start"))
 async def cmd_start(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-    
     await message.answer(
         f"👋 Привет, {message.from_user.full_name}! Вы вошли как администратор.\n\n"
         "Используйте команды из меню или введите /help для справки."
@@ -41,16 +63,13 @@ async def cmd_start(message: types.Message):
 @router.message(Command("menu"))
 async def cmd_menu(message: types.Message):
     """Show main admin menu"""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-    
     menu_text = """🔧 **Главное меню администратора:**
 
 **📋 Заказы:**
 /new_orders — Новые заказы
 /all_orders — Все активные заказы
 /order_<ID> — Детали заказа
+/bulk_status — Сменить статус нескольких заказов
 
 **📦 Инвентарь:**
 /inventory — Управление доступностью
@@ -61,9 +80,13 @@ async def cmd_menu(message: types.Message):
 /weekly_report — Недельный отчёт
 /stats_orders [today|week|month] — Сводка заказов
 /earnings [today|week|month] — Выручка
+/demand_chart [today|yesterday|week|month|С..ПО] — График спроса
+/export <с> <по> [csv|parquet] — Выгрузка заказов
 
 **⚙️ Настройки:**
 /config — Текущие настройки
+/metrics — Метрики производительности
+/slow_queries — Медленные запросы к БД
 /broadcast — Рассылка администраторам
 
 **❓ Справка:**
@@ -72,55 +95,6 @@ async def cmd_menu(message: types.Message):
     await message.answer(menu_text, parse_mode="Markdown")
 
 # 2. Order Management
-def _format_order_summary(order) -> str:
-    # Handle all possible contact formats
-    if order.customer_name:
-        # Latest format: customer_* fields
-        name = order.customer_name
-    elif order.name:
-        # New format: separate name, phone, address
-        name = order.name
-    elif order.contact:
-        # Old format: "Name, Phone, Address"
-        parts = order.contact.split(',')
-        name = parts[0].strip() if parts else "—"
-    else:
-        name = "—"
-    
-    # Build summary lines
-    lines = []
-    
-    # Add payment verification warning for card payments
-    if order.requires_payment_check:
-        lines.append("⚠️ ТРЕБУЕТ ПРОВЕРКИ ОПЛАТЫ")
-    
-    lines.append(f"🆔 {order.id}")
-    lines.append(f"👤 {name}")
-    
-    # Determine payment method clearly
-    payment_method = ""
-    if "карт" in order.method.lower() or "card" in order.method.lower():
-        payment_method = "💳 Оплата картой"
-        if order.payment_verified:
-            payment_method += " ✅"
-        elif order.requires_payment_check:
-            payment_method += " ⏳"
-    else:
-        payment_method = "💵 Наличные"
-    
-    lines.append(f"💰 {order.total:,} сум")
-    lines.append(f"💳 {payment_method}")
-    
-    # Show claimed payment amount if card payment
-    if order.requires_payment_check and order.payment_amount:
-        lines.append(f"⚠️ Клиент указал: {order.payment_amount:,} сум")
-    
-    lines.append(f"📦 {len(order.items)} позиций")
-    lines.append(f"📅 {format_uzbekistan_datetime(order.created_at)}")
-    
-    return "\n".join(lines)
-
-
 def _build_order_actions_kb(order, expanded: bool = False) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     # Collapsed: only show "Open" and "Cancel" buttons
@@ -229,135 +203,252 @@ def _build_hide_confirmation_kb(order_id: str) -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
-@router.message(Command("new_orders"))
-async def cmd_new_orders(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-    
-    orders = await get_new_orders()
+# Paginated order lists: one message per list, pages are edits of it.
+# Callback data: ol:<list>:f (first page) | ol:<list>:n:<key> (older) |
+# ol:<list>:p:<key> (newer) | ol:o:<order id> (open); <key> is
+# <created_at ms, base 36>.<order id>, which keeps it under Telegram's 64 bytes.
+# Multi-select: ol:<list>:s (enter) | ol:t:<order id> (toggle) |
+# ol:b:<status> (confirm) | ol:B:<status> (apply) | ol:r:- (back) | ol:x:<list> (leave)
+ORDER_LISTS = {
+    "n": {
+        "statuses": [OrderStatus.NEW],
+        "title": "📋 Новые заказы",
+        "empty": "📭 Новых заказов нет.",
+    },
+    "a": {
+        "statuses": ACTIVE_STATUSES,
+        "title": "📋 Все активные заказы",
+        "empty": "✅ Все заказы завершены или скрыты!",
+    },
+}
+
+STATUS_ICONS = {
+    OrderStatus.NEW: "🆕",
+    OrderStatus.ACCEPTED: "✅",
+    OrderStatus.IN_PROGRESS: "▶️",
+    OrderStatus.READY: "🍽",
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Order lists in multi-select mode, keyed by (chat id, message id):
+# {"list": key, "after": page key, "before": page key, "selected": {order id}}
+_selections: Dict[tuple, dict] = {}
+# Oldest selections are dropped beyond this many open lists
+SELECTION_LIMIT = 100
+
+def _encode_page_key(order) -> str:
+    ms = (order.created_at - _EPOCH) // timedelta(milliseconds=1)
+    return f"{_to_base36(ms)}.{order.id}"
+
+def _decode_page_key(raw: str):
+    ms, _, order_id = raw.partition(".")
+    return _EPOCH + timedelta(milliseconds=int(ms, 36)), order_id
+
+def _to_base36(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        value, rem = divmod(value, 36)
+        out = digits[rem] + out
+        if not value:
+            return out
+
+async def _render_orders_page(list_key: str, after=None, before=None, selected: Optional[Set[str]] = None):
+    """Text and keyboard for one page of an order list (None if the list is empty).
+
+    With `selected` the page is in multi-select mode: order buttons toggle
+    selection and the bulk status actions are shown.
+    """
+    spec = ORDER_LISTS[list_key]
+    orders, has_more = await get_orders_page(spec["statuses"], after=after, before=before, limit=ORDERS_PAGE_SIZE)
+    if not orders and (after or before):
+        # The page emptied (orders moved on); start over from the newest
+        return await _render_orders_page(list_key, selected=selected)
     if not orders:
-        await message.answer("📭 Новых заказов нет.")
+        return None
+
+    total = await count_orders(spec["statuses"])
+    offset = 0 if after is None and before is None else await count_orders(
+        spec["statuses"], newer_than=(orders[0].created_at, orders[0].id)
+    )
+    has_newer = offset > 0
+    has_older = has_more if before is None else offset + len(orders) < total
+
+    lines = [f"{spec['title']}: {total}", f"Показаны {offset + 1}–{offset + len(orders)}", ""]
+    kb = InlineKeyboardBuilder()
+    for number, order in enumerate(orders, start=offset + 1):
+        name = customer_name(order) or "—"
+        check = "⚠️ " if order.requires_payment_check and not order.payment_verified else ""
+        lines.append(
+            f"{number}. {STATUS_ICONS.get(order.status, '')} {check}{name} · {order.total:,} сум · "
+            f"{format_uzbekistan_datetime(order.created_at)}"
+        )
+        if selected is None:
+            kb.row(InlineKeyboardButton(text=f"👁 {number}. {name[:24]}", callback_data=f"ol:o:{order.id}"))
+        else:
+            mark = "☑️" if order.id in selected else "⬜️"
+            kb.row(InlineKeyboardButton(text=f"{mark} {number}. {name[:24]}", callback_data=f"ol:t:{order.id}"))
+    if any(o.requires_payment_check and not o.payment_verified for o in orders):
+        lines.append("\n⚠️ — оплата картой, требует проверки")
+    if selected is not None:
+        lines.append(f"\n☑️ Выбрано: {len(selected)}. Отметьте заказы и выберите новый статус.")
+
+    nav = []
+    if has_newer:
+        nav.append(InlineKeyboardButton(text="◀️ Новее",
+                                        callback_data=f"ol:{list_key}:p:{_encode_page_key(orders[0])}"))
+    nav.append(InlineKeyboardButton(text="🔄", callback_data=f"ol:{list_key}:f"))
+    if has_older:
+        nav.append(InlineKeyboardButton(text="Старше ▶️",
+                                        callback_data=f"ol:{list_key}:n:{_encode_page_key(orders[-1])}"))
+    kb.row(*nav)
+    if selected is None:
+        kb.row(InlineKeyboardButton(text="☑️ Выбрать несколько", callback_data=f"ol:{list_key}:s"))
+    else:
+        if selected:
+            actions = [InlineKeyboardButton(text=text, callback_data=f"ol:b:{status}")
+                       for status, text in BULK_STATUS_BUTTONS.items()]
+            kb.row(*actions[:3])
+            kb.row(*actions[3:])
+        kb.row(InlineKeyboardButton(text="✖️ Отменить выбор", callback_data=f"ol:x:{list_key}"))
+    return "\n".join(lines), kb.as_markup()
+
+async def _edit_orders_page(callback: CallbackQuery, list_key: str, after=None, before=None,
+                            selected: Optional[Set[str]] = None):
+    page = await _render_orders_page(list_key, after=after, before=before, selected=selected)
+    if page is None:
+        await callback.message.edit_text(ORDER_LISTS[list_key]["empty"])
         return
-    
-    # Separate card payment orders requiring verification
-    card_payment_orders = [o for o in orders if o.requires_payment_check]
-    regular_orders = [o for o in orders if not o.requires_payment_check]
-    
-    # Show card payment orders first (priority)
-    if card_payment_orders:
-        await message.answer("⚠️ Заказы с оплатой картой (требуют проверки):")
-        for order in card_payment_orders:
-            await message.answer(_format_order_summary(order), reply_markup=_build_order_actions_kb(order, expanded=False))
-    
-    # Then show regular orders
-    if regular_orders:
-        await message.answer("📋 Обычные заказы:")
-        for order in regular_orders:
-            await message.answer(_format_order_summary(order), reply_markup=_build_order_actions_kb(order, expanded=False))
+    text, markup = page
+    try:
+        await callback.message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        # Refresh with nothing changed
+        if "message is not modified" not in str(e):
+            raise
+
+def _selection_key(callback: CallbackQuery) -> tuple:
+    return callback.message.chat.id, callback.message.message_id
+
+def _start_selection(callback: CallbackQuery, list_key: str) -> dict:
+    while len(_selections) >= SELECTION_LIMIT:
+        _selections.pop(next(iter(_selections)))
+    state = _selections[_selection_key(callback)] = {
+        "list": list_key, "after": None, "before": None, "selected": set(),
+    }
+    return state
+
+async def _send_orders_list(message: types.Message, list_key: str):
+    page = await _render_orders_page(list_key)
+    if page is None:
+        await message.answer(ORDER_LISTS[list_key]["empty"])
+        return
+    text, markup = page
+    await message.answer(text, reply_markup=markup)
+
+@router.message(Command("new_orders"))
+async def cmd_new_orders(message: types.Message):
+    """Show new orders, one page per message (card payments marked ⚠️)"""
+    await _send_orders_list(message, "n")
 
 @router.message(Command("all_orders"))
 async def cmd_all_orders(message: types.Message):
-    """Show all active orders (not completed, cancelled, or hidden)"""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
+    """Show all active orders (not completed, cancelled, or hidden), one page per message"""
+    await _send_orders_list(message, "a")
+
+@router.callback_query(lambda c: c.data and c.data.startswith("ol:"))
+async def cb_orders_list(callback: CallbackQuery, client_sender: Optional[OutboundSender] = None):
+    parts = callback.data.split(":", 3)
+    if len(parts) < 3:
+        await callback.answer("Ошибка данных", show_alert=True)
         return
-    
-    orders = await get_active_orders()
-    if not orders:
-        await message.answer("✅ Все заказы завершены или скрыты!")
+
+    if parts[1] == "o":
+        # Open an order from the list as its own card, like a new-order alert
+        order = await get_order(parts[2])
+        if not order:
+            await callback.answer("Не найдено", show_alert=True)
+            return
+        await callback.message.answer(render_order(order), reply_markup=_build_order_actions_kb(order, expanded=False))
+        await callback.answer()
+        return
+
+    if parts[1] in ("t", "b", "B", "r"):
+        await _selection_action(callback, parts[1], parts[2], client_sender)
+        return
+    if parts[1] == "x":
+        _selections.pop(_selection_key(callback), None)
+        if parts[2] in ORDER_LISTS:
+            await _edit_orders_page(callback, parts[2])
+        await callback.answer()
         return
-    
-    # Group orders by status
-    status_groups = {
-        OrderStatus.NEW: [],
-        OrderStatus.ACCEPTED: [],
-        OrderStatus.IN_PROGRESS: [],
-        OrderStatus.READY: []
-    }
-    
-    for order in orders:
-        if order.status in status_groups:
-            status_groups[order.status].append(order)
-    
-    # Status display names and emojis
-    status_display = {
-        OrderStatus.NEW: "🆕 Новые заказы",
-        OrderStatus.ACCEPTED: "✅ Принятые заказы",
-        OrderStatus.IN_PROGRESS: "▶️ В работе",
-        OrderStatus.READY: "🍽 Готовые к выдаче"
-    }
-    
-    # Show header with count
-    total_count = len(orders)
-    await message.answer(
-        f"📋 Все активные заказы: {total_count}\n\n"
-        f"💡 Заказы, которые ещё в работе или не завершены"
-    )
-    
-    # Display orders grouped by status
-    for status in [OrderStatus.NEW, OrderStatus.ACCEPTED, OrderStatus.IN_PROGRESS, OrderStatus.READY]:
-        orders_in_status = status_groups[status]
-        if orders_in_status:
-            await message.answer(f"\n{status_display[status]} ({len(orders_in_status)}):")
-            for order in orders_in_status:
-                await message.answer(_format_order_summary(order), reply_markup=_build_order_actions_kb(order, expanded=False))
+
+    list_key, move = parts[1], parts[2]
+    if list_key not in ORDER_LISTS or move not in ("f", "n", "p", "s") or (move in ("n", "p") and len(parts) != 4):
+        await callback.answer("Ошибка данных", show_alert=True)
+        return
+    state = _start_selection(callback, list_key) if move == "s" else _selections.get(_selection_key(callback))
+    key = _decode_page_key(parts[3]) if move in ("n", "p") else None
+    after, before = (key if move == "n" else None), (key if move == "p" else None)
+    if state is not None:
+        state.update(after=after, before=before)
+    await _edit_orders_page(callback, list_key, after, before, state["selected"] if state else None)
+    await callback.answer()
+
+async def _selection_action(callback: CallbackQuery, action: str, arg: str, client_sender: Optional[OutboundSender]):
+    """Toggle, confirm, apply or go back in an order list's multi-select mode"""
+    state = _selections.get(_selection_key(callback))
+    if state is None:
+        await callback.answer("Выбор устарел, откройте список заново", show_alert=True)
+        return
+    selected = state["selected"]
+    if action == "t":
+        selected.symmetric_difference_update({arg})
+    if action in ("t", "r"):
+        await _edit_orders_page(callback, state["list"], state["after"], state["before"], selected)
+        await callback.answer()
+        return
+
+    if arg not in BULK_STATUS_BUTTONS or not selected:
+        await callback.answer("Ничего не выбрано" if not selected else "Некорректный статус", show_alert=True)
+        return
+    status = OrderStatus(arg)
+    if action == "b":
+        kb = InlineKeyboardBuilder()
+        kb.row(
+            InlineKeyboardButton(text="✅ Да", callback_data=f"ol:B:{arg}"),
+            InlineKeyboardButton(text="◀️ Назад", callback_data="ol:r:-"),
+        )
+        await callback.message.edit_text(
+            f"⚠️ Подтверждение действия\n\n"
+            f"Перевести выбранные заказы ({len(selected)}) в статус «{BULK_STATUS_NAMES[arg]}»?\n"
+            f"Клиенты получат уведомления.",
+            reply_markup=kb.as_markup()
+        )
+        await callback.answer()
+        return
+
+    _selections.pop(_selection_key(callback), None)
+    await callback.answer("⏳ Обновляю статусы…")
+    report = await _apply_bulk_status(list(selected), status, client_sender)
+    await callback.message.edit_text(report)
 
 @router.message(lambda m: m.text and m.text.startswith("/order_"))
 async def cmd_order_detail(message: types.Message):
     """Show full order details by ID."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
     order_id = message.text.split("/order_")[-1].strip()
     order = await get_order(order_id)
     if not order:
         await message.answer("Заказ не найден.")
         return
-    # Build detailed view
-    lines = ["📦 Детали заказа:"]
-    lines.append(_format_order_summary(order))
-    
-    # Contact details
-    if order.customer_phone:
-        lines.append(f"📞 {order.customer_phone}")
-    elif order.phone:
-        lines.append(f"📞 {order.phone}")
-    
-    if order.customer_address:
-        lines.append(f"📍 {order.customer_address}")
-    elif order.address:
-        lines.append(f"📍 {order.address}")
-    
-    lines.append(f"🚚 {order.delivery}")
-    lines.append(f"⏰ {order.time}")
-    lines.append(f"💳 {order.method}")
-    
-    # Payment verification warning
-    if order.requires_payment_check:
-        lines.append("\n⚠️ ТРЕБУЕТ ПРОВЕРКИ ОПЛАТЫ")
-        if order.payment_amount:
-            lines.append(f"Клиент указал сумму: {order.payment_amount:,} сум")
-        if order.payment_verified:
-            lines.append("✅ Клиент отправил подтверждение оплаты")
-        lines.append("⏰ Проверьте оплату в течение 10 минут")
-    
-    lines.append("\n📦 Состав:")
-    for key, qty in order.items.items():
-        lines.append(f" • {key}: {qty} шт")
-    
-    if order.summary:
-        lines.append("\nПримечание:")
-        lines.append(order.summary)
-
-    await message.answer("\n".join(lines), reply_markup=_build_order_actions_kb(order, expanded=True))
+    await message.answer(
+        "📦 Детали заказа:\n\n" + render_order(order, "detail"),
+        reply_markup=_build_order_actions_kb(order, expanded=True)
+    )
 
-async def _notify_client_status(order, new_status: OrderStatus):
-    """Send status update directly to client and edit existing message if possible."""
-    from data.operations import update_order_message_id
-    from aiogram import Bot
-    from data.config import CLIENT_BOT_TOKEN
-    
+def _client_status_text(order, new_status: OrderStatus) -> str:
+    """Status update message for the client who placed `order`"""
     status_texts = {
         OrderStatus.ACCEPTED: "✅ Ваш заказ принят",
         OrderStatus.IN_PROGRESS: "👨‍🍳 Ваш заказ готовится", 
@@ -388,13 +479,21 @@ async def _notify_client_status(order, new_status: OrderStatus):
         message += f"\n🚚 {order.delivery}"
         if order.time:
             message += f"\n⏰ {order.time}"
-    
-    # Create bot instance for sending messages to clients
-    if not CLIENT_BOT_TOKEN:
+    return message
+
+async def _notify_client_status(order, new_status: OrderStatus, client_bot: Optional[Bot]):
+    """Send status update directly to client and edit existing message if possible.
+
+    `client_bot` is the long-lived client bot created in bot/main.py; its pooled
+    HTTP session keeps the connection to api.telegram.org alive between clicks.
+    """
+    from data.operations import update_order_message_id
+
+    message = _client_status_text(order, new_status)
+    if client_bot is None:
         print("❌ CLIENT_BOT_TOKEN not configured")
         return
-    
-    bot = Bot(token=CLIENT_BOT_TOKEN)
+    bot = client_bot
     
     try:
         if order.client_message_id:
@@ -424,16 +523,11 @@ async def _notify_client_status(order, new_status: OrderStatus):
             print(f"📤 Sent new message for user {order.user_id}, order {order.id}")
     except Exception as e:
         print(f"❌ Failed to send message to user {order.user_id}: {e}")
-    finally:
-        await bot.session.close()
 
 
 @router.message(lambda m: m.text and m.text.startswith("/set_status_"))
-async def cmd_set_status(message: types.Message):
+async def cmd_set_status(message: types.Message, client_bot: Optional[Bot] = None):
     """Change order status by command: /set_status_<ID>_<status>."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
     try:
         _, rest = message.text.split("/set_status_", 1)
         order_id, status_text = rest.split("_", 1)
@@ -448,20 +542,122 @@ async def cmd_set_status(message: types.Message):
     ok = await update_order_status(order_id, new_status)
     if ok:
         order = await get_order(order_id)
-        await _notify_client_status(order, new_status)
+        await _notify_client_status(order, new_status, client_bot)
         await message.answer("Статус обновлён.")
     else:
         await message.answer("Не удалось обновить статус. Проверьте ID и попробуйте ещё раз.")
 
+# Bulk status changes: /bulk_status and multi-select on the order lists
+BULK_STATUS_NAMES = {
+    "accepted": "принят",
+    "in_progress": "в работе",
+    "ready": "готов",
+    "completed": "завершён",
+    "cancelled": "отменён",
+}
+BULK_STATUS_BUTTONS = {
+    "accepted": "✅ Принять",
+    "in_progress": "▶️ В работу",
+    "ready": "🍽 Готов",
+    "completed": "🏁 Завершить",
+    "cancelled": "❌ Отменить",
+}
+BULK_SKIP_REASONS = {
+    "invalid_id": "неверный ID",
+    "not_found": "не найден",
+    "same_status": "уже в этом статусе",
+    "closed": "уже закрыт",
+    "wrong_status": "в другом статусе",
+    "conflict": "статус изменили одновременно с вами",
+}
+BULK_STATUS_USAGE = (
+    "Использование:\n"
+    "/bulk_status <из> <в> — все заказы в статусе <из>, например /bulk_status ready completed\n"
+    "/bulk_status <в> <ID> [<ID> ...] — перечисленные заказы\n"
+    "Статусы: " + ", ".join(BULK_STATUS_NAMES)
+)
+
+async def _notify_clients_status(orders: List, new_status: OrderStatus,
+                                 client_sender: Optional[OutboundSender]) -> int:
+    """Send status updates to many clients concurrently; returns how many were delivered.
+
+    Every message goes through the client bot's OutboundSender, so Telegram's
+    global and per-chat limits hold however many orders changed; new client
+    message IDs are stored in one bulk_write.
+    """
+    if client_sender is None:
+        print("❌ CLIENT_BOT_TOKEN not configured")
+        return 0
+    bot = client_sender.bot
+
+    async def deliver(order) -> Optional[int]:
+        text = _client_status_text(order, new_status)
+        if order.client_message_id:
+            try:
+                await bot.edit_message_text(chat_id=order.user_id, message_id=order.client_message_id, text=text)
+                return None
+            except TelegramBadRequest as e:
+                # Deleted or too old to edit; send a new message instead
+                print(f"❌ Failed to edit message: {e}")
+        sent = await bot.send_message(chat_id=order.user_id, text=text)
+        return sent.message_id
+
+    results = await asyncio.gather(*(
+        client_sender.call(order.user_id, lambda order=order: deliver(order)) for order in orders
+    ))
+    for order, result in zip(orders, results):
+        if not result.ok:
+            print(f"❌ Failed to send message to user {order.user_id}: {result.error}")
+    await update_order_message_ids({
+        order.id: result.result for order, result in zip(orders, results) if result.ok and result.result
+    })
+    return sum(1 for result in results if result.ok)
+
+def _bulk_status_report(result: BulkStatusResult, delivered: int) -> str:
+    name = BULK_STATUS_NAMES.get(result.status.value, result.status.value)
+    lines = [f"📦 Статус «{name}»: изменено {len(result.changed)}, пропущено {len(result.skipped)}"]
+    if result.changed:
+        lines += ["", "✅ Изменены:"]
+        lines += [f"• {customer_name(order) or '—'} · {order.total:,} сум · /order_{order.id}"
+                  for order in result.changed]
+    if result.skipped:
+        lines += ["", "⏭ Пропущены:"]
+        lines += [f"• {order_id} — {BULK_SKIP_REASONS.get(reason, reason)}"
+                  for order_id, reason in result.skipped.items()]
+    if result.changed:
+        lines += ["", f"📨 Клиенты уведомлены: {delivered} из {len(result.changed)}"]
+    text = "\n".join(lines)
+    return text if len(text) <= 4096 else text[:4093] + "…"
+
+async def _apply_bulk_status(order_ids: Optional[List[str]], status: OrderStatus,
+                             client_sender: Optional[OutboundSender],
+                             from_status: Optional[OrderStatus] = None) -> str:
+    """Change the orders' status in one bulk_write, notify their clients and describe the outcome"""
+    result = await bulk_update_order_status(order_ids, status, from_status)
+    delivered = await _notify_clients_status(result.changed, status, client_sender)
+    return _bulk_status_report(result, delivered)
+
+@router.message(Command("bulk_status"))
+async def cmd_bulk_status(message: types.Message, client_sender: Optional[OutboundSender] = None):
+    """Change many orders' status: /bulk_status <from> <to> | /bulk_status <to> <ID> [<ID> ...]."""
+    parts = (message.text or "").replace(",", " ").split()[1:]
+    statuses = {status.value for status in OrderStatus}
+    if len(parts) == 2 and parts[0] in statuses and parts[1] in BULK_STATUS_NAMES:
+        report = await _apply_bulk_status(None, OrderStatus(parts[1]), client_sender, OrderStatus(parts[0]))
+    elif len(parts) >= 2 and parts[0] in BULK_STATUS_NAMES:
+        order_ids = [part.removeprefix("/order_") for part in parts[1:]]
+        report = await _apply_bulk_status(order_ids, OrderStatus(parts[0]), client_sender)
+    else:
+        await message.answer(BULK_STATUS_USAGE)
+        return
+    await message.answer(report)
+
 
 
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("order:"))
-async def cb_order_actions(callback: CallbackQuery):
-    if not await is_admin(callback.from_user.id):
-        await callback.answer("Нет прав", show_alert=True)
-        return
+async def cb_order_actions(callback: CallbackQuery, client_bot: Optional[Bot] = None):
     parts = callback.data.split(":")
     # Patterns: order:open:<id> | order:close:<id> | order:view:<id> | order:confirm:<id>:<status> | order:set:<id>:<status> | order:confirm_hide:<id> | order:hide:<id>
     if len(parts) < 3:
@@ -476,69 +672,7 @@ async def cb_order_actions(callback: CallbackQuery):
             await callback.answer("Не найдено", show_alert=True)
             return
         
-        # Build clean order details
-        lines = []
-        
-        # Show name at the top (most important info) - check all possible name fields
-        if order.customer_name:
-            lines.append(f"👤 {order.customer_name}")
-        elif order.name:
-            lines.append(f"👤 {order.name}")
-        elif order.contact:
-            lines.append(f"👤 {order.contact.split(',')[0]}")
-        else:
-            lines.append("👤 Имя не указано")
-        
-        # Order ID and amount
-        lines.append(f"🆔 {order.id}")
-        lines.append(f"💰 {order.total:,} сум")
-        
-        # Payment verification status (if card payment)
-        if "карт" in order.method.lower() or "card" in order.method.lower():
-            if order.payment_verified:
-                lines.append("💳 ✅ Оплата подтверждена")
-            else:
-                lines.append("💳 ⏳ Требует проверки оплаты")
-        
-        # Contact details (check all possible contact fields)
-        if order.customer_name and order.customer_phone and order.customer_address:
-            # Latest format: customer_* fields
-            lines.append(f"📞 {order.customer_phone}")
-            lines.append(f"📍 {order.customer_address}")
-        elif order.name and order.phone and order.address:
-            # New format: separate fields
-            lines.append(f"📞 {order.phone}")
-            lines.append(f"📍 {order.address}")
-        elif order.contact and ',' in order.contact:
-            # Old format: combined contact
-            parts = order.contact.split(',')
-            if len(parts) >= 2:
-                lines.append(f"📞 {parts[1].strip()}")
-            if len(parts) >= 3:
-                lines.append(f"📍 {parts[2].strip()}")
-        
-        # Delivery info (clean up duplicate emojis)
-        delivery_text = order.delivery.replace("🚚", "").strip()
-        lines.append(f"🚚 {delivery_text}")
-        lines.append(f"⏰ {order.time}")
-        
-        # Payment method (clean up duplicate emojis)
-        method_text = order.method.replace("💳", "").replace("💰", "").strip()
-        lines.append(f"💳 {method_text}")
-        
-        # Items with prices
-        lines.append("\n📦 Заказ:")
-        for key, qty in order.items.items():
-            lines.append(f"• {key}: {qty} шт")
-        
-        # Clean summary (remove HTML tags) - only if it contains useful info beyond the order items
-        if order.summary:
-            clean_summary = order.summary.replace('<b>', '').replace('</b>', '').replace('<br>', '\n')
-            # Only show if it's not just a duplicate of the order items
-            if not any(key in clean_summary.lower() for key in order.items.keys()):
-                lines.append(f"\n📄 {clean_summary}")
-        
-        await callback.message.edit_text("\n".join(lines), reply_markup=_build_order_actions_kb(order, expanded=True))
+        await callback.message.edit_text(render_order(order, "detail"), reply_markup=_build_order_actions_kb(order, expanded=True))
         await callback.answer()
         return
 
@@ -547,7 +681,7 @@ async def cb_order_actions(callback: CallbackQuery):
         if not order:
             await callback.answer("Не найдено", show_alert=True)
             return
-        await callback.message.edit_text(_format_order_summary(order), reply_markup=_build_order_actions_kb(order, expanded=False))
+        await callback.message.edit_text(render_order(order), reply_markup=_build_order_actions_kb(order, expanded=False))
         await callback.answer()
         return
 
@@ -603,7 +737,7 @@ async def cb_order_actions(callback: CallbackQuery):
             await callback.answer("Не удалось обновить", show_alert=True)
             return
         order = await get_order(order_id)
-        await _notify_client_status(order, new_status)
+        await _notify_client_status(order, new_status, client_bot)
         
         # Update the message to show the new status instead of confirmation dialog
         status_names = {
@@ -616,75 +750,10 @@ async def cb_order_actions(callback: CallbackQuery):
         
         status_name = status_names.get(status_text, status_text)
         
-        # Build updated message with new status (same clean format)
-        lines = []
-        
-        # Show name at the top (most important info) - check all possible name fields
-        if order.customer_name:
-            lines.append(f"👤 {order.customer_name}")
-        elif order.name:
-            lines.append(f"👤 {order.name}")
-        elif order.contact:
-            lines.append(f"👤 {order.contact.split(',')[0]}")
-        else:
-            lines.append("👤 Имя не указано")
-        
-        # Order ID and amount
-        lines.append(f"🆔 {order.id}")
-        lines.append(f"💰 {order.total:,} сум")
-        
-        # Payment verification status (if card payment)
-        if "карт" in order.method.lower() or "card" in order.method.lower():
-            if order.payment_verified:
-                lines.append("💳 ✅ Оплата подтверждена")
-            else:
-                lines.append("💳 ⏳ Требует проверки оплаты")
-        
-        # Contact details (check all possible contact fields)
-        if order.customer_name and order.customer_phone and order.customer_address:
-            # Latest format: customer_* fields
-            lines.append(f"📞 {order.customer_phone}")
-            lines.append(f"📍 {order.customer_address}")
-        elif order.name and order.phone and order.address:
-            # New format: separate fields
-            lines.append(f"📞 {order.phone}")
-            lines.append(f"📍 {order.address}")
-        elif order.contact and ',' in order.contact:
-            # Old format: combined contact
-            parts = order.contact.split(',')
-            if len(parts) >= 2:
-                lines.append(f"📞 {parts[1].strip()}")
-            if len(parts) >= 3:
-                lines.append(f"📍 {parts[2].strip()}")
-        
-        # Delivery info (clean up duplicate emojis)
-        delivery_text = order.delivery.replace("🚚", "").strip()
-        lines.append(f"🚚 {delivery_text}")
-        lines.append(f"⏰ {order.time}")
-        
-        # Payment method (clean up duplicate emojis)
-        method_text = order.method.replace("💳", "").replace("💰", "").strip()
-        lines.append(f"💳 {method_text}")
-        
-        # Items with prices
-        lines.append("\n📦 Заказ:")
-        for key, qty in order.items.items():
-            lines.append(f"• {key}: {qty} шт")
-        
-        # Clean summary (remove HTML tags) - only if it contains useful info beyond the order items
-        if order.summary:
-            clean_summary = order.summary.replace('<b>', '').replace('</b>', '').replace('<br>', '\n')
-            # Only show if it's not just a duplicate of the order items
-            if not any(key in clean_summary.lower() for key in order.items.keys()):
-                lines.append(f"\n📄 {clean_summary}")
-        
-        # Status update
-        lines.append(f"\n✅ Заказ {status_name}")
-        
+        # Same card as "open", with the new status underneath
         await callback.message.edit_text(
-            "\n".join(lines), 
-            reply_markup=_build_order_actions_kb(order, expanded=True),
-            parse_mode="Markdown"
+            f"{render_order(order, 'detail')}\n\n✅ Заказ {status_name}",
+            reply_markup=_build_order_actions_kb(order, expanded=True)
         )
         await callback.answer("✅ Статус обновлён")
 
@@ -692,26 +761,14 @@ async def cb_order_actions(callback: CallbackQuery):
 
 
 # 3. Inventory Management
-@router.message(Command("inventory"))
-async def cmd_inventory(message: types.Message):
-    """Show items with availability and provide inline toggle buttons for admins."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-
-    availability = await get_availability_dict()
-    keys = await get_inventory_keys()
-    if not keys:
-        await message.answer("Инвентарь пуст.")
-        return
-
-    # Build inline keyboard with toggle buttons (only existing items)
+def _build_inventory_view(catalog: CatalogSnapshot):
+    """Availability list text and toggle keyboard for /inventory"""
     kb = InlineKeyboardBuilder()
     lines = []
     
     # Display availability status for each item
-    for key in keys:
-        is_enabled = availability.get(key, True)
+    for key in catalog.keys:
+        is_enabled = catalog.is_enabled(key)
         status = "✔️" if is_enabled else "❌"
         lines.append(f"{status} {key}")
         toggle_to = "0" if is_enabled else "1"
@@ -724,7 +781,18 @@ async def cmd_inventory(message: types.Message):
 
     text = "📦 Текущая доступность:\n\n" + "\n".join(lines)
     text += "\n\n💡 Нажмите кнопку для изменения статуса"
-    await message.answer(text, reply_markup=kb.as_markup())
+    return text, kb.as_markup()
+
+@router.message(Command("inventory"))
+async def cmd_inventory(message: types.Message):
+    """Show items with availability and provide inline toggle buttons for admins."""
+    catalog = await get_catalog()
+    if not catalog.keys:
+        await message.answer("Инвентарь пуст.")
+        return
+
+    text, markup = _build_inventory_view(catalog)
+    await message.answer(text, reply_markup=markup)
 
 @router.message(Command("add_item"))
 async def cmd_add_item(message: types.Message):
@@ -739,10 +807,6 @@ async def cmd_remove_item(message: types.Message):
 @router.message(Command("set_avail"))
 async def cmd_set_avail(message: types.Message):
     """Enable or disable item availability via command: /set_avail <key> <0|1>."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-
     parts = message.text.split()
     if len(parts) != 3:
         await message.answer("Использование: /set_avail <ключ> <0|1>")
@@ -763,69 +827,41 @@ async def cmd_set_avail(message: types.Message):
 
 @router.callback_query(lambda c: c.data and c.data.startswith("avail:"))
 async def cb_toggle_availability(callback: CallbackQuery):
-    if not await is_admin(callback.from_user.id):
-        await callback.answer("Нет прав", show_alert=True)
-        return
-
     _, key, to = callback.data.split(":", 2)
     is_enabled = to == "1"
-    # Validate inventory key to avoid toggling non-existent fields
-    if not await inventory_key_exists(key):
+    # Validate inventory key to avoid toggling non-existent fields; the snapshot
+    # is updated in place by set_availability_item, so this path does no reads
+    catalog = await get_catalog()
+    if key not in catalog.keys:
         await callback.answer("Нет такого товара", show_alert=True)
         return
     ok = await set_availability_item(key, is_enabled)
     if ok:
         # Refresh the message content
-        availability = await get_availability_dict()
-        keys = await get_inventory_keys()
-        kb = InlineKeyboardBuilder()
-        lines = []
-        
-        for k in keys:
-            enabled = availability.get(k, True)
-            status = "✔️" if enabled else "❌"
-            lines.append(f"{status} {k}")
-            toggle_to = "0" if enabled else "1"
-            kb.row(
-                InlineKeyboardButton(
-                    text=("Отключить" if enabled else "Включить") + f" · {k}",
-                    callback_data=f"avail:{k}:{toggle_to}",
-                )
-            )
-        
-        text = "📦 Текущая доступность:\n\n" + "\n".join(lines)
-        text += "\n\n💡 Нажмите кнопку для изменения статуса"
-        await callback.message.edit_text(text, reply_markup=kb.as_markup())
+        text, markup = _build_inventory_view(await get_catalog())
+        await callback.message.edit_text(text, reply_markup=markup)
         await callback.answer(f"✅ {key}: {'включен' if is_enabled else 'выключен'}")
     else:
         await callback.answer("Не удалось обновить", show_alert=True)
 
 # 4. General
 @router.message(Command("broadcast"))
-async def cmd_broadcast(message: types.Message, bot: Bot):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
+async def cmd_broadcast(message: types.Message, sender: OutboundSender):
     text = message.text.partition(' ')[2].strip()
     if not text:
         await message.answer("Использование: /broadcast <текст>")
         return
-    count = 0
-    for admin_id in ADMIN_IDS:
-        if admin_id != message.from_user.id:
-            try:
-                await bot.send_message(admin_id, f"[Broadcast] {text}")
-                count += 1
-            except Exception:
-                pass
-    await message.answer(f"Сообщение отправлено {count} администраторам.")
+    recipients = [admin_id for admin_id in ADMIN_IDS if admin_id != message.from_user.id]
+    results = await sender.send_many(recipients, f"[Broadcast] {text}")
+    count = sum(1 for r in results if r.ok)
+    failed = [str(r.chat_id) for r in results if not r.ok]
+    reply = f"Сообщение отправлено {count} администраторам."
+    if failed:
+        reply += f"\nНе доставлено: {', '.join(failed)}"
+    await message.answer(reply)
 
 @router.message(Command("help"))
 async def cmd_help(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-    
     help_text = """📖 **Справка по командам администратора**
 
 ━━━━━━━━━━━━━━━━━━━
@@ -845,6 +881,12 @@ async def cmd_help(message: types.Message):
 **/order_<ID>** — Детальная информация о заказе
 • Например: /order_691cae998ef67346b9b3e5cd
 
+**/bulk_status** — Смена статуса сразу у нескольких заказов
+• /bulk_status ready completed — завершить все готовые заказы
+• /bulk_status cancelled <ID> <ID> — перечисленные заказы
+• В /new_orders и /all_orders: "☑️ Выбрать несколько" → отметьте заказы → статус
+• Клиенты получают уведомления; в ответе — изменённые и пропущенные заказы
+
 ━━━━━━━━━━━━━━━━━━━
 **🔄 РАБОТА С ЗАКАЗАМИ**
 
@@ -881,13 +923,22 @@ async def cmd_help(message: types.Message):
 • Топ-3 популярных позиций
 
 **/stats_orders [period]** — Сводка по заказам
-• Примеры: /stats_orders week, /stats_orders today
+• Примеры: /stats_orders week, /stats_orders yesterday, /stats_orders 01.10.2025..15.10.2025
+• Периоды — целые дни по Ташкенту: today, yesterday, week (7 дней), month (30 дней) или диапазон дат
 • По умолчанию: week (неделя)
 
 **/earnings [period]** — Выручка за период
 • Примеры: /earnings month, /earnings today
 • По умолчанию: week (неделя)
 
+**/demand_chart [period]** — График спроса по позициям (итог и по дням)
+• Пример: /demand_chart month
+• По умолчанию: week (неделя)
+
+**/export <с> <по> [csv|parquet]** — Выгрузка заказов файлом
+• Пример: /export 2025-01-01 2025-01-31
+• CSV сжимается gzip; parquet требует pyarrow
+
 ━━━━━━━━━━━━━━━━━━━
 **⚙️ НАСТРОЙКИ И ПРОЧЕЕ**
 
@@ -895,6 +946,10 @@ async def cmd_help(message: types.Message):
 • ID администраторов
 • Рабочие часы
 
+**/metrics** — Время ответа обработчиков, запросов к БД и Telegram API
+
+**/slow_queries [N]** — N самых медленных запросов к MongoDB (по умолчанию 10)
+
 **/broadcast <текст>** — Рассылка всем администраторам
 • Пример: /broadcast Сегодня закрываемся на час раньше
 
@@ -921,27 +976,70 @@ async def cmd_help(message: types.Message):
 
 @router.message(Command("config"))
 async def cmd_config(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
-    
     admins = await get_admins()
     admin_names = ', '.join(admin.name for admin in admins) or "—"
     env_admins = ', '.join(str(a) for a in ADMIN_IDS) or "—"
+    cache = analytics_cache.stats()
     await message.answer(
         "Текущие настройки:\n"
         f"Рабочие часы: {WORK_HOURS}\n"
         f"Администраторы (БД): {admin_names}\n"
-        f"Администраторы (ENV): {env_admins}"
+        f"Администраторы (ENV): {env_admins}\n"
+        f"Кэш аналитики: {cache['hits']} попаданий, {cache['misses']} промахов, "
+        f"{cache['size']} записей (TTL {analytics_cache.ttl:g} с)"
     )
 
+@router.message(Command("metrics"))
+async def cmd_metrics(message: types.Message):
+    """Compact view of the in-process metrics (full set: METRICS_PORT /metrics)"""
+    sections = [
+        ("⚙️ Обработчики", summarize(handler_latency, handler_errors)),
+        ("🗄 Операции БД", summarize(operation_latency, operation_errors)),
+        ("📤 Telegram API", summarize(telegram_latency, telegram_errors)),
+    ]
+    lines = ["📈 Метрики с момента запуска (по суммарному времени):"]
+    for title, rows in sections:
+        lines.append(f"\n{title}:")
+        lines.extend(rows or ["—"])
+    monitor = []
+    for path, unit in (("poll", "проверок"), ("stream", "событий потока")):
+        ticks = monitor_tick_latency.count(path=path)
+        if ticks:
+            tick_ms = monitor_tick_latency.quantile(0.95, (("path", path),)) * 1000
+            monitor.append(f"{ticks} {unit}, p95 {tick_ms:.1f} мс")
+    if monitor_event_lag.count():
+        monitor.append(f"задержка события p95 {monitor_event_lag.quantile(0.95, ()) * 1000:.1f} мс")
+    if monitor:
+        lines.append(f"\n🆕 Монитор заказов: {'; '.join(monitor)}; "
+                     f"в последней проверке: {int(monitor_backlog.get())} заказов")
+    await message.answer("\n".join(lines))
+
+@router.message(Command("slow_queries"))
+async def cmd_slow_queries(message: types.Message):
+    """Slowest MongoDB query shapes since startup: /slow_queries [N]"""
+    parts = (message.text or "").split()
+    limit = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 10
+    top = query_log.top(max(1, min(limit, 30)))
+    if not top:
+        await message.answer("Запросов к MongoDB пока не было.")
+        return
+    lines = [f"🐢 Самые медленные запросы (порог {query_log.slow_ms:g} мс):"]
+    for row in top:
+        line = (f"\n{row['command']} {row['collection']}: макс {row['max_ms']:.1f} мс, "
+                f"сред {row['avg_ms']:.1f} мс, {row['count']} раз")
+        if row["slow"]:
+            line += f", медленных {row['slow']}"
+        if row["failed"]:
+            line += f", ошибок {row['failed']}"
+        if row["shape"]:
+            line += f"\n{row['shape']}"
+        lines.append(line)
+    await message.answer("\n".join(lines)[:4096])
+
 # 5. Statistics
 @router.message(Command("stats_orders"))
 async def cmd_stats_orders(message: types.Message):
-    """Show order stats for a period: today|week|month (default: week)."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
+    """Show order stats for a period: today|yesterday|week|month|FROM..TO (default: week)."""
     parts = (message.text or "").split()
     period = parts[1].lower() if len(parts) > 1 else "week"
     summary = await analytics_summary(period)
@@ -964,9 +1062,6 @@ async def cmd_stats_orders(message: types.Message):
 @router.message(Command("weekly_report"))
 async def cmd_weekly_report(message: types.Message):
     """Generate and send a weekly sales report."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
     summary = await analytics_summary("week")
     orders_total = summary["orders_total"]
     orders_completed = summary["orders_completed"]
@@ -986,21 +1081,91 @@ async def cmd_weekly_report(message: types.Message):
 
 @router.message(Command("monthly_report"))
 async def cmd_monthly_report(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
     await message.answer("Команда отключена. Используйте /weekly_report.")
 
 @router.message(Command("earnings"))
 async def cmd_earnings(message: types.Message):
-    """Show total earnings for a period: today|week|month (default: week)."""
-    if not await is_admin(message.from_user.id):
-        await message.answer("⛔️ Доступ запрещён. Вы не администратор.")
-        return
+    """Show total earnings for a period: today|yesterday|week|month|FROM..TO (default: week)."""
     parts = (message.text or "").split()
     period = parts[1].lower() if len(parts) > 1 else "week"
     from data.operations import analytics_earnings
     revenue = await analytics_earnings(period)
     await message.answer(f"💰 Выручка ({period}, завершённые заказы): {revenue:,} сум")
 
-# demand_chart removed per request
\ No newline at end of file
+DEMAND_CHART_USAGE = (
+    "Использование: /demand_chart [today|yesterday|week|month|<с>..<по>]\n"
+    "Даты: ГГГГ-ММ-ДД или ДД.ММ.ГГГГ (включительно, время Узбекистана)\n"
+    "Пример: /demand_chart 2025-01-01..2025-01-31"
+)
+
+@router.message(Command("demand_chart"))
+async def cmd_demand_chart(message: types.Message):
+    """Send the demand chart for a period: today|yesterday|week|month|FROM..TO (default: week)."""
+    parts = (message.text or "").split()
+    try:
+        chart = await get_demand_chart(parts[1] if len(parts) > 1 else "week")
+    except ValueError:
+        await message.answer(DEMAND_CHART_USAGE)
+        return
+    period = chart.matrix.period
+    if chart.png is None:
+        await message.answer(f"📊 За период ({period}) заказов нет.")
+        return
+    totals = chart.matrix.totals
+    caption = f"📊 Спрос ({period}): {int(totals.sum()):,} шт, позиций: {len(chart.matrix.items)}"
+    if chart.file_id:
+        # Already uploaded: Telegram serves the same image by file_id
+        try:
+            await message.answer_photo(chart.file_id, caption=caption)
+            return
+        except TelegramBadRequest:
+            chart.file_id = None
+    sent = await message.answer_photo(BufferedInputFile(chart.png, filename="demand.png"), caption=caption)
+    if sent.photo:
+        chart.file_id = sent.photo[-1].file_id
+
+# Bot API limit for documents sent by bots
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+EXPORT_USAGE = (
+    "Использование: /export <с> <по> [csv|parquet]\n"
+    "Даты: ГГГГ-ММ-ДД или ДД.ММ.ГГГГ (включительно, время Узбекистана)\n"
+    "Пример: /export 2025-01-01 2025-01-31"
+)
+
+@router.message(Command("export"))
+async def cmd_export(message: types.Message):
+    """Export orders created between two local dates as a compressed CSV (or Parquet) document."""
+    parts = (message.text or "").split()
+    fmt = parts[3].lower() if len(parts) > 3 else "csv"
+    try:
+        first_day = parse_local_date(parts[1])
+        last_day = parse_local_date(parts[2])
+    except (IndexError, ValueError):
+        await message.answer(EXPORT_USAGE)
+        return
+    if last_day < first_day or fmt not in EXPORT_FORMATS:
+        await message.answer(EXPORT_USAGE)
+        return
+
+    start = local_day_start_utc(first_day)
+    end = local_day_start_utc(last_day + timedelta(days=1))
+    filename = export_filename(first_day, last_day, fmt)
+    await message.answer(f"⏳ Выгружаю заказы {first_day:%d.%m.%Y} — {last_day:%d.%m.%Y}...")
+    with tempfile.TemporaryDirectory(prefix="samsariya-export-") as tmp:
+        path = os.path.join(tmp, filename)
+        try:
+            count = await export_orders(path, start, end, fmt)
+        except RuntimeError as e:
+            await message.answer(f"❌ {e}")
+            return
+        size = os.path.getsize(path)
+        if size > EXPORT_MAX_BYTES:
+            await message.answer(
+                f"❌ Файл слишком большой для Telegram ({size / 1024 / 1024:.0f} МБ). "
+                "Сократите период или используйте scripts/export_orders.py"
+            )
+            return
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"📤 Заказов: {count:,} ({size / 1024:.0f} КБ)",
+        )
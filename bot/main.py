@@ -1,19 +1,77 @@
 import asyncio
 import sys
 import os
+import secrets
 import signal
+import socket
+import time
+from datetime import datetime
+from typing import Optional
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from aiogram import Bot, Dispatcher
 from aiogram.types import BotCommand
-from data.config import BOT_TOKEN, ADMIN_IDS
+from bson import Timestamp
+from pymongo.errors import OperationFailure, PyMongoError
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramAPIError
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from data.config import (
+    BOT_TOKEN,
+    ADMIN_IDS,
+    CLIENT_BOT_TOKEN,
+    CLIENT_BOT_POOL_SIZE,
+    DAILY_STATS_RECONCILE_DAYS,
+    DAILY_STATS_RECONCILE_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    ORDER_MONITOR_MODE,
+    ORDER_POLL_INTERVAL,
+    ORDER_RECHECK_INTERVAL,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from data.database import db
+from bot.cards import render_order
 from bot.handlers import router
-from data.operations import seed_availability_from_inventory, get_new_orders
-from utils.sheets import append_order_to_sheet
-from data.operations import mark_order_sheet_synced
+from bot.middlewares import AdminAccessMiddleware, admin_set
+from data.operations import seed_availability_from_inventory
+from utils.sheets import sheets_sync
+from data.operations import (
+    CHANGE_STREAM_HISTORY_LOST_CODES,
+    CHANGE_STREAM_UNSUPPORTED_CODES,
+    NEW_ORDERS_BATCH,
+    ORDER_NOTIFY_LEASE,
+    ORDER_NOTIFY_MAX_ATTEMPTS,
+    apply_catalog_change,
+    claim_order_notification,
+    finish_order_notification,
+    get_unnotified_new_orders,
+    get_resume_token,
+    invalidate_catalog,
+    order_from_change,
+    reconcile_daily_stats,
+    record_admin_alerted,
+    record_order_stats,
+    renew_order_notification,
+    save_resume_token,
+    watch_catalog,
+    watch_new_orders,
+)
 from data.models import OrderStatus
-from utils.helpers import format_uzbekistan_datetime
+from utils.metrics import (
+    HandlerMetricsMiddleware,
+    TelegramMetricsMiddleware,
+    monitor_backlog,
+    monitor_event_lag,
+    monitor_tick_latency,
+    start_metrics_server,
+)
+from utils.sender import OutboundSender
 
 async def set_bot_commands(bot: Bot):
     """Set up bot commands menu"""
@@ -23,58 +81,28 @@ async def set_bot_commands(bot: Bot):
         BotCommand(command="help", description="❓ Справка"),
         BotCommand(command="new_orders", description="📋 Новые заказы"),
         BotCommand(command="all_orders", description="📋 Все активные заказы"),
+        BotCommand(command="bulk_status", description="📦 Сменить статус нескольких заказов"),
         BotCommand(command="inventory", description="📦 Управление доступностью"),
         BotCommand(command="weekly_report", description="📈 Недельный отчёт"),
         BotCommand(command="stats_orders", description="📊 Сводка по заказам"),
         BotCommand(command="earnings", description="💰 Выручка за период"),
+        BotCommand(command="demand_chart", description="📊 График спроса"),
+        BotCommand(command="export", description="📤 Выгрузка заказов"),
         BotCommand(command="config", description="⚙️ Настройки"),
+        BotCommand(command="metrics", description="📈 Метрики"),
+        BotCommand(command="slow_queries", description="🐢 Медленные запросы"),
         BotCommand(command="broadcast", description="📢 Рассылка"),
     ]
     await bot.set_my_commands(commands)
 
-def format_order_summary(order) -> str:
-    """Format order summary for notifications"""
-    # Handle all possible contact formats
-    if order.customer_name:
-        name = order.customer_name
-    elif order.name:
-        name = order.name
-    elif order.contact:
-        name = order.contact.split(',')[0]
-    else:
-        name = "—"
-    
-    # Build summary lines
-    lines = []
-    
-    # Add payment verification warning for card payments
-    if order.requires_payment_check:
-        lines.append("⚠️ ТРЕБУЕТ ПРОВЕРКИ ОПЛАТЫ")
-    
-    lines.append(f"🆔 {order.id}")
-    lines.append(f"👤 {name}")
-    
-    # Determine payment method clearly
-    if "карт" in order.method.lower() or "card" in order.method.lower():
-        payment_method = "💳 Оплата картой"
-        if order.payment_verified:
-            payment_method += " ✅"
-        elif order.requires_payment_check:
-            payment_method += " ⏳"
-    else:
-        payment_method = "💵 Наличные"
-    
-    lines.append(f"💰 {order.total:,} сум")
-    lines.append(f"💳 {payment_method}")
-    
-    # Show claimed payment amount if card payment
-    if order.requires_payment_check and order.payment_amount:
-        lines.append(f"⚠️ Клиент указал: {order.payment_amount:,} сум")
-    
-    lines.append(f"📦 {len(order.items)} позиций")
-    lines.append(f"📅 {format_uzbekistan_datetime(order.created_at)}")
-    
-    return "\n".join(lines)
+def create_client_bot() -> Optional[Bot]:
+    """Create the client bot used for status notifications (None if not configured)"""
+    if not CLIENT_BOT_TOKEN:
+        print("⚠️ CLIENT_BOT_TOKEN not configured, clients won't be notified")
+        return None
+    client_bot = Bot(token=CLIENT_BOT_TOKEN, session=AiohttpSession(limit=CLIENT_BOT_POOL_SIZE))
+    client_bot.session.middleware(TelegramMetricsMiddleware("client"))
+    return client_bot
 
 def build_order_actions_kb(order) -> dict:
     """Build order action keyboard for notifications.
@@ -91,68 +119,290 @@ def build_order_actions_kb(order) -> dict:
     kb.row(InlineKeyboardButton(text="✖️ Отменить", callback_data=f"order:confirm:{order.id}:cancelled"))
     return kb.as_markup()
 
-# Track notified orders to avoid duplicates
-notified_orders = set()
+# Name under which the order change stream resume token is stored
+ORDER_STREAM = "orders_new"
+
+# Who holds an order notification lease, and how often it is renewed while
+# the alerts are still going out
+NOTIFIER_ID = f"{socket.gethostname()}:{os.getpid()}"
+ORDER_NOTIFY_RENEW_INTERVAL = ORDER_NOTIFY_LEASE.total_seconds() / 3
+
+async def _renew_order_lease(lease) -> None:
+    while True:
+        await asyncio.sleep(ORDER_NOTIFY_RENEW_INTERVAL)
+        try:
+            await renew_order_notification(lease)
+        except PyMongoError as e:
+            print(f"Failed to renew notification lease of order {lease.order_id}: {e}")
+
+async def notify_new_order(sender: OutboundSender, order):
+    """Send a new order to every admin once and push it to Google Sheets once"""
+    # The persisted lease makes this a no-op for orders that were already notified
+    # or are being notified, including across restarts and between the stream and
+    # polling paths
+    lease = await claim_order_notification(order.id, NOTIFIER_ID)
+    if lease is None:
+        return
+    # Orders inserted by the client bot enter the daily_stats rollup here
+    await record_order_stats(order)
+    text = f"🆕 Новый заказ!\n\n{render_order(order)}"
+    reply_markup = build_order_actions_kb(order)
+
+    async def alert(admin_id: int):
+        result = await sender.send_message(admin_id, text, reply_markup=reply_markup)
+        if result.ok:
+            # Recorded per admin right away, so a retry or a crash mid-send
+            # only re-sends to admins who didn't get it
+            await record_admin_alerted(lease, admin_id)
+        else:
+            print(f"Failed to send order notification to admin {admin_id}: {result.error}")
+
+    # Send to the admins still missing the alert concurrently, under the shared
+    # rate limits; the renewer keeps the lease while rate limits stretch the send
+    renewer = asyncio.create_task(_renew_order_lease(lease))
+    try:
+        await asyncio.gather(*(alert(admin_id) for admin_id in ADMIN_IDS if admin_id not in lease.alerted))
+    finally:
+        renewer.cancel()
+    missing = [admin_id for admin_id in ADMIN_IDS if admin_id not in lease.alerted]
+    complete = not missing or lease.attempts >= ORDER_NOTIFY_MAX_ATTEMPTS
+    if not await finish_order_notification(lease, complete):
+        print(f"⚠️ Lost the notification lease of order {order.id} to another notifier")
+        return
+    if not complete:
+        print(f"⚠️ Admins {missing} didn't receive order {order.id}; will retry")
+        return
+    if missing:
+        print(f"⚠️ Gave up alerting admins {missing} about order {order.id} "
+              f"after {lease.attempts} attempts")
 
-async def check_new_orders(bot: Bot):
-    """Check for new orders and notify admins"""
+    # Queue for the background Google Sheets sync; never waits on the webhook
+    sheets_sync.enqueue(order)
+    print(f"Notified admins about new order: {order.id}")
+
+async def check_new_orders(sender: OutboundSender):
+    """Notify admins about every NEW order they haven't been notified about"""
+    started = time.perf_counter()
+    backlog = 0
     try:
-        orders = await get_new_orders()
-        if orders:
-            for order in orders:
-                # Only notify if we haven't notified about this order before
-                if order.id not in notified_orders:
-                    # Send to all admins
-                    for admin_id in ADMIN_IDS:
-                        try:
-                            await bot.send_message(
-                                admin_id,
-                                f"🆕 Новый заказ!\n\n{format_order_summary(order)}",
-                                reply_markup=build_order_actions_kb(order)
-                            )
-                        except Exception as e:
-                            print(f"Failed to send order notification to admin {admin_id}: {e}")
-                    
-                    # Push to Google Sheets once (avoid duplicates)
-                    try:
-                        if not getattr(order, "sheet_synced", False):
-                            ok = await append_order_to_sheet(order)
-                            if ok:
-                                await mark_order_sheet_synced(order.id)
-                    except Exception as e:
-                        print(f"Failed to sync order {order.id} to Sheets: {e}")
-
-                    # Mark as notified
-                    notified_orders.add(order.id)
-                    print(f"Notified admins about new order: {order.id}")
+        while True:
+            # Only the fields the alert, the Sheets row and daily_stats need
+            orders = await get_unnotified_new_orders(projection="notify")
+            backlog += len(orders)
+            # The whole batch goes out at once; the shared OutboundSender keeps
+            # it within the Telegram rate limits
+            results = await asyncio.gather(*(notify_new_order(sender, order) for order in orders),
+                                           return_exceptions=True)
+            for order, result in zip(orders, results):
+                if isinstance(result, Exception):
+                    print(f"Error notifying admins about order {order.id}: {result}")
+            if len(orders) < NEW_ORDERS_BATCH:
+                break
     except Exception as e:
         print(f"Error checking new orders: {e}")
+    monitor_backlog.set(backlog)
+    monitor_tick_latency.observe(time.perf_counter() - started, path="poll")
+
+def change_time(change: dict) -> Optional[datetime]:
+    """When a change event happened (UTC): wallTime on MongoDB 6+, else the cluster time (whole seconds)"""
+    wall_time = change.get("wallTime")
+    if isinstance(wall_time, datetime):
+        return wall_time
+    cluster_time = change.get("clusterTime")
+    if isinstance(cluster_time, Timestamp):
+        return cluster_time.as_datetime().replace(tzinfo=None)
+    return cluster_time if isinstance(cluster_time, datetime) else None
 
-async def order_monitor(bot: Bot):
-    """Monitor for new orders every 10 seconds"""
+async def watch_orders(sender: OutboundSender):
+    """Notify admins about new orders as they arrive through a change stream.
+
+    Resumes from the stored token so events that happened while the bot was down
+    are replayed. Without a token the backlog is caught up by one poll after the
+    stream is open, so nothing inserted in between is missed.
+    """
+    resume_token = await get_resume_token(ORDER_STREAM)
+    async with watch_new_orders(resume_token) as stream:
+        print("📡 Order change stream is active")
+        if resume_token is None:
+            await check_new_orders(sender)
+        async for change in stream:
+            started = time.perf_counter()
+            try:
+                order = order_from_change(change)
+                if order and order.status == OrderStatus.NEW:
+                    await notify_new_order(sender, order)
+            except Exception as e:
+                print(f"Error handling order change {change.get('documentKey')}: {e}")
+            await save_resume_token(ORDER_STREAM, stream.resume_token)
+            # Every event is one tick of the stream path; the lag covers the
+            # time it waited in the stream as well
+            monitor_tick_latency.observe(time.perf_counter() - started, path="stream")
+            happened = change_time(change)
+            if happened is not None:
+                monitor_event_lag.observe(max(0.0, (datetime.utcnow() - happened).total_seconds()))
+
+async def poll_orders(sender: OutboundSender):
+    """Poll for new orders every ORDER_POLL_INTERVAL seconds"""
     while True:
-        await check_new_orders(bot)
-        await asyncio.sleep(10)  # Check every 10 seconds
+        await check_new_orders(sender)
+        await asyncio.sleep(ORDER_POLL_INTERVAL)
+
+async def sweep_orders(sender: OutboundSender):
+    """Alongside the change stream: retry alerts nobody received and expired leases"""
+    while True:
+        await asyncio.sleep(ORDER_RECHECK_INTERVAL)
+        await check_new_orders(sender)
+
+async def watch_orders_until_unsupported(sender: OutboundSender):
+    """Keep the order change stream open; returns once the deployment turns out not to support it"""
+    while True:
+        try:
+            await watch_orders(sender)
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                print(f"⚠️ Change streams are not supported ({e}), falling back to polling")
+                break
+            if e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                print(f"⚠️ Order stream resume token is no longer valid ({e}), restarting stream")
+                await save_resume_token(ORDER_STREAM, None)
+                continue
+            print(f"Order change stream failed: {e}")
+        except PyMongoError as e:
+            print(f"Order change stream failed: {e}")
+        # Transient failure: catch up by polling once, then reopen the stream
+        await asyncio.sleep(ORDER_POLL_INTERVAL)
+        await check_new_orders(sender)
+
+async def order_monitor(sender: OutboundSender):
+    """Monitor for new orders: change stream when available, polling otherwise"""
+    if ORDER_MONITOR_MODE == "poll":
+        await poll_orders(sender)
+        return
+    sweeper = asyncio.create_task(sweep_orders(sender))
+    try:
+        await watch_orders_until_unsupported(sender)
+    finally:
+        sweeper.cancel()
+    await poll_orders(sender)
 
-async def shutdown_handler(bot: Bot, monitor_task):
+async def watch_catalog_collection(collection: str):
+    """Keep the catalog snapshot in sync with changes made by the client bot or scripts"""
+    while True:
+        try:
+            async with watch_catalog(collection) as stream:
+                # Changes made while no stream was open are covered by a reload
+                invalidate_catalog()
+                async for change in stream:
+                    apply_catalog_change(change)
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                # The snapshot still expires after CATALOG_CACHE_TTL
+                return
+            print(f"{collection} change stream failed: {e}")
+        except PyMongoError as e:
+            print(f"{collection} change stream failed: {e}")
+        await asyncio.sleep(ORDER_POLL_INTERVAL)
+
+async def catalog_monitor():
+    await asyncio.gather(watch_catalog_collection("inventory"), watch_catalog_collection("availability"))
+
+async def stats_reconciler():
+    """Recompute the recent days of the daily_stats rollup on a timer"""
+    while True:
+        await asyncio.sleep(DAILY_STATS_RECONCILE_INTERVAL)
+        try:
+            await reconcile_daily_stats(DAILY_STATS_RECONCILE_DAYS)
+        except PyMongoError as e:
+            print(f"daily_stats reconciliation failed: {e}")
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret: Optional[str], path: str = WEBHOOK_PATH) -> web.Application:
+    """aiohttp app that feeds webhook updates to `dp`; requests without the secret get 401"""
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot, stop: asyncio.Event) -> bool:
+    """Serve updates via webhook until `stop` is set; False if the webhook couldn't be set up"""
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    runner = web.AppRunner(create_webhook_app(dp, bot, secret))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    except (OSError, TelegramAPIError) as e:
+        print(f"⚠️ Webhook setup failed ({e}), falling back to polling")
+        await runner.cleanup()
+        return False
+    print(f"🌐 Webhook mode: listening on {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+    return True
+
+async def run_polling(dp: Dispatcher, bot: Bot, stop: asyncio.Event) -> None:
+    """Long polling until `stop` is set (signals are handled by main, not aiogram)"""
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait({polling, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if not polling.done():
+            try:
+                await asyncio.wait_for(dp.stop_polling(), timeout=10)
+            except (RuntimeError, asyncio.TimeoutError):
+                # Stopped before polling got going, or it won't wind down
+                polling.cancel()
+        try:
+            await polling
+        except asyncio.CancelledError:
+            pass
+    finally:
+        stopped.cancel()
+
+def install_signal_handlers(stop: asyncio.Event) -> None:
+    """SIGINT/SIGTERM set `stop`, after which main shuts everything down"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C still arrives as KeyboardInterrupt
+            pass
+
+async def shutdown_handler(bot: Bot, monitor_task, client_bot: Optional[Bot] = None, background_tasks=()):
     """Handle graceful shutdown"""
     print("\n🛑 Получен сигнал завершения...")
     print("📤 Закрытие соединений...")
     
-    # Cancel monitoring task
-    if monitor_task and not monitor_task.done():
-        monitor_task.cancel()
-        try:
-            await asyncio.wait_for(monitor_task, timeout=2.0)
-        except (asyncio.CancelledError, asyncio.TimeoutError):
-            pass
-    
-    # Close bot session
+    # Cancel monitoring and cache refresh tasks
+    for task in (monitor_task, *background_tasks):
+        if task and not task.done():
+            task.cancel()
+            try:
+                await asyncio.wait_for(task, timeout=2.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+
+    # Flush queued Google Sheets rows
     try:
-        await bot.session.close()
+        await asyncio.wait_for(sheets_sync.stop(), timeout=20.0)
     except Exception:
         pass
     
+    # Close bot sessions
+    for session_bot in (bot, client_bot):
+        if session_bot is None:
+            continue
+        try:
+            await session_bot.session.close()
+        except Exception:
+            pass
+    
     # Disconnect from MongoDB
     try:
         await db.disconnect()
@@ -163,6 +413,8 @@ async def shutdown_handler(bot: Bot, monitor_task):
     print("👋 Бот остановлен")
 
 async def main():
+    stop = asyncio.Event()
+    install_signal_handlers(stop)
     # Connect to MongoDB
     await db.connect()
     # Ensure availability doc has all known inventory keys
@@ -170,8 +422,24 @@ async def main():
     
     # Initialize bot
     bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(TelegramMetricsMiddleware("admin"))
     dp = Dispatcher()
     dp.include_router(router)
+    # Latency and errors per handler, exported on METRICS_PORT and via /metrics
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    # Admin check once per update against the in-memory admin set
+    await admin_set.refresh()
+    dp.update.outer_middleware(AdminAccessMiddleware(admin_set))
+    # Shared rate-limited sender, injected into handlers as `sender`
+    sender = OutboundSender(bot)
+    dp["sender"] = sender
+    # Long-lived client bot for status notifications, injected as `client_bot`;
+    # its session pools keep-alive connections to the Bot API
+    client_bot = create_client_bot()
+    dp["client_bot"] = client_bot
+    # Rate-limited sender for bulk client notifications (/bulk_status), injected as `client_sender`
+    dp["client_sender"] = OutboundSender(client_bot) if client_bot else None
     
     # Set up bot commands menu
     await set_bot_commands(bot)
@@ -182,13 +450,23 @@ async def main():
     print("Press Ctrl+C to stop the bot gracefully")
     
     monitor_task = None
+    background_tasks = []
+    metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
     
     try:
-        # Start order monitoring in background
-        monitor_task = asyncio.create_task(order_monitor(bot))
+        # Start Google Sheets sync and order monitoring in background
+        sheets_sync.start()
+        monitor_task = asyncio.create_task(order_monitor(sender))
+        background_tasks.append(asyncio.create_task(admin_set.run()))
+        background_tasks.append(asyncio.create_task(catalog_monitor()))
+        if DAILY_STATS_RECONCILE_INTERVAL > 0:
+            background_tasks.append(asyncio.create_task(stats_reconciler()))
         
-        # Start the bot
-        await dp.start_polling(bot)
+        # Start the bot: webhook when configured, long polling otherwise
+        if not (WEBHOOK_URL and await run_webhook(dp, bot, stop)):
+            # A webhook left over from an earlier run would make getUpdates fail
+            await bot.delete_webhook()
+            await run_polling(dp, bot, stop)
     except KeyboardInterrupt:
         print("\n⚠️ Получен сигнал прерывания (Ctrl+C)")
     except asyncio.CancelledError:
@@ -197,18 +475,11 @@ async def main():
     except Exception as e:
         print(f"\n❌ Ошибка: {e}")
     finally:
-        await shutdown_handler(bot, monitor_task)
-
-def signal_handler(signum, frame):
-    """Handle Ctrl+C gracefully"""
-    print("\n🛑 Получен сигнал завершения (Ctrl+C)")
-    print("⏳ Завершение работы...")
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await shutdown_handler(bot, monitor_task, client_bot, background_tasks)
 
 if __name__ == "__main__":
-    # Set up signal handler for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
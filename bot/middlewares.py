@@ -0,0 +1,129 @@
+"""Dispatcher middlewares for Samsariya Admin Bot."""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+from pymongo.errors import OperationFailure, PyMongoError
+
+from data.config import ADMIN_IDS, ADMIN_REFRESH_INTERVAL
+from data.operations import CHANGE_STREAM_UNSUPPORTED_CODES, get_admin_ids, watch_admins
+
+ACCESS_DENIED_TEXT = "⛔️ Доступ запрещён. Вы не администратор."
+ACCESS_DENIED_ALERT = "Нет прав"
+
+
+class AdminSet:
+    """In-memory set of admin user IDs (ADMIN_IDS + admins collection).
+
+    Membership checks never touch the database, so updates from non-admins are
+    rejected for free. `run()` keeps the set fresh in the background.
+    """
+
+    def __init__(self, refresh_interval: float = ADMIN_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._ids: Set[int] = set(ADMIN_IDS)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._ids
+
+    async def refresh(self) -> Set[int]:
+        """Reload from MongoDB; keeps the previous set if the read fails"""
+        async with self._lock:
+            try:
+                self._ids = await get_admin_ids()
+            except PyMongoError as e:
+                print(f"Failed to refresh admin list: {e}")
+            # A failed first load falls back to ADMIN_IDS until the next refresh
+            self._loaded = True
+        return self._ids
+
+    async def ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.refresh()
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def _refresh_on_changes(self) -> None:
+        while True:
+            try:
+                async with watch_admins() as stream:
+                    # Reload once the stream is open so no change is missed in between
+                    await self.refresh()
+                    async for _ in stream:
+                        await self.refresh()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    return
+                print(f"Admins change stream failed: {e}")
+            except PyMongoError as e:
+                print(f"Admins change stream failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def run(self) -> None:
+        """Refresh every refresh_interval seconds and on changes to admins"""
+        await asyncio.gather(self._refresh_periodically(), self._refresh_on_changes())
+
+
+admin_set = AdminSet()
+
+
+class AdminAccessMiddleware(BaseMiddleware):
+    """Outer update middleware: only admins reach the handlers.
+
+    Commands sent to the bot in a private chat get the access-denied reply and
+    callbacks an alert, at most once per DENIAL_INTERVAL seconds per user; every
+    other update from non-admins (plain text, stickers, group messages, ...) is
+    dropped silently, so strangers can't make the bot spend its rate limits.
+    """
+
+    # Seconds between two denials to the same user
+    DENIAL_INTERVAL = 60.0
+    # Denial times are pruned once this many users are held
+    MAX_DENIED_USERS = 10000
+
+    def __init__(self, admins: AdminSet, denial_interval: float = DENIAL_INTERVAL):
+        self.admins = admins
+        self.denial_interval = denial_interval
+        self._denied_at: Dict[int, float] = {}
+
+    def _should_deny(self, user_id: int) -> bool:
+        """Whether to tell this user off now (not done so in the last denial_interval)"""
+        now = time.monotonic()
+        last = self._denied_at.get(user_id)
+        if last is not None and now - last < self.denial_interval:
+            return False
+        if len(self._denied_at) >= self.MAX_DENIED_USERS:
+            self._denied_at = {
+                uid: at for uid, at in self._denied_at.items() if now - at < self.denial_interval
+            }
+        self._denied_at[user_id] = now
+        return True
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        await self.admins.ensure_loaded()
+        user: Optional[User] = data.get("event_from_user")
+        if user is not None and user.id in self.admins:
+            return await handler(event, data)
+
+        if user is None or not isinstance(event, Update):
+            return None
+        message = event.message
+        if message is not None:
+            is_command = message.chat.type == "private" and (message.text or "").startswith("/")
+            if is_command and self._should_deny(user.id):
+                await message.answer(ACCESS_DENIED_TEXT)
+        elif event.callback_query is not None and self._should_deny(user.id):
+            await event.callback_query.answer(ACCESS_DENIED_ALERT, show_alert=True)
+        return None
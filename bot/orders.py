@@ -1,4 +1,13 @@
 """Order management logic for Samsariya Admin Bot."""
+import asyncio
+import io
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.operations import DemandMatrix, demand_matrix
+from utils.cache import ResultCache
 
 def get_new_orders():
     """Return a list of new (unprocessed) orders."""
@@ -24,6 +33,86 @@ def get_earnings(period):
     """Return total earnings for the given period."""
     pass
 
-def get_demand_chart(period):
-    """Generate and return a demand chart for the given period."""
-    pass 
\ No newline at end of file
+# -------------------------------
+# Demand chart
+# -------------------------------
+# PNGs keyed by (first day, days, data version); a chart only changes when the
+# underlying quantities do, so entries live long and the Telegram file_id of an
+# uploaded chart is reused for repeat requests
+CHART_CACHE_TTL = 24 * 3600
+CHART_CACHE_SIZE = 16
+# Items drawn individually; the rest is summed into "другое"
+CHART_MAX_ITEMS = 10
+
+chart_cache = ResultCache(ttl=CHART_CACHE_TTL, maxsize=CHART_CACHE_SIZE)
+
+
+@dataclass
+class DemandChart:
+    matrix: DemandMatrix
+    png: Optional[bytes]  # None when the period has no orders
+    file_id: Optional[str] = None  # set once the PNG has been uploaded
+
+
+def _chart_rows(matrix: DemandMatrix) -> Tuple[List[str], np.ndarray]:
+    if len(matrix.items) <= CHART_MAX_ITEMS:
+        return matrix.items, matrix.quantities
+    head = matrix.quantities[:CHART_MAX_ITEMS - 1]
+    rest = matrix.quantities[CHART_MAX_ITEMS - 1:].sum(axis=0, keepdims=True)
+    return matrix.items[:CHART_MAX_ITEMS - 1] + ["другое"], np.vstack([head, rest])
+
+
+def render_demand_chart(matrix: DemandMatrix) -> bytes:
+    """PNG of item totals (and, for multi-day periods, daily stacked bars).
+
+    CPU-bound; called through asyncio.to_thread. Uses the object-oriented
+    Figure API, which keeps no global pyplot state between threads.
+    """
+    from matplotlib.figure import Figure
+
+    items, quantities = _chart_rows(matrix)
+    totals = quantities.sum(axis=1)
+    multi_day = len(matrix.days) > 1
+    fig = Figure(figsize=(9, 8 if multi_day else 4.5), dpi=100)
+    axes = fig.subplots(2 if multi_day else 1, 1, squeeze=False)[:, 0]
+
+    ax = axes[0]
+    positions = np.arange(len(items))
+    ax.barh(positions, totals, color="#e07b39")
+    ax.set_yticks(positions, labels=items)
+    ax.invert_yaxis()
+    ax.set_xlabel("шт")
+    ax.set_title(f"Спрос за период: {matrix.period} ({matrix.days[0]} — {matrix.days[-1]})")
+    for y, total in zip(positions, totals):
+        ax.annotate(f"{int(total)}", (total, y), xytext=(3, 0), textcoords="offset points", va="center")
+
+    if multi_day:
+        ax = axes[1]
+        x = np.arange(len(matrix.days))
+        bottoms = np.zeros(len(matrix.days))
+        for label, row in zip(items, quantities):
+            ax.bar(x, row, bottom=bottoms, label=label)
+            bottoms += row
+        step = max(1, len(matrix.days) // 10)
+        ax.set_xticks(x[::step], labels=[day[5:] for day in matrix.days[::step]])
+        ax.set_ylabel("шт в день")
+        ax.legend(fontsize="small", loc="upper left", bbox_to_anchor=(1.01, 1))
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+async def _build_chart(matrix: DemandMatrix) -> DemandChart:
+    if not matrix.items:
+        return DemandChart(matrix, None)
+    # Rendering takes a good fraction of a second; keep it off the event loop
+    return DemandChart(matrix, await asyncio.to_thread(render_demand_chart, matrix))
+
+
+async def get_demand_chart(period: str) -> DemandChart:
+    """Demand chart for a period, rendered at most once per data version"""
+    matrix = await demand_matrix(period)
+    key = (matrix.days[0], len(matrix.days), matrix.version)
+    return await chart_cache.get_or_compute(key, lambda: _build_chart(matrix))
@@ -8,7 +8,17 @@ load_dotenv()
 # Secrets must be provided via .env; no hardcoded defaults
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CLIENT_BOT_TOKEN = os.getenv("CLIENT_BOT_TOKEN")  # Token for client bot
+# Max pooled keep-alive connections of the long-lived client bot session
+CLIENT_BOT_POOL_SIZE = int(os.getenv("CLIENT_BOT_POOL_SIZE", "20"))
 SHEETS_WEBHOOK_URL = os.getenv("SHEETS_WEBHOOK_URL")  # Google Apps Script Web App URL
+# Rows are posted to the webhook in batches of up to N rows or every N seconds
+SHEETS_BATCH_SIZE = int(os.getenv("SHEETS_BATCH_SIZE", "50"))
+SHEETS_FLUSH_INTERVAL = float(os.getenv("SHEETS_FLUSH_INTERVAL", "5"))
+# "rows" posts {"rows": [...]}; "row" posts each row on its own, for scripts
+# whose doPost still expects a single row
+SHEETS_PAYLOAD = os.getenv("SHEETS_PAYLOAD", "rows").strip().lower()
+# Seconds between re-queues of announced orders that never reached the sheet (0 disables)
+SHEETS_BACKFILL_INTERVAL = float(os.getenv("SHEETS_BACKFILL_INTERVAL", "300"))
 
 # Parse admin IDs from environment variable
 admin_ids_str = os.getenv("ADMIN_IDS", "")
@@ -16,5 +26,51 @@ ADMIN_IDS = [int(admin_id.strip()) for admin_id in admin_ids_str.split(",") if a
 
 WORK_HOURS = os.getenv("WORK_HOURS", "09:00-21:00")
 
+# Orders per page in /new_orders and /all_orders
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "10"))
+
+# Seconds between reloads of the in-memory admin set (changes to the admins
+# collection are also picked up immediately where change streams are available)
+ADMIN_REFRESH_INTERVAL = float(os.getenv("ADMIN_REFRESH_INTERVAL", "300"))
+
+# Webhook mode: set WEBHOOK_URL (public https base URL) to receive updates on an
+# embedded aiohttp server instead of long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # random per start when unset
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Prometheus metrics endpoint (GET /metrics); 0 disables it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Mongo commands at least this slow (ms) are printed to the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# Order monitor: "stream" follows a MongoDB change stream (falls back to polling
+# when the deployment has no change streams), "poll" always polls
+ORDER_MONITOR_MODE = os.getenv("ORDER_MONITOR_MODE", "stream").strip().lower()
+ORDER_POLL_INTERVAL = float(os.getenv("ORDER_POLL_INTERVAL", "10"))
+# In stream mode, seconds between sweeps that retry alerts nobody received
+ORDER_RECHECK_INTERVAL = float(os.getenv("ORDER_RECHECK_INTERVAL", "60"))
+
+# Outbound Telegram limits (messages per second) shared by all bulk senders
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", "8"))
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+
+# Analytics results are cached in-process for N seconds (0 disables), up to N periods
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "32"))
+# Every N seconds (0 disables) the last N local days of the daily_stats rollup
+# are recomputed from raw orders, to pick up changes made by the client bot
+DAILY_STATS_RECONCILE_INTERVAL = float(os.getenv("DAILY_STATS_RECONCILE_INTERVAL", "300"))
+DAILY_STATS_RECONCILE_DAYS = int(os.getenv("DAILY_STATS_RECONCILE_DAYS", "2"))
+
+# Seconds the in-process catalog (inventory keys + availability) snapshot lives;
+# changes made elsewhere are applied immediately where change streams are available
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+
 # MongoDB configuration
 MONGODB_URI = os.getenv("MONGODB_URI") 
\ No newline at end of file
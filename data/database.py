@@ -1,31 +1,82 @@
 import os
 import motor.motor_asyncio
-from typing import Optional
+from typing import Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 from .models import Order, InventoryItem, Admin, Config
+from .query_log import query_log
+
+# Indexes backing the queries in data/operations.py (see scripts/check_indexes.py).
+# create_indexes is a no-op for indexes that already exist with the same spec.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "orders": [
+        # status filters sorted by created_at: new/active lists, unnotified NEW orders
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                   name="status_created_at"),
+        # unannounced NEW orders (get_unnotified_new_orders): only the delta
+        # sits in the (status=new, admin_notified!=true) range
+        IndexModel([("status", ASCENDING), ("admin_notified", ASCENDING), ("created_at", ASCENDING),
+                    ("_id", ASCENDING)], name="status_notified"),
+        # period reports and analytics
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        # orders of whole local days (get_orders_by_period); the created_at key
+        # serves orders not stamped with local_date yet
+        IndexModel([("local_date", ASCENDING), ("created_at", ASCENDING)], name="local_date_created_at"),
+    ],
+    "notifications": [
+        IndexModel([("sent", ASCENDING), ("created_at", ASCENDING)], name="sent_created_at"),
+        # batch lookup after a worker claims notifications
+        IndexModel([("lease_id", ASCENDING)], name="lease_id", sparse=True),
+    ],
+    "inventory": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    "admins": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "config": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+}
 
 class Database:
     def __init__(self):
         self.client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
         self.db: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
         
-    async def connect(self):
-        """Connect to MongoDB Atlas"""
+    async def connect(self, database: str = "samsariya"):
+        """Connect to MongoDB Atlas and ensure indexes on `database` (scripts pass a throwaway one)"""
         try:
             mongodb_uri = os.getenv("MONGODB_URI")
             if not mongodb_uri:
                 raise ValueError("MONGODB_URI environment variable not set")
             
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(mongodb_uri)
-            self.db = self.client.samsariya
+            # query_log times every command for the slow-query log and /slow_queries
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(mongodb_uri, event_listeners=[query_log])
+            self.db = self.client[database]
             
             # Test connection
             await self.client.admin.command('ping')
             print("✅ Connected to MongoDB Atlas")
+
+            await self.ensure_indexes()
             
         except Exception as e:
             print(f"❌ Failed to connect to MongoDB: {e}")
             raise
     
+    async def ensure_indexes(self):
+        """Create the declared INDEXES (idempotent).
+
+        A failure on one collection (e.g. duplicate inventory keys blocking the
+        unique index) is reported and doesn't prevent the bot from starting.
+        """
+        for collection, models in INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(models)
+            except OperationFailure as e:
+                print(f"⚠️ Failed to create indexes on {collection}: {e}")
+
     async def disconnect(self):
         """Disconnect from MongoDB"""
         if self.client:
@@ -57,5 +108,14 @@ class Database:
     def notifications(self):
         return self.db.notifications
 
+    @property
+    def daily_stats(self):
+        return self.db.daily_stats
+
+    @property
+    def daily_stats_staging(self):
+        """Where rebuild_daily_stats builds the rollup before swapping it in"""
+        return self.db.daily_stats_staging
+
 # Global database instance
 db = Database() 
\ No newline at end of file
@@ -44,6 +44,19 @@ class Order(BaseModel):
     client_message_id: Optional[int] = None  # Telegram message ID sent to client
     # Sheet sync flag
     sheet_synced: Optional[bool] = None
+    # Admin notification ledger: done once every admin got the alert (or it gave up)
+    admin_notified: Optional[bool] = None
+    admin_notified_at: Optional[datetime] = None
+    # Admins who already received the alert, recorded one by one as they get it
+    admin_notified_to: Optional[List[int]] = None
+    # Lease held by the notifier currently sending the alert, and its expiry (or retry time)
+    admin_notify_lease: Optional[str] = None
+    admin_notify_until: Optional[datetime] = None
+    admin_notify_attempts: Optional[int] = None
+    # Status currently accounted for in the daily_stats rollup
+    stats_status: Optional[str] = None
+    # Uzbekistan calendar day of created_at (YYYY-MM-DD), for day-bucketed queries
+    local_date: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -76,4 +89,11 @@ class ClientNotification(BaseModel):
     status: OrderStatus
     message: str
     sent: bool = False
+    sent_at: Optional[datetime] = None
+    # Delivery lease: a worker owns the notification until lease_until
+    lease_id: Optional[str] = None
+    lease_until: Optional[datetime] = None
+    attempts: int = 0
+    failed: Optional[bool] = None  # gave up after NOTIFICATION_MAX_ATTEMPTS
+    last_error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow) 
\ No newline at end of file
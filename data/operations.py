@@ -1,8 +1,17 @@
-from typing import List, Optional, Dict, Set
+import hashlib
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Dict, Set, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import unquote
+import numpy as np
+from pymongo import InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import OperationFailure
 from .database import db
-from .config import ADMIN_IDS
+from .config import ADMIN_IDS, ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL, CATALOG_CACHE_TTL
 from .models import Order, InventoryItem, Admin, Config, OrderStatus, ClientNotification
+from utils.cache import ResultCache
+from utils.helpers import Period, local_day_start_utc, local_today, parse_period, to_local_date
+from utils.metrics import instrument_operations
 # Order Operations
 def _stringify_mongo_id(doc: dict) -> dict:
     """Convert Mongo ObjectId in _id field to string for Pydantic models."""
@@ -22,7 +31,14 @@ def _stringify_mongo_id(doc: dict) -> dict:
 async def create_order(order: Order) -> str:
     """Create a new order"""
     order.updated_at = datetime.utcnow()
-    result = await db.orders.insert_one(order.dict(exclude={'id'}))
+    order.local_date = to_local_date(order.created_at)
+    doc = order.dict(exclude={'id'})
+    result = await db.orders.insert_one(doc)
+    invalidate_analytics(doc.get("created_at"))
+    try:
+        await apply_order_to_daily_stats({**doc, "_id": result.inserted_id})
+    except Exception as e:
+        print(f"Failed to update daily stats for order {result.inserted_id}: {e}")
     return str(result.inserted_id)
 
 async def get_order(order_id: str) -> Optional[Order]:
@@ -32,47 +48,406 @@ async def get_order(order_id: str) -> Optional[Order]:
     doc = _stringify_mongo_id(doc)
     return Order(**doc) if doc else None
 
-async def get_new_orders() -> List[Order]:
-    """Get all new orders"""
-    cursor = db.orders.find({"status": OrderStatus.NEW}).sort("created_at", -1)
+# Field projections for order reads. Orders read with a partial projection
+# keep model defaults (None) for every field left out.
+# "card": what order cards and the list views render (no summary HTML,
+#   phone/address or bookkeeping fields)
+# "notify": card + what the new-order monitor needs for the Sheets row and
+#   daily_stats
+# "full": the whole document (/order_<ID>, exports)
+_CARD_FIELDS = (
+    "user_id", "items", "total", "delivery", "time", "method", "status",
+    "contact", "name", "customer_name",
+    "requires_payment_check", "payment_verified", "payment_amount",
+    "created_at", "updated_at",
+)
+ORDER_PROJECTIONS: Dict[str, Optional[Dict[str, int]]] = {
+    "card": {field: 1 for field in _CARD_FIELDS},
+    "notify": {field: 1 for field in _CARD_FIELDS + (
+        "phone", "address", "customer_phone", "customer_address", "sheet_synced", "stats_status",
+    )},
+    "full": None,
+}
+
+def _order_projection(projection: str) -> Optional[Dict[str, int]]:
+    try:
+        return ORDER_PROJECTIONS[projection]
+    except KeyError:
+        raise ValueError(f"Unknown order projection: {projection!r}") from None
+
+# Streaming readers: the iter_* functions yield results from one cursor fetched
+# `batch_size` documents per round trip, so callers hold O(batch) memory
+# however large the result set is; `limit` caps the total. The get_* list
+# functions are thin wrappers for callers that need everything at once.
+ITER_BATCH_SIZE = 500
+
+def _batched(cursor, batch_size: int, limit: Optional[int]):
+    cursor = cursor.batch_size(batch_size)
+    return cursor.limit(limit) if limit else cursor
+
+async def iter_new_orders(projection: str = "full", batch_size: int = ITER_BATCH_SIZE,
+                          limit: Optional[int] = None) -> AsyncIterator[Order]:
+    """Yield new orders, newest first (see ORDER_PROJECTIONS for `projection`)"""
+    cursor = db.orders.find({"status": OrderStatus.NEW}, _order_projection(projection)).sort("created_at", -1)
+    async for doc in _batched(cursor, batch_size, limit):
+        yield Order(**_stringify_mongo_id(doc))
+
+async def get_new_orders(projection: str = "full") -> List[Order]:
+    """Get all new orders (see ORDER_PROJECTIONS for `projection`)"""
+    return [order async for order in iter_new_orders(projection)]
+
+# New-order notifications: every NEW order without admin_notified is announced.
+# A notifier takes a lease on the order (admin_notify_lease/admin_notify_until)
+# and renews it while sending. Each admin who gets the alert is recorded right
+# away (admin_notified_to), so a retry, or a crash mid-send, only re-sends to
+# admins who didn't get it. Once all admins have it (or after
+# ORDER_NOTIFY_MAX_ATTEMPTS) the order is marked admin_notified; otherwise the
+# lease is released for a retry after ORDER_NOTIFY_RETRY. Every write after the
+# claim is fenced by the lease id, so a notifier whose lease expired and was
+# taken over changes nothing.
+#
+# There is no created_at watermark: orders can turn NEW long after they were
+# inserted (pending_admin_confirmation -> new), and a watermark skips them. The
+# delta is bounded by the status_notified index instead, which only holds
+# unannounced NEW orders in its (status=new, admin_notified!=true) range.
+ORDER_NOTIFY_LEASE = timedelta(minutes=2)
+ORDER_NOTIFY_RETRY = timedelta(seconds=30)
+ORDER_NOTIFY_MAX_ATTEMPTS = 5
+NEW_ORDERS_BATCH = 100
+
+@dataclass
+class OrderNotifyLease:
+    """A notifier's claim on announcing one order"""
+    order_id: str
+    lease_id: str
+    alerted: Set[int]
+    attempts: int
+
+def _unnotified_filter(now: datetime) -> dict:
+    """NEW orders not announced yet and not leased by a notifier (status_notified index)"""
+    return {
+        "status": OrderStatus.NEW,
+        "admin_notified": {"$ne": True},
+        "$or": [{"admin_notify_until": None}, {"admin_notify_until": {"$lt": now}}],
+    }
+
+async def get_unnotified_new_orders(limit: int = NEW_ORDERS_BATCH,
+                                    projection: str = "full") -> List[Order]:
+    """Get NEW orders admins haven't been notified about, oldest first (at most `limit`).
+
+    There is no created_at cutoff: an order that becomes NEW long after it was
+    inserted (e.g. from pending_admin_confirmation) is still found.
+    """
+    query = _unnotified_filter(datetime.utcnow())
+    cursor = db.orders.find(query, _order_projection(projection)).sort([("created_at", 1), ("_id", 1)]).limit(limit)
     orders = []
     async for doc in cursor:
         orders.append(Order(**_stringify_mongo_id(doc)))
     return orders
 
-async def get_active_orders() -> List[Order]:
+async def claim_order_notification(order_id: str, notifier_id: str = "") -> Optional[OrderNotifyLease]:
+    """Take the notification lease on an order; None if it was notified or is leased.
+
+    Renew it with renew_order_notification while sending, record each admin
+    with record_admin_alerted and release it with finish_order_notification.
+    """
+    from bson import ObjectId
+    from pymongo import ReturnDocument
+    from uuid import uuid4
+    now = datetime.utcnow()
+    query = _unnotified_filter(now)
+    del query["status"]
+    query["_id"] = ObjectId(order_id)
+    lease_id = f"{notifier_id}:{uuid4().hex}"
+    doc = await db.orders.find_one_and_update(
+        query,
+        {"$set": {"admin_notify_lease": lease_id, "admin_notify_until": now + ORDER_NOTIFY_LEASE},
+         "$inc": {"admin_notify_attempts": 1}},
+        projection={"admin_notified_to": 1, "admin_notify_attempts": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return None
+    return OrderNotifyLease(order_id, lease_id, set(doc.get("admin_notified_to") or ()), doc["admin_notify_attempts"])
+
+def _leased(lease: OrderNotifyLease) -> dict:
+    from bson import ObjectId
+    return {"_id": ObjectId(lease.order_id), "admin_notify_lease": lease.lease_id}
+
+async def renew_order_notification(lease: OrderNotifyLease) -> bool:
+    """Push out the lease while alerts are still being sent; False if it was lost"""
+    result = await db.orders.update_one(
+        _leased(lease), {"$set": {"admin_notify_until": datetime.utcnow() + ORDER_NOTIFY_LEASE}}
+    )
+    return result.matched_count > 0
+
+async def record_admin_alerted(lease: OrderNotifyLease, admin_id: int) -> bool:
+    """Record that one admin received the alert; False if the lease was lost"""
+    result = await db.orders.update_one(_leased(lease), {"$addToSet": {"admin_notified_to": admin_id}})
+    lease.alerted.add(admin_id)
+    return result.matched_count > 0
+
+async def finish_order_notification(lease: OrderNotifyLease, complete: bool) -> bool:
+    """Mark the order notified (`complete`) or release it for a retry after ORDER_NOTIFY_RETRY.
+
+    False if the lease was lost to another notifier, which then owns the order.
+    """
+    now = datetime.utcnow()
+    if complete:
+        update = {"$set": {"admin_notified": True, "admin_notified_at": now},
+                  "$unset": {"admin_notify_until": "", "admin_notify_lease": ""}}
+    else:
+        update = {"$set": {"admin_notify_until": now + ORDER_NOTIFY_RETRY}, "$unset": {"admin_notify_lease": ""}}
+    result = await db.orders.update_one(_leased(lease), update)
+    return result.modified_count > 0
+
+async def iter_active_orders(projection: str = "full", batch_size: int = ITER_BATCH_SIZE,
+                             limit: Optional[int] = None) -> AsyncIterator[Order]:
+    """Yield active orders (NEW, ACCEPTED, IN_PROGRESS, READY), newest first.
+
+    `projection` as in ORDER_PROJECTIONS
+    """
+    cursor = db.orders.find({"status": {"$in": ACTIVE_STATUSES}}, _order_projection(projection)).sort("created_at", -1)
+    async for doc in _batched(cursor, batch_size, limit):
+        yield Order(**_stringify_mongo_id(doc))
+
+async def get_active_orders(projection: str = "full") -> List[Order]:
     """Get all active orders (not completed, cancelled, or payment_failed).
     
     Returns orders with status: NEW, ACCEPTED, IN_PROGRESS, READY
-    Sorted by created_at (newest first)
+    Sorted by created_at (newest first); `projection` as in ORDER_PROJECTIONS
     """
-    active_statuses = [
-        OrderStatus.NEW,
-        OrderStatus.ACCEPTED,
-        OrderStatus.IN_PROGRESS,
-        OrderStatus.READY
-    ]
-    cursor = db.orders.find({"status": {"$in": active_statuses}}).sort("created_at", -1)
-    orders = []
-    async for doc in cursor:
-        orders.append(Order(**_stringify_mongo_id(doc)))
-    return orders
+    return [order async for order in iter_active_orders(projection)]
+
+ACTIVE_STATUSES = [OrderStatus.NEW, OrderStatus.ACCEPTED, OrderStatus.IN_PROGRESS, OrderStatus.READY]
+
+async def count_orders(statuses: List[OrderStatus], newer_than: Optional[Tuple[datetime, str]] = None) -> int:
+    """Count orders in `statuses`, optionally only those listed before a (created_at, id) key"""
+    query = {"status": {"$in": statuses}}
+    if newer_than is not None:
+        query.update(_keyset_filter(newer_than, "$gt"))
+    return await db.orders.count_documents(query)
+
+def _keyset_filter(key: Tuple[datetime, str], op: str) -> dict:
+    from bson import ObjectId
+    created_at, order_id = key
+    return {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "_id": {op: ObjectId(order_id)}},
+    ]}
+
+async def get_orders_page(statuses: List[OrderStatus],
+                          after: Optional[Tuple[datetime, str]] = None,
+                          before: Optional[Tuple[datetime, str]] = None,
+                          limit: int = 10,
+                          projection: str = "card") -> Tuple[List[Order], bool]:
+    """One page of orders in `statuses`, newest first, by keyset on (created_at, _id).
+
+    `after` returns the page following that key (older orders), `before` the
+    page preceding it (newer orders). Also returns whether more orders exist
+    beyond the page in the direction of travel. Served by the
+    status_created_at index, so the cost doesn't grow with the page number.
+    """
+    query = {"status": {"$in": statuses}}
+    direction = -1
+    if after is not None:
+        query.update(_keyset_filter(after, "$lt"))
+    elif before is not None:
+        query.update(_keyset_filter(before, "$gt"))
+        direction = 1
+    cursor = (
+        db.orders.find(query, _order_projection(projection))
+        .sort([("created_at", direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+    orders = [Order(**_stringify_mongo_id(doc)) async for doc in cursor]
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    if direction == 1:
+        orders.reverse()
+    return orders, has_more
+
+# Change stream error codes meaning the deployment cannot serve change streams
+# (standalone mongod / unsupported storage engine)
+CHANGE_STREAM_UNSUPPORTED_CODES = {20, 40573}
+# Resume token is older than the oplog window or otherwise unusable
+CHANGE_STREAM_HISTORY_LOST_CODES = {280, 286}
+
+def watch_new_orders(resume_after: Optional[dict] = None):
+    """Open a change stream on orders that emits orders becoming NEW.
+
+    Matches inserts/replacements of NEW orders and updates that set status to NEW.
+    `fullDocument` is looked up so events carry the whole order.
+    Use as `async with watch_new_orders(token) as stream: async for change in stream`.
+    """
+    pipeline = [{
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace"]}, "fullDocument.status": OrderStatus.NEW.value},
+                {"operationType": "update", "updateDescription.updatedFields.status": OrderStatus.NEW.value},
+            ]
+        }
+    }]
+    return db.orders.watch(pipeline, full_document="updateLookup", resume_after=resume_after)
+
+def order_from_change(change: dict) -> Optional[Order]:
+    """Build an Order from a change stream event (None if it has no fullDocument)"""
+    doc = change.get("fullDocument")
+    return Order(**_stringify_mongo_id(doc)) if doc else None
+
+async def get_resume_token(stream_name: str) -> Optional[dict]:
+    """Get the stored change stream resume token for a named stream"""
+    doc = await db.config.find_one({"key": f"resume_token:{stream_name}"})
+    return doc.get("value") if doc else None
+
+async def save_resume_token(stream_name: str, token: Optional[dict]) -> None:
+    """Persist (or clear with None) the resume token for a named stream"""
+    await db.config.update_one(
+        {"key": f"resume_token:{stream_name}"},
+        {"$set": {"value": token, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
 
 async def update_order_status(order_id: str, status: OrderStatus) -> bool:
-    """Update order status"""
+    """Update order status and apply the transition to daily_stats"""
     from bson import ObjectId
-    result = await db.orders.update_one(
+    before = await db.orders.find_one_and_update(
         {"_id": ObjectId(order_id)},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+        projection=STATS_PROJECTION,
     )
-    return result.modified_count > 0
+    if before is None:
+        return False
+    invalidate_analytics(before.get("created_at"))
+    try:
+        await apply_order_to_daily_stats({**before, "status": status})
+    except Exception as e:
+        print(f"Failed to update daily stats for order {order_id}: {e}")
+    return True
+
+# Statuses an order is not moved out of by bulk updates
+CLOSED_STATUSES = {OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value, OrderStatus.PAYMENT_FAILED.value}
+# Upper bound on orders touched by one bulk status update
+BULK_STATUS_LIMIT = 500
+
+@dataclass
+class BulkStatusResult:
+    """Outcome of bulk_update_order_status"""
+    status: OrderStatus
+    # Changed orders as stored after the update (for client notifications)
+    changed: List[Order] = field(default_factory=list)
+    # order id -> reason: invalid_id, not_found, same_status, closed, wrong_status, conflict
+    skipped: Dict[str, str] = field(default_factory=dict)
+
+async def bulk_update_order_status(order_ids: Optional[List[str]], status: OrderStatus,
+                                   from_status: Optional[OrderStatus] = None) -> BulkStatusResult:
+    """Move many orders to `status` with one bulk_write.
+
+    `order_ids=None` selects every order currently in `from_status` (at most
+    BULK_STATUS_LIMIT). Orders already in `status`, closed ones (completed,
+    cancelled, payment failed) and, with `from_status`, orders in another
+    status are skipped. Each update is compare-and-set on the status and
+    stats_status that were read, so an order changed concurrently is skipped
+    as a conflict; the daily_stats deltas of all changed orders go out in
+    one more bulk_write.
+    """
+    from bson import ObjectId
+    result = BulkStatusResult(status)
+    if order_ids is None:
+        if from_status is None:
+            return result
+        query = {"status": from_status}
+        cursor = db.orders.find(query, STATS_PROJECTION).sort("created_at", 1).limit(BULK_STATUS_LIMIT)
+    else:
+        object_ids = []
+        for order_id in dict.fromkeys(order_ids):
+            if ObjectId.is_valid(order_id):
+                object_ids.append(ObjectId(order_id))
+            else:
+                result.skipped[order_id] = "invalid_id"
+        if not object_ids:
+            return result
+        cursor = db.orders.find({"_id": {"$in": object_ids}}, STATS_PROJECTION)
+    docs = {str(doc["_id"]): doc async for doc in cursor}
+    if order_ids is not None:
+        for order_id in order_ids:
+            if order_id not in docs and order_id not in result.skipped:
+                result.skipped[order_id] = "not_found"
+
+    now = datetime.utcnow()
+    requests = []
+    deltas: Dict[str, Dict[str, int]] = {}
+    pending: Dict[str, dict] = {}
+    new_key = _status_key(status)
+    for order_id, doc in docs.items():
+        current = _status_key(doc.get("status"))
+        if current == new_key:
+            result.skipped[order_id] = "same_status"
+        elif current in CLOSED_STATUSES:
+            result.skipped[order_id] = "closed"
+        elif from_status is not None and current != _status_key(from_status):
+            result.skipped[order_id] = "wrong_status"
+        else:
+            update = {"status": status, "updated_at": now}
+            if isinstance(doc.get("created_at"), datetime):
+                update.update(stats_status=new_key, local_date=to_local_date(doc["created_at"]))
+            requests.append(UpdateOne(
+                {"_id": doc["_id"], "status": doc.get("status"), "stats_status": doc.get("stats_status")},
+                {"$set": update},
+            ))
+            pending[order_id] = doc
+    if not requests:
+        return result
+    write = await db.orders.bulk_write(requests, ordered=False)
+
+    ids = [doc["_id"] for doc in pending.values()]
+    if write.modified_count == len(requests):
+        query = {"_id": {"$in": ids}}
+    else:
+        # Lost the compare-and-set on some orders; those kept someone else's status
+        query = {"_id": {"$in": ids}, "status": status, "updated_at": now}
+    changed = {str(doc["_id"]): doc async for doc in db.orders.find(query)}
+    for order_id, doc in pending.items():
+        if order_id not in changed:
+            result.skipped[order_id] = "conflict"
+            continue
+        result.changed.append(Order(**_stringify_mongo_id(changed[order_id])))
+        created_at = doc.get("created_at")
+        invalidate_analytics(created_at)
+        if isinstance(created_at, datetime):
+            day = deltas.setdefault(to_local_date(created_at), {})
+            for key, value in _stats_delta(doc, doc.get("stats_status"), new_key).items():
+                day[key] = day.get(key, 0) + value
+    stats = [
+        UpdateOne({"_id": day}, {"$inc": delta, "$set": {"updated_at": now}}, upsert=True)
+        for day, delta in deltas.items() if any(delta.values())
+    ]
+    if stats:
+        try:
+            await db.daily_stats.bulk_write(stats, ordered=False)
+        except Exception as e:
+            print(f"Failed to update daily stats after bulk status change: {e}")
+    return result
+
+async def update_order_message_ids(message_ids: Dict[str, int]) -> int:
+    """Store client message IDs of many orders in one bulk_write; returns the number updated"""
+    from bson import ObjectId
+    now = datetime.utcnow()
+    requests = [
+        UpdateOne({"_id": ObjectId(order_id)}, {"$set": {"client_message_id": message_id, "updated_at": now}})
+        for order_id, message_id in message_ids.items()
+    ]
+    if not requests:
+        return 0
+    result = await db.orders.bulk_write(requests, ordered=False)
+    return result.modified_count
 
 async def update_order_message_id(order_id: str, message_id: int) -> bool:
     """Update order with client message ID for editing"""
     from bson import ObjectId
     result = await db.orders.update_one(
         {"_id": ObjectId(order_id)},
-        {"$set": {"client_message_id": message_id}}
+        {"$set": {"client_message_id": message_id, "updated_at": datetime.utcnow()}}
     )
     return result.modified_count > 0
 
@@ -85,51 +460,230 @@ async def mark_order_sheet_synced(order_id: str) -> bool:
     )
     return result.modified_count > 0
 
-async def get_orders_by_period(period: str) -> List[Order]:
-    """Get orders for a specific period"""
+# Only recent orders are re-sent, so enabling Sheets doesn't replay the whole history
+SHEETS_BACKLOG_LOOKBACK = timedelta(days=2)
+
+def _sheet_backlog_filter(now: datetime) -> dict:
+    return {"created_at": {"$gte": now - SHEETS_BACKLOG_LOOKBACK}, "admin_notified": True, "sheet_synced": {"$ne": True}}
+
+async def get_sheet_backlog(limit: int = 500) -> List[Order]:
+    """Announced orders from the last SHEETS_BACKLOG_LOOKBACK not yet synced to Google Sheets, oldest first"""
+    cursor = db.orders.find(_sheet_backlog_filter(datetime.utcnow())).sort("created_at", 1).limit(limit)
+    return [Order(**_stringify_mongo_id(doc)) async for doc in cursor]
+
+async def mark_orders_sheet_synced(order_ids: List[str]) -> int:
+    """Mark many orders as synced to Google Sheets in one bulk_write; returns modified count"""
+    from bson import ObjectId
+    if not order_ids:
+        return 0
     now = datetime.utcnow()
-    if period == "today":
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == "week":
-        start_date = now - timedelta(days=7)
-    elif period == "month":
-        start_date = now - timedelta(days=30)
-    else:
-        return []
-    
-    cursor = db.orders.find({"created_at": {"$gte": start_date}}).sort("created_at", -1)
-    orders = []
-    async for doc in cursor:
-        orders.append(Order(**_stringify_mongo_id(doc)))
-    return orders
+    requests = [
+        UpdateOne({"_id": ObjectId(order_id)}, {"$set": {"sheet_synced": True, "updated_at": now}})
+        for order_id in order_ids
+    ]
+    result = await db.orders.bulk_write(requests, ordered=False)
+    return result.modified_count
+
+def _local_days_filter(span: Period) -> dict:
+    """Orders created on the period's local days.
+
+    Orders are stamped with `local_date` by create_order, the daily_stats
+    accounting (every order the monitor sees) and backfill_local_dates; the
+    few not stamped yet are matched by created_at. Both branches use the
+    local_date_created_at index.
+    """
+    days = span.local_dates
+    return {"$or": [
+        {"local_date": {"$gte": days[0], "$lte": days[-1]}},
+        {"local_date": None, "created_at": {"$gte": span.start, "$lt": span.end}},
+    ]}
+
+async def iter_orders_by_period(period: str, projection: str = "full", batch_size: int = ITER_BATCH_SIZE,
+                                limit: Optional[int] = None) -> AsyncIterator[Order]:
+    """Yield orders for a period (see utils.helpers.parse_period), newest first.
+
+    `projection` as in ORDER_PROJECTIONS; an unknown period yields nothing.
+    """
+    try:
+        span = parse_period(period)
+    except ValueError:
+        return
+    cursor = db.orders.find(_local_days_filter(span), _order_projection(projection)).sort("created_at", -1)
+    async for doc in _batched(cursor, batch_size, limit):
+        yield Order(**_stringify_mongo_id(doc))
+
+async def get_orders_by_period(period: str, projection: str = "full") -> List[Order]:
+    """Get orders for a specific period (`projection` as in ORDER_PROJECTIONS)"""
+    return [order async for order in iter_orders_by_period(period, projection)]
+
+async def iter_orders_between(start: datetime, end: datetime, projection: Optional[Dict[str, int]] = None,
+                              batch_size: int = 1000, limit: Optional[int] = None) -> AsyncIterator[dict]:
+    """Yield raw order documents created in [start, end), oldest first (exports, reports over history)"""
+    cursor = db.orders.find({"created_at": {"$gte": start, "$lt": end}}, projection).sort("created_at", 1)
+    async for doc in _batched(cursor, batch_size, limit):
+        yield doc
 
 # -------------------------------
 # Analytics helpers
 # -------------------------------
-def _period_start(period: str) -> datetime:
-    now = datetime.utcnow()
-    p = (period or "").lower().strip()
-    if p in ("today", "day", "сегодня"):
-        return now.replace(hour=0, minute=0, second=0, microsecond=0)
-    if p in ("week", "неделя"):
-        return now - timedelta(days=7)
-    if p in ("month", "месяц"):
-        return now - timedelta(days=30)
+# Report periods are whole Uzbekistan-local days (utils.helpers.parse_period),
+# so they line up with the daily_stats rollup and repeated reports share a cache key
+DEFAULT_PERIOD = "week"
+
+def _period(period: str) -> Period:
     # default to week if unknown
-    return now - timedelta(days=7)
+    try:
+        return parse_period(period)
+    except ValueError:
+        return parse_period(DEFAULT_PERIOD)
 
-async def analytics_summary(period: str) -> Dict[str, object]:
+def _period_start(period: str) -> datetime:
+    return _period(period).start
+
+def _created_between(start: datetime, end: Optional[datetime]) -> dict:
+    return {"$gte": start, "$lt": end} if end else {"$gte": start}
+
+def _days_between(start: datetime, end: Optional[datetime]) -> dict:
+    """daily_stats _id range for [start, end)"""
+    return {"$gte": to_local_date(start), "$lt": to_local_date(end)} if end else {"$gte": to_local_date(start)}
+
+# Statuses that don't count towards order totals (raw strings, to tolerate
+# legacy spellings and statuses unknown to OrderStatus)
+CANCELLED_STATUSES = ("cancelled", "canceled", "payment_failed")
+TOP_ITEMS_LIMIT = 3
+
+def _top_items(item_key_to_qty: Dict[str, int]) -> List[Tuple[str, int]]:
+    # Ties are broken by key: the pipeline can't keep the first-seen order the
+    # original Python loop did, and both paths must agree exactly
+    return sorted(item_key_to_qty.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_ITEMS_LIMIT]
+
+def _safe_int(value) -> Optional[int]:
+    """Quantity/total as `int(value or 0)` did originally; None where that raised (see _int_expr)"""
+    try:
+        return int(value or 0)
+    except Exception:
+        return None
+
+# Strings int() accepts, once trimmed of INT_STRING_SPACE: an optional sign
+# and digits, single underscores allowed between them (" 3 ", "+3", "1_000")
+INT_STRING_PATTERN = r"^[+-]?[0-9]+(_[0-9]+)*$"
+INT_STRING_SPACE = " \t\n\r\x0b\x0c"
+# Types $convert turns into a number the way int() does; anything else
+# (decimal, date, objectId, ...) makes int() raise
+INT_CONVERTIBLE_TYPES = ["int", "long", "double", "bool", "string"]
+
+def _int_expr(field: str) -> dict:
+    """Aggregation mirror of _safe_int: falsy -> 0, what int() accepts -> the int, else None.
+
+    Known differences from int(): non-ASCII digits and whitespace, and
+    values beyond 64 bits, are None here.
     """
-    Compute analytics for a period.
-    Metrics:
-      - orders_total: non-cancelled count
-      - orders_completed: completed count
-      - revenue_completed: sum(total) for completed
-      - avg_check_completed: revenue_completed / orders_completed (if >0)
-      - top_items: list[(key, qty)] top-3 by quantity across non-cancelled
+    is_string = {"$eq": [{"$type": "$$value"}, "string"]}
+    trimmed = {"$trim": {"input": "$$value", "chars": INT_STRING_SPACE}}
+    # int() takes "+3" and "1_000"; $convert only plain digits with a "-"
+    digits = {"$replaceAll": {"input": {"$let": {"vars": {"t": trimmed}, "in": {"$cond": [
+        {"$eq": [{"$substrCP": ["$$t", 0, 1]}, "+"]},
+        {"$substrCP": ["$$t", 1, {"$strLenCP": "$$t"}]},
+        "$$t",
+    ]}}}, "find": "_", "replacement": ""}}
+    return {"$let": {
+        "vars": {"value": field},
+        "in": {"$cond": [
+            # Falsy values: `value or 0`
+            {"$in": [{"$ifNull": ["$$value", None]}, [None, "", False, 0, {"$literal": {}}, {"$literal": []}]]},
+            0,
+            {"$cond": [
+                {"$not": [{"$in": [{"$type": "$$value"}, INT_CONVERTIBLE_TYPES]}]},
+                None,
+                {"$cond": [
+                    is_string,
+                    # $regexMatch only accepts strings, hence the nested $cond
+                    {"$cond": [
+                        {"$regexMatch": {"input": trimmed, "regex": INT_STRING_PATTERN}},
+                        {"$convert": {"input": digits, "to": "long", "onError": None, "onNull": 0}},
+                        None,
+                    ]},
+                    {"$convert": {"input": "$$value", "to": "long", "onError": None, "onNull": 0}},
+                ]},
+            ]},
+        ]},
+    }}
+
+def analytics_pipeline(start: datetime, end: Optional[datetime] = None) -> List[dict]:
+    """Aggregation pipeline computing analytics_summary's counts server-side.
+
+    Result: one document with `counts` ([{orders_total, orders_completed,
+    revenue_completed}] or [] when there are no orders) and `top_items`
+    ([{_id: key, qty}] top-3 across non-cancelled orders).
     """
-    start = _period_start(period)
-    cursor = db.orders.find({"created_at": {"$gte": start}})
+    status = {"$toLower": {"$convert": {"input": "$status", "to": "string", "onError": "", "onNull": ""}}}
+    total = {"$ifNull": [_int_expr("$total"), 0]}
+    return [
+        {"$match": {"created_at": _created_between(start, end)}},
+        {"$project": {
+            "_id": 0,
+            "items": 1,
+            "total": 1,
+            "cancelled": {"$in": [status, list(CANCELLED_STATUSES)]},
+            "completed": {"$eq": [status, "completed"]},
+        }},
+        {"$facet": {
+            "counts": [
+                {"$group": {
+                    "_id": None,
+                    "orders_total": {"$sum": {"$cond": ["$cancelled", 0, 1]}},
+                    "orders_completed": {"$sum": {"$cond": ["$completed", 1, 0]}},
+                    "revenue_completed": {"$sum": {"$cond": ["$completed", total, 0]}},
+                }},
+            ],
+            "top_items": [
+                {"$match": {"cancelled": False}},
+                {"$project": {"items": {"$cond": [
+                    {"$eq": [{"$type": "$items"}, "object"]}, {"$objectToArray": "$items"}, []
+                ]}}},
+                {"$unwind": "$items"},
+                {"$project": {"key": "$items.k", "qty": _int_expr("$items.v")}},
+                {"$match": {"qty": {"$ne": None}}},
+                {"$group": {"_id": "$key", "qty": {"$sum": "$qty"}}},
+                {"$sort": {"qty": -1, "_id": 1}},
+                {"$limit": TOP_ITEMS_LIMIT},
+            ],
+        }},
+    ]
+
+def _summary(period: str, start: datetime, orders_total: int, orders_completed: int,
+             revenue_completed: int, top_items: List[Tuple[str, int]]) -> Dict[str, object]:
+    avg_check_completed = (revenue_completed // orders_completed) if orders_completed > 0 else 0
+    return {
+        "orders_total": orders_total,
+        "orders_completed": orders_completed,
+        "revenue_completed": revenue_completed,
+        "avg_check_completed": avg_check_completed,
+        "top_items": top_items,
+        "period": period,
+        "start": start,
+    }
+
+async def _analytics_summary_pipeline(period: str, start: datetime,
+                                     end: Optional[datetime] = None) -> Dict[str, object]:
+    """analytics_summary computed by the aggregation pipeline (five numbers over the wire)."""
+    result = await db.orders.aggregate(analytics_pipeline(start, end)).to_list(length=1)
+    facets = result[0] if result else {}
+    counts = (facets.get("counts") or [{}])[0]
+    top_items = [(doc["_id"], int(doc["qty"])) for doc in facets.get("top_items", [])]
+    return _summary(
+        period,
+        start,
+        int(counts.get("orders_total", 0)),
+        int(counts.get("orders_completed", 0)),
+        int(counts.get("revenue_completed", 0)),
+        top_items,
+    )
+
+async def _analytics_summary_python(period: str, start: datetime,
+                                   end: Optional[datetime] = None) -> Dict[str, object]:
+    """analytics_summary computed in Python over raw order documents (fallback path)."""
+    cursor = db.orders.find({"created_at": _created_between(start, end)}, {"status": 1, "items": 1, "total": 1})
 
     # Aggregate on raw docs to tolerate unknown statuses like 'pending_admin_confirmation'
     orders_total = 0
@@ -137,11 +691,10 @@ async def analytics_summary(period: str) -> Dict[str, object]:
     revenue_completed = 0
     item_key_to_qty: Dict[str, int] = {}
 
-    async for raw in cursor:
-        doc = _stringify_mongo_id(raw)
+    async for doc in cursor:
         status_raw = str(doc.get("status", "")).lower()
 
-        is_cancelled = status_raw in ("cancelled", "canceled", "payment_failed")
+        is_cancelled = status_raw in CANCELLED_STATUSES
         is_completed = status_raw == "completed"
 
         if not is_cancelled:
@@ -149,36 +702,411 @@ async def analytics_summary(period: str) -> Dict[str, object]:
             items = doc.get("items") or {}
             if isinstance(items, dict):
                 for key, qty in items.items():
-                    try:
-                        item_key_to_qty[key] = item_key_to_qty.get(key, 0) + int(qty or 0)
-                    except Exception:
-                        continue
+                    qty = _safe_int(qty)
+                    if qty is not None:
+                        item_key_to_qty[key] = item_key_to_qty.get(key, 0) + qty
 
         if is_completed:
             orders_completed += 1
-            try:
-                revenue_completed += int(doc.get("total") or 0)
-            except Exception:
-                pass
+            revenue_completed += _safe_int(doc.get("total")) or 0
 
-    avg_check_completed = (revenue_completed // orders_completed) if orders_completed > 0 else 0
-    top_items = sorted(item_key_to_qty.items(), key=lambda kv: kv[1], reverse=True)[:3]
+    return _summary(period, start, orders_total, orders_completed, revenue_completed, _top_items(item_key_to_qty))
 
-    return {
-        "orders_total": orders_total,
-        "orders_completed": orders_completed,
-        "revenue_completed": revenue_completed,
-        "avg_check_completed": avg_check_completed,
-        "top_items": top_items,
-        "period": period,
-        "start": start,
-    }
+# -------------------------------
+# Daily sales rollup (daily_stats)
+# -------------------------------
+# One document per Uzbekistan-local day: {_id: "YYYY-MM-DD", counts: {status: n},
+# revenue_completed, items: {key: qty over non-cancelled orders}, item_orders:
+# {key: number of those orders}}. Item keys are stored through _item_field so
+# any key ("1.5 кг", "$x") can be a field name. Each order
+# records the status it is accounted under in `stats_status`, so moving it to a
+# new status applies exactly one delta. Rebuild history with
+# scripts/rebuild_daily_stats.py.
+DAILY_STATS_BUILT_KEY = "daily_stats_built_at"
+STATS_PROJECTION = {"status": 1, "stats_status": 1, "created_at": 1, "items": 1, "total": 1}
+# Orders per stats_status stamping write in rebuild_daily_stats
+STATS_STAMP_BATCH = 1000
+
+def _status_key(status) -> str:
+    return str(getattr(status, "value", status) or "").lower() or "unknown"
+
+def _item_field(key: str) -> str:
+    """An item key as a daily_stats field name: "%", "." and "$" are percent-encoded"""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def _item_key(field: str) -> str:
+    """Inverse of _item_field"""
+    return unquote(field)
+
+def _stats_contribution(status: str, items, total) -> Dict[str, int]:
+    """$inc fields an order with this status adds to its day (same rules as analytics_summary)"""
+    inc = {f"counts.{status}": 1}
+    if status == "completed":
+        inc["revenue_completed"] = _safe_int(total) or 0
+    if status not in CANCELLED_STATUSES and isinstance(items, dict):
+        for key, qty in items.items():
+            qty = _safe_int(qty)
+            if qty is None:
+                continue
+            field = _item_field(key)
+            inc[f"items.{field}"] = inc.get(f"items.{field}", 0) + qty
+            # Tells an item ordered 0 times apart from one whose orders were all cancelled
+            inc[f"item_orders.{field}"] = 1
+    return inc
+
+def _stats_delta(doc: dict, old_status: Optional[str], new_status: str) -> Dict[str, int]:
+    delta = _stats_contribution(new_status, doc.get("items"), doc.get("total"))
+    if old_status is not None:
+        for field, value in _stats_contribution(old_status, doc.get("items"), doc.get("total")).items():
+            delta[field] = delta.get(field, 0) - value
+    return {field: value for field, value in delta.items() if value}
+
+async def apply_order_to_daily_stats(doc: dict) -> bool:
+    """Account a raw order's current status in daily_stats; True if the rollup changed.
+
+    `stats_status` is compare-and-set on the order first, so concurrent callers
+    (status change, monitor, create_order) apply each transition once.
+    """
+    from bson import ObjectId
+    for _ in range(3):
+        created_at = doc.get("created_at")
+        if not isinstance(created_at, datetime):
+            return False
+        order_id = doc["_id"]
+        if isinstance(order_id, str) and ObjectId.is_valid(order_id):
+            order_id = ObjectId(order_id)
+        status = _status_key(doc.get("status"))
+        counted = doc.get("stats_status")
+        if counted == status:
+            return False
+        # None matches both a missing field and an explicit null
+        # local_date rides along, so every order the monitor sees gets stamped
+        result = await db.orders.update_one(
+            {"_id": order_id, "stats_status": counted},
+            {"$set": {"stats_status": status, "local_date": to_local_date(created_at)}}
+        )
+        if result.modified_count:
+            delta = _stats_delta(doc, counted, status)
+            if delta:
+                await db.daily_stats.update_one(
+                    {"_id": to_local_date(created_at)},
+                    {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            return True
+        # Someone else moved stats_status; retry against the stored order
+        doc = await db.orders.find_one({"_id": order_id}, STATS_PROJECTION)
+        if not doc:
+            return False
+    return False
+
+async def record_order_stats(order: Order) -> bool:
+    """Account an Order model (e.g. one inserted by the client bot) in daily_stats"""
+    invalidate_analytics(order.created_at)
+    try:
+        return await apply_order_to_daily_stats({
+            "_id": order.id,
+            "status": order.status,
+            "stats_status": order.stats_status,
+            "created_at": order.created_at,
+            "items": order.items,
+            "total": order.total,
+        })
+    except Exception as e:
+        print(f"Failed to update daily stats for order {order.id}: {e}")
+        return False
+
+async def collect_daily_stats(query: Optional[dict] = None, seen: Optional[List[dict]] = None) -> Dict[str, Dict[str, int]]:
+    """Recompute every day's rollup fields ({day: {"counts.new": n, ...}}) from all (or the matching) orders.
+
+    Counted documents are appended to `seen` when given.
+    """
+    days: Dict[str, Dict[str, int]] = {}
+    async for doc in db.orders.find(query or {}, STATS_PROJECTION).batch_size(1000):
+        created_at = doc.get("created_at")
+        if not isinstance(created_at, datetime):
+            continue
+        if seen is not None:
+            seen.append(doc)
+        day = days.setdefault(to_local_date(created_at), {})
+        for field, value in _stats_contribution(_status_key(doc.get("status")), doc.get("items"), doc.get("total")).items():
+            day[field] = day.get(field, 0) + value
+    return days
+
+def _daily_stats_doc(fields: Dict[str, int], now: datetime) -> Dict[str, object]:
+    """A whole daily_stats document from collect_daily_stats fields (every group present, so $set replaces it)"""
+    doc: Dict[str, object] = {"counts": {}, "items": {}, "item_orders": {}, "revenue_completed": 0, "updated_at": now}
+    for field, value in fields.items():
+        group, _, key = field.partition(".")
+        if key:
+            doc[group][key] = value
+        else:
+            doc[field] = value
+    return doc
+
+async def rebuild_daily_stats() -> int:
+    """Replace daily_stats with a full recomputation and mark it built; returns the number of days.
+
+    The rollup is built in daily_stats_staging and swapped in with one rename,
+    so reports keep reading the previous rollup until the new one is whole.
+    Every order's stats_status is stamped with the status it was counted
+    under in the same scan; orders that changed status since are re-accounted
+    after the swap. A change landing between the stamping and the swap is
+    only corrected by reconcile_daily_stats (recent days) or a re-run.
+    """
+    seen: List[dict] = []
+    days = await collect_daily_stats(seen=seen)
+    now = datetime.utcnow()
+    staging = db.daily_stats_staging
+    await staging.drop()
+    requests = [InsertOne({"_id": day, **_daily_stats_doc(fields, now)}) for day, fields in days.items()]
+    if requests:
+        await staging.bulk_write(requests, ordered=False)
+    # Record the status each order was counted under, one update per status
+    counted: Dict[str, List] = {}
+    for doc in seen:
+        counted.setdefault(_status_key(doc.get("status")), []).append(doc["_id"])
+    for status, ids in counted.items():
+        for i in range(0, len(ids), STATS_STAMP_BATCH):
+            await db.orders.update_many({"_id": {"$in": ids[i:i + STATS_STAMP_BATCH]}},
+                                        {"$set": {"stats_status": status}})
+    await staging.rename(db.daily_stats.name, dropTarget=True)
+    await db.config.update_one(
+        {"key": DAILY_STATS_BUILT_KEY},
+        {"$set": {"value": now.isoformat(), "updated_at": now}},
+        upsert=True
+    )
+    # Deltas of status changes made during the scan went to the old rollup;
+    # move the orders from the status they were counted under to the current one
+    for status, ids in counted.items():
+        for i in range(0, len(ids), STATS_STAMP_BATCH):
+            moved = db.orders.find({"_id": {"$in": ids[i:i + STATS_STAMP_BATCH]}, "stats_status": status,
+                                    "status": {"$ne": status}}, STATS_PROJECTION)
+            async for doc in moved:
+                await apply_order_to_daily_stats(doc)
+    invalidate_analytics()
+    return len(days)
+
+async def reconcile_daily_stats(days: int = 2) -> int:
+    """Recompute the last `days` local days of daily_stats from raw orders; returns the number of orders re-accounted.
+
+    The incremental path only sees orders this bot inserts, changes or
+    announces. Orders the client bot creates or moves on its own (stuck in
+    pending_admin_confirmation, payment_failed, ...) drift until this runs.
+    No-op until the rollup has been built.
+    """
+    if days <= 0 or not await daily_stats_ready():
+        return 0
+    start = local_day_start_utc(local_today() - timedelta(days=days - 1))
+    seen: List[dict] = []
+    fields = await collect_daily_stats({"created_at": {"$gte": start}}, seen)
+    now = datetime.utcnow()
+    requests = [
+        UpdateOne({"_id": day}, {"$set": _daily_stats_doc(fields.get(day, {}), now)}, upsert=True)
+        for day in sorted(set(fields) | {to_local_date(start + timedelta(days=i)) for i in range(days)})
+    ]
+    await db.daily_stats.bulk_write(requests, ordered=False)
+    # Mark what was just counted; a status change racing with this run is
+    # corrected by the next one
+    stale = [
+        UpdateOne({"_id": doc["_id"], "status": doc.get("status")},
+                  {"$set": {"stats_status": _status_key(doc.get("status")), "local_date": to_local_date(doc["created_at"])}})
+        for doc in seen if doc.get("stats_status") != _status_key(doc.get("status"))
+    ]
+    if stale:
+        await db.orders.bulk_write(stale, ordered=False)
+    invalidate_analytics()
+    return len(stale)
+
+async def backfill_local_dates(batch_size: int = 1000) -> int:
+    """Stamp `local_date` on every order created before it existed; returns the number stamped.
+
+    Orders are grouped by day so each batch is one UpdateMany per day.
+    """
+    stamped = 0
+    pending: Dict[str, List] = {}
+
+    async def flush() -> int:
+        requests = [UpdateMany({"_id": {"$in": ids}}, {"$set": {"local_date": day}}) for day, ids in pending.items()]
+        pending.clear()
+        if not requests:
+            return 0
+        result = await db.orders.bulk_write(requests, ordered=False)
+        return result.modified_count
+
+    cursor = db.orders.find({"local_date": None}, {"created_at": 1}).batch_size(batch_size)
+    queued = 0
+    async for doc in cursor:
+        if not isinstance(doc.get("created_at"), datetime):
+            continue
+        pending.setdefault(to_local_date(doc["created_at"]), []).append(doc["_id"])
+        queued += 1
+        if queued % batch_size == 0:
+            stamped += await flush()
+    return stamped + await flush()
+
+async def daily_stats_ready() -> bool:
+    """True once scripts/rebuild_daily_stats.py has backfilled the rollup"""
+    return await db.config.find_one({"key": DAILY_STATS_BUILT_KEY}) is not None
+
+async def _analytics_summary_rollup(period: str, start: datetime,
+                                   end: Optional[datetime] = None) -> Dict[str, object]:
+    """analytics_summary from daily_stats: reads at most one small document per day."""
+    orders_total = 0
+    orders_completed = 0
+    revenue_completed = 0
+    item_key_to_qty: Dict[str, int] = {}
+    async for day in db.daily_stats.find({"_id": _days_between(start, end)}):
+        for status, count in (day.get("counts") or {}).items():
+            if status not in CANCELLED_STATUSES:
+                orders_total += count
+            if status == "completed":
+                orders_completed += count
+        revenue_completed += day.get("revenue_completed", 0)
+        item_orders = day.get("item_orders")
+        for field, qty in (day.get("items") or {}).items():
+            # Items whose orders were all cancelled later net out to 0 orders;
+            # days rolled up before item_orders existed only have the quantity
+            if (item_orders.get(field, 0) if item_orders is not None else qty):
+                key = _item_key(field)
+                item_key_to_qty[key] = item_key_to_qty.get(key, 0) + qty
+    return _summary(period, start, orders_total, orders_completed, revenue_completed, _top_items(item_key_to_qty))
+
+# Results keyed by (kind, days, start); a new day starts a new key, so entries
+# only need dropping when an order inside their [start, start + days) window is written
+analytics_cache = ResultCache(ttl=ANALYTICS_CACHE_TTL, maxsize=ANALYTICS_CACHE_SIZE)
+
+def invalidate_analytics(created_at: Optional[datetime] = None) -> int:
+    """Drop cached analytics whose period contains `created_at` (all when unknown)"""
+    if not isinstance(created_at, datetime):
+        return analytics_cache.invalidate()
+    return analytics_cache.invalidate(lambda key: key[2] <= created_at < key[2] + timedelta(days=key[1]))
+
+async def analytics_summary(period: str) -> Dict[str, object]:
+    """
+    Compute analytics for a period.
+    Metrics:
+      - orders_total: non-cancelled count
+      - orders_completed: completed count
+      - revenue_completed: sum(total) for completed
+      - avg_check_completed: revenue_completed / orders_completed (if >0)
+      - top_items: list[(key, qty)] top-3 by quantity across non-cancelled
+
+    Reads the daily_stats rollup once it has been built; otherwise runs an
+    aggregation pipeline, falling back to the Python path if the server
+    rejects it. Results are cached per period (see analytics_cache).
+    """
+    span = _period(period)
+    summary = await analytics_cache.get_or_compute(
+        ("summary", span.days, span.start),
+        lambda: _compute_analytics_summary(period, span.start, span.end),
+    )
+    # Aliases ("week"/"неделя") share an entry; keep the caller's spelling
+    return {**summary, "period": period}
+
+async def _compute_analytics_summary(period: str, start: datetime, end: datetime) -> Dict[str, object]:
+    if await daily_stats_ready():
+        return await _analytics_summary_rollup(period, start, end)
+    try:
+        return await _analytics_summary_pipeline(period, start, end)
+    except OperationFailure as e:
+        print(f"Analytics pipeline failed, using Python fallback: {e}")
+        return await _analytics_summary_python(period, start, end)
 
 async def analytics_earnings(period: str) -> int:
     """Return revenue for completed orders in period."""
+    span = _period(period)
+    return await analytics_cache.get_or_compute(
+        ("earnings", span.days, span.start),
+        lambda: _compute_analytics_earnings(period, span.start, span.end),
+    )
+
+async def _compute_analytics_earnings(period: str, start: datetime, end: datetime) -> int:
+    if await daily_stats_ready():
+        cursor = db.daily_stats.find({"_id": _days_between(start, end)}, {"revenue_completed": 1})
+        return sum([int(day.get("revenue_completed", 0)) async for day in cursor])
     summary = await analytics_summary(period)
     return int(summary["revenue_completed"])
 
+# -------------------------------
+# Demand chart data
+# -------------------------------
+@dataclass
+class DemandMatrix:
+    """Ordered quantity of each item (rows, busiest first) per local day (columns)"""
+    period: str
+    days: List[str]
+    items: List[str]
+    quantities: np.ndarray
+    # Digest of the contents: equal versions render the same chart
+    version: str
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.quantities.sum(axis=1)
+
+def _demand_matrix(period: str, days: List[str], day_keys: List[str], item_keys: List[str],
+                   quantities: List[int]) -> DemandMatrix:
+    """Sum (day, item, qty) triples into an item x day matrix in one bincount"""
+    if quantities:
+        items, item_index = np.unique(np.array(item_keys, dtype=object).astype(str), return_inverse=True)
+        day_index = np.searchsorted(np.array(days), np.array(day_keys))
+        flat = item_index * len(days) + day_index
+        matrix = np.bincount(flat, weights=np.array(quantities, dtype=np.int64),
+                             minlength=len(items) * len(days)).astype(np.int64).reshape(len(items), len(days))
+        # Busiest items first, ties by key (np.unique sorted them); items netting to 0 are dropped
+        order = np.argsort(-matrix.sum(axis=1), kind="stable")
+        order = order[matrix.sum(axis=1)[order] > 0]
+        items, matrix = [str(key) for key in items[order]], matrix[order]
+    else:
+        items, matrix = [], np.zeros((0, len(days)), dtype=np.int64)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("\0".join(days + ["|"] + items).encode())
+    digest.update(np.ascontiguousarray(matrix).tobytes())
+    return DemandMatrix(period, days, items, matrix, digest.hexdigest())
+
+async def _compute_demand_matrix(period: str, span: Period) -> DemandMatrix:
+    days = span.local_dates
+    day_keys: List[str] = []
+    item_keys: List[str] = []
+    quantities: List[int] = []
+    if await daily_stats_ready():
+        # At most one small document per day
+        async for day in db.daily_stats.find({"_id": {"$gte": days[0], "$lte": days[-1]}}, {"items": 1}):
+            for field, qty in (day.get("items") or {}).items():
+                if qty:
+                    day_keys.append(day["_id"])
+                    item_keys.append(_item_key(field))
+                    quantities.append(int(qty))
+    else:
+        cursor = db.orders.find(_local_days_filter(span), {"status": 1, "items": 1, "created_at": 1, "local_date": 1})
+        async for doc in cursor.batch_size(1000):
+            items = doc.get("items")
+            created_at = doc.get("created_at")
+            if (_status_key(doc.get("status")) in CANCELLED_STATUSES or not isinstance(items, dict)
+                    or not isinstance(created_at, datetime)):
+                continue
+            day = doc.get("local_date") or to_local_date(created_at)
+            for key, qty in items.items():
+                qty = _safe_int(qty)
+                if qty:
+                    day_keys.append(day)
+                    item_keys.append(key)
+                    quantities.append(qty)
+    return _demand_matrix(period, days, day_keys, item_keys, quantities)
+
+async def demand_matrix(period: str) -> DemandMatrix:
+    """Item x day quantities of non-cancelled orders in a report period (cached like analytics).
+
+    ValueError for a period parse_period doesn't accept; the matrix carries the
+    period's canonical name (e.g. "week" for "неделя").
+    """
+    span = parse_period(period)
+    return await analytics_cache.get_or_compute(
+        ("demand", span.days, span.start),
+        lambda: _compute_demand_matrix(span.name, span),
+    )
+
 # Inventory Operations
 async def get_inventory() -> List[InventoryItem]:
     """Return inventory items when they match the InventoryItem model.
@@ -217,6 +1145,7 @@ async def inventory_key_exists(key: str) -> bool:
 async def add_inventory_item(item: InventoryItem) -> str:
     """Add new inventory item"""
     result = await db.inventory.insert_one(item.dict(exclude={'id'}))
+    invalidate_catalog()
     return str(result.inserted_id)
 
 async def update_inventory_availability(key: str, available: bool) -> bool:
@@ -230,6 +1159,7 @@ async def update_inventory_availability(key: str, available: bool) -> bool:
 async def remove_inventory_item(key: str) -> bool:
     """Remove inventory item"""
     result = await db.inventory.delete_one({"key": key})
+    invalidate_catalog()
     return result.deleted_count > 0
 
 # Admin Operations
@@ -241,6 +1171,20 @@ async def get_admins() -> List[Admin]:
         admins.append(Admin(**_stringify_mongo_id(doc)))
     return admins
 
+async def get_admin_ids() -> Set[int]:
+    """User IDs of all admins: ADMIN_IDS plus those stored in MongoDB"""
+    admin_ids = set(ADMIN_IDS)
+    async for doc in db.admins.find({}, {"user_id": 1, "_id": 0}):
+        try:
+            admin_ids.add(int(doc["user_id"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return admin_ids
+
+def watch_admins():
+    """Open a change stream on the admins collection (any change)"""
+    return db.admins.watch()
+
 async def is_admin(user_id: int) -> bool:
     """Check if user is admin.
 
@@ -280,6 +1224,7 @@ async def set_config(key: str, value: str) -> bool:
 
 # Availability Operations (shared doc approach)
 AVAILABILITY_DOC_ID = "availability"
+AVAILABILITY_METADATA_FIELDS = {"_id", "items", "migrated_at", "synced_at"}
 
 async def get_availability_dict() -> Dict[str, bool]:
     """Fetch the availability map from a single availability doc.
@@ -291,11 +1236,10 @@ async def get_availability_dict() -> Dict[str, bool]:
         return {}
     
     # Build availability map from root-level fields (excluding metadata)
-    metadata_fields = {"_id", "items", "migrated_at", "synced_at"}
     avail_map = {}
     
     for key, value in doc.items():
-        if key not in metadata_fields and isinstance(value, bool):
+        if key not in AVAILABILITY_METADATA_FIELDS and isinstance(value, bool):
             avail_map[key] = value
     
     return avail_map
@@ -321,7 +1265,10 @@ async def set_availability_item(key: str, is_enabled: bool) -> bool:
         upsert=True,
     )
     # Consider upsert or modified as success
-    return (result.modified_count + (1 if result.upserted_id else 0)) > 0
+    ok = (result.modified_count + (1 if result.upserted_id else 0)) > 0
+    if ok:
+        _update_catalog_availability({key: is_enabled})
+    return ok
 
 async def seed_inventory_from_catalog(all_keys: Dict[str, str]) -> None:
     """Merge all catalog keys into availability doc, defaulting to True if missing."""
@@ -336,6 +1283,7 @@ async def seed_inventory_from_catalog(all_keys: Dict[str, str]) -> None:
             {"$set": updates},
             upsert=True,
         )
+        invalidate_catalog()
 
 async def seed_availability_from_inventory() -> None:
     """Ensure every inventory item key exists in the availability doc (default True)."""
@@ -354,6 +1302,68 @@ async def seed_availability_from_inventory() -> None:
             {"$set": updates},
             upsert=True,
         )
+        invalidate_catalog()
+
+# -------------------------------
+# Catalog snapshot
+# -------------------------------
+@dataclass
+class CatalogSnapshot:
+    """Inventory keys (sorted) and the availability map, as shown by /inventory"""
+    keys: List[str] = field(default_factory=list)
+    availability: Dict[str, bool] = field(default_factory=dict)
+
+    def is_enabled(self, key: str) -> bool:
+        return self.availability.get(key, True)
+
+CATALOG_KEY = "catalog"
+catalog_cache = ResultCache(ttl=CATALOG_CACHE_TTL, maxsize=1)
+
+async def _load_catalog() -> CatalogSnapshot:
+    return CatalogSnapshot(keys=await get_inventory_keys(), availability=await get_availability_dict())
+
+async def get_catalog() -> CatalogSnapshot:
+    """Return the catalog snapshot, reading MongoDB only when it is missing or expired.
+
+    The returned object is shared; treat it as read-only.
+    """
+    return await catalog_cache.get_or_compute(CATALOG_KEY, _load_catalog)
+
+def invalidate_catalog() -> None:
+    """Drop the snapshot; the next get_catalog() reloads it"""
+    catalog_cache.invalidate()
+
+def _update_catalog_availability(changes: Dict[str, bool], removed: Tuple[str, ...] = ()) -> None:
+    snapshot = catalog_cache.peek(CATALOG_KEY)
+    if snapshot is None:
+        # A load may be in flight and could predate this write; don't let it be stored
+        invalidate_catalog()
+        return
+    snapshot.availability.update(changes)
+    for key in removed:
+        snapshot.availability.pop(key, None)
+
+def watch_catalog(collection: str):
+    """Open a change stream on the inventory or availability collection"""
+    return db.db[collection].watch()
+
+def apply_catalog_change(change: dict) -> None:
+    """Fold a change stream event on inventory/availability into the snapshot.
+
+    Field updates of the availability doc (ours or the client bot's) are applied
+    in place; anything else (inventory changes, replaced docs) drops the snapshot.
+    """
+    coll = change.get("ns", {}).get("coll")
+    description = change.get("updateDescription")
+    if coll == "availability" and change.get("operationType") == "update" and description:
+        updated = description.get("updatedFields") or {}
+        changes = {key: value for key, value in updated.items()
+                   if "." not in key and key not in AVAILABILITY_METADATA_FIELDS and isinstance(value, bool)}
+        removed = tuple(key for key in description.get("removedFields") or ()
+                        if "." not in key and key not in AVAILABILITY_METADATA_FIELDS)
+        _update_catalog_availability(changes, removed)
+        return
+    invalidate_catalog()
 
 # Client Notification Operations
 async def create_client_notification(user_id: int, order_id: str, status: OrderStatus, message: str) -> str:
@@ -367,13 +1377,99 @@ async def create_client_notification(user_id: int, order_id: str, status: OrderS
     result = await db.notifications.insert_one(notification.dict(exclude={'id'}))
     return str(result.inserted_id)
 
+async def iter_pending_notifications(batch_size: int = ITER_BATCH_SIZE,
+                                     limit: Optional[int] = None) -> AsyncIterator[ClientNotification]:
+    """Yield pending notifications for the client bot, oldest first"""
+    cursor = db.notifications.find({"sent": False}).sort("created_at", 1)
+    async for doc in _batched(cursor, batch_size, limit):
+        yield ClientNotification(**_stringify_mongo_id(doc))
+
 async def get_pending_notifications() -> List[ClientNotification]:
     """Get all pending notifications for the client bot"""
-    cursor = db.notifications.find({"sent": False}).sort("created_at", 1)
-    notifications = []
-    async for doc in cursor:
-        notifications.append(ClientNotification(**_stringify_mongo_id(doc)))
-    return notifications
+    return [notification async for notification in iter_pending_notifications()]
+
+# Delivery leases: a claimed notification belongs to one worker until its lease
+# expires, so several senders can run side by side without duplicates
+NOTIFICATION_LEASE = timedelta(seconds=60)
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_DELAY = timedelta(seconds=30)
+
+def _claimable_notifications(now: datetime) -> dict:
+    return {
+        "sent": False,
+        "failed": {"$ne": True},
+        "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+    }
+
+async def claim_notifications(worker_id: str, limit: int = 50) -> List[ClientNotification]:
+    """Lease up to `limit` pending notifications to this worker, oldest first.
+
+    Candidates are re-checked in the update, so a notification claimed by
+    another worker in between is skipped: each one is owned by one worker.
+    """
+    from uuid import uuid4
+    now = datetime.utcnow()
+    lease_id = f"{worker_id}:{uuid4().hex}"
+    claimed = 0
+    # Workers racing for the same candidates each win some; the losers look again
+    for _ in range(3):
+        cursor = (db.notifications.find(_claimable_notifications(now), {"_id": 1})
+                  .sort("created_at", 1).limit(limit - claimed))
+        ids = [doc["_id"] async for doc in cursor]
+        if not ids:
+            break
+        result = await db.notifications.update_many(
+            {"_id": {"$in": ids}, **_claimable_notifications(now)},
+            {"$set": {"lease_id": lease_id, "lease_until": now + NOTIFICATION_LEASE}, "$inc": {"attempts": 1}}
+        )
+        claimed += result.modified_count
+        if claimed >= limit or result.modified_count == len(ids):
+            break
+    if not claimed:
+        return []
+    cursor = db.notifications.find({"lease_id": lease_id}).sort("created_at", 1)
+    return [ClientNotification(**_stringify_mongo_id(doc)) async for doc in cursor]
+
+def _held_notifications(lease_id: str) -> dict:
+    return {"lease_id": lease_id, "sent": False, "failed": {"$ne": True}}
+
+async def renew_notification_lease(lease_id: str) -> int:
+    """Push out the lease of a batch still being sent; returns how many notifications it still holds"""
+    result = await db.notifications.update_many(
+        _held_notifications(lease_id),
+        {"$set": {"lease_until": datetime.utcnow() + NOTIFICATION_LEASE}}
+    )
+    return result.matched_count
+
+async def finish_notifications(lease_id: str, sent_ids: List[str], failed: Dict[str, str],
+                               attempts: Dict[str, int]) -> int:
+    """Record a batch's outcome in one bulk_write; returns the number of documents changed.
+
+    Sent ones are marked sent; failed ones are retried after
+    NOTIFICATION_RETRY_DELAY until NOTIFICATION_MAX_ATTEMPTS, then flagged failed.
+    Only notifications still held under `lease_id` are touched, so a worker
+    whose lease expired and was taken over can't overwrite the new owner.
+    """
+    from bson import ObjectId
+    now = datetime.utcnow()
+    requests = [
+        UpdateOne({"_id": ObjectId(notification_id), "lease_id": lease_id},
+                  {"$set": {"sent": True, "sent_at": now, "lease_until": None, "last_error": None}})
+        for notification_id in sent_ids
+    ]
+    for notification_id, error in failed.items():
+        update = {"last_error": error, "lease_until": now + NOTIFICATION_RETRY_DELAY}
+        if attempts.get(notification_id, 0) >= NOTIFICATION_MAX_ATTEMPTS:
+            update.update(failed=True, lease_until=None)
+        requests.append(UpdateOne({"_id": ObjectId(notification_id), "lease_id": lease_id}, {"$set": update}))
+    if not requests:
+        return 0
+    result = await db.notifications.bulk_write(requests, ordered=False)
+    return result.modified_count
+
+def watch_notifications():
+    """Open a change stream emitting newly inserted notifications"""
+    return db.notifications.watch([{"$match": {"operationType": "insert"}}])
 
 async def mark_notification_sent(notification_id: str) -> bool:
     """Mark a notification as sent"""
@@ -382,4 +1478,7 @@ async def mark_notification_sent(notification_id: str) -> bool:
         {"_id": ObjectId(notification_id)},
         {"$set": {"sent": True}}
     )
-    return result.modified_count > 0
\ No newline at end of file
+    return result.modified_count > 0
+
+# Latency and error metrics for every public operation (utils/metrics.py)
+instrument_operations(globals())
@@ -0,0 +1,214 @@
+"""Slow-query log fed by a pymongo command listener.
+
+Database.connect registers `query_log` on the Mongo client, so every command
+issued by data/operations.py is timed. Commands are grouped by query shape:
+command name, collection and the filter/sort with every value replaced by
+"?" (field names and operators only, no customer data). Commands slower than
+SLOW_QUERY_MS are printed as one JSON line each; /slow_queries lists the
+slowest shapes since startup.
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from .config import SLOW_QUERY_MS
+
+# Commands issued by data/operations.py; handshakes, pings etc. are ignored
+TRACKED_COMMANDS = {
+    "find", "getMore", "aggregate", "count", "distinct",
+    "insert", "update", "delete", "findAndModify", "createIndexes",
+}
+# Upper bound on remembered shapes (they are few; this only guards against surprises)
+MAX_SHAPES = 500
+# Open cursors remembered for their getMores. Cursors that are abandoned without
+# a killCursors (a dropped connection, the server's 10 minute idle timeout) are
+# forgotten after CURSOR_TTL seconds unused, and at most MAX_CURSORS are kept
+MAX_CURSORS = 1000
+CURSOR_TTL = 15 * 60
+
+ShapeKey = Tuple[str, str, str]
+
+
+def _shape(value: Any) -> Any:
+    """`value` with every literal replaced by "?", keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        # $or / $and clauses: each clause has its own shape
+        return [_shape(item) for item in value]
+    return "?"
+
+
+def _sort_shape(sort: Optional[dict]) -> Optional[dict]:
+    return dict(sort) if sort else None
+
+
+def _stage_shape(stage: dict) -> Any:
+    name = next(iter(stage), "?")
+    if name == "$match":
+        return {name: _shape(stage[name])}
+    if name == "$sort":
+        return {name: _sort_shape(stage[name])}
+    return name
+
+
+def query_shape(command_name: str, command: dict) -> str:
+    """Compact, value-free description of a command's filter (and sort)"""
+    parts: Dict[str, Any] = {}
+    if command_name == "find":
+        parts["filter"] = _shape(command.get("filter", {}))
+        if command.get("sort"):
+            parts["sort"] = _sort_shape(command["sort"])
+    elif command_name == "aggregate":
+        parts["pipeline"] = [_stage_shape(stage) for stage in command.get("pipeline", [])]
+    elif command_name == "count":
+        parts["filter"] = _shape(command.get("query", {}))
+    elif command_name == "distinct":
+        parts["key"] = command.get("key")
+        parts["filter"] = _shape(command.get("query", {}))
+    elif command_name == "findAndModify":
+        parts["filter"] = _shape(command.get("query", {}))
+        if command.get("sort"):
+            parts["sort"] = _sort_shape(command["sort"])
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes", [])
+        filters = []
+        for statement in statements:
+            shape = _shape(statement.get("q", {}))
+            if shape not in filters:
+                filters.append(shape)
+        parts["filter"] = filters[0] if len(filters) == 1 else filters
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":")) if parts else ""
+
+
+class QueryLog(monitoring.CommandListener):
+    """Times Mongo commands per query shape and reports the slow ones.
+
+    pymongo calls the listener from whichever thread runs the command, so all
+    state is guarded by a lock.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        # (connection, request id) -> (shape key, getMore cursor id)
+        self._pending: Dict[Tuple[Any, int], Tuple[ShapeKey, Optional[int]]] = {}
+        # open cursor id -> (shape of the find/aggregate that opened it, last used),
+        # least recently used first
+        self._cursors: Dict[int, Tuple[str, float]] = {}
+        # shape -> [count, total ms, max ms, slow count, failures]
+        self._stats: Dict[ShapeKey, List[float]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        name = event.command_name
+        if name == "killCursors":
+            with self._lock:
+                for cursor_id in event.command.get("cursors") or ():
+                    self._cursors.pop(cursor_id, None)
+            return
+        if name not in TRACKED_COMMANDS:
+            return
+        command = event.command
+        cursor_id = None
+        with self._lock:
+            if name == "getMore":
+                cursor_id = command.get("getMore")
+                shape = self._cursors.pop(cursor_id, ("", 0.0))[0]
+                if shape:
+                    self._remember_cursor(cursor_id, shape)
+                key = (name, str(command.get("collection", "")), shape)
+            else:
+                key = (name, str(command.get(name, "")), query_shape(name, command))
+            self._pending[(event.connection_id, event.request_id)] = (key, cursor_id)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        finished = self._finish(event, failed=False)
+        if finished is None:
+            return
+        key, cursor_id = finished
+        reply = event.reply if isinstance(event.reply, dict) else {}
+        returned_id = (reply.get("cursor") or {}).get("id")
+        with self._lock:
+            # getMore batches are grouped under the shape of the query that opened the cursor
+            if key[0] in ("find", "aggregate") and returned_id:
+                self._remember_cursor(returned_id, key[2])
+            elif key[0] == "getMore" and not returned_id:
+                self._cursors.pop(cursor_id, None)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        finished = self._finish(event, failed=True)
+        if finished is not None and finished[1] is not None:
+            with self._lock:
+                self._cursors.pop(finished[1], None)
+
+    def _remember_cursor(self, cursor_id: int, shape: str) -> None:
+        """Record a cursor as just used and forget stale ones (caller holds the lock)"""
+        now = time.monotonic()
+        self._cursors[cursor_id] = (shape, now)
+        while self._cursors:
+            oldest_id, (_, used_at) = next(iter(self._cursors.items()))
+            if len(self._cursors) <= MAX_CURSORS and now - used_at < CURSOR_TTL:
+                break
+            del self._cursors[oldest_id]
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return None
+            key = pending[0]
+            ms = event.duration_micros / 1000
+            stats = self._stats.get(key)
+            if stats is None and len(self._stats) < MAX_SHAPES:
+                stats = self._stats[key] = [0, 0.0, 0.0, 0, 0]
+            slow = ms >= self.slow_ms
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += ms
+                stats[2] = max(stats[2], ms)
+                stats[3] += slow
+                stats[4] += failed
+        if slow:
+            command, collection, shape = key
+            print(json.dumps({
+                "event": "slow_query",
+                "ms": round(ms, 1),
+                "command": command,
+                "collection": collection,
+                "shape": shape,
+                "ok": not failed,
+            }, ensure_ascii=False))
+        return pending
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """The `limit` shapes with the highest maximum duration"""
+        with self._lock:
+            items = list(self._stats.items())
+        items.sort(key=lambda item: item[1][2], reverse=True)
+        return [
+            {
+                "command": command,
+                "collection": collection,
+                "shape": shape,
+                "count": int(count),
+                "avg_ms": total / count,
+                "max_ms": max_ms,
+                "slow": int(slow),
+                "failed": int(failures),
+            }
+            for (command, collection, shape), (count, total, max_ms, slow, failures) in items[:limit]
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._cursors.clear()
+            self._stats.clear()
+            self.started_at = time.time()
+
+
+query_log = QueryLog()
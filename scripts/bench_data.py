@@ -0,0 +1,65 @@
+"""Synthetic order history for benchmarks.
+
+Orders mix the three contact formats found in production (legacy `contact`,
+`name`/`phone`/`address`, `customer_*`), realistic status distribution
+including unknown legacy statuses, and HTML summaries.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+ITEM_KEYS = ["картошка", "мясо", "курица_с_сыром", "тыква", "зелень", "пакет", "коробка"]
+STATUSES = (
+    ["completed"] * 55 + ["cancelled"] * 8 + ["payment_failed"] * 2 + ["new"] * 10
+    + ["accepted"] * 8 + ["in_progress"] * 7 + ["ready"] * 8 + ["pending_admin_confirmation"] * 2
+)
+NAMES = ["Азиз", "Дилноза", "Рустам", "Мадина", "Тимур", "Нигора", "Шерзод", "Гульнара"]
+
+
+def make_order_doc(rng: random.Random, created_at: datetime, user_id: Optional[int] = None) -> Dict:
+    items = {key: rng.randint(1, 6) for key in rng.sample(ITEM_KEYS, rng.randint(1, 4))}
+    total = sum(qty * rng.choice((8000, 10000, 12000)) for qty in items.values())
+    name = rng.choice(NAMES)
+    phone = f"+99890{rng.randint(1000000, 9999999)}"
+    address = f"Ташкент, ул. {rng.choice(['Навои', 'Амира Темура', 'Бабура'])}, {rng.randint(1, 120)}"
+    card = rng.random() < 0.3
+    doc = {
+        "user_id": user_id or rng.randint(10_000, 10_000_000),
+        "items": items,
+        "total": total,
+        "delivery": rng.choice(["🚚 Доставка", "Самовывоз"]),
+        "time": f"{rng.randint(9, 20):02d}:{rng.choice(['00', '30'])}",
+        "method": "💳 Карта" if card else "💵 Наличные",
+        "summary": "<b>Ваш заказ:</b><br>" + "<br>".join(f"{k}: {v} шт" for k, v in items.items())
+                   + f"<br><b>Итого:</b> {total} сум<br>{name}, {phone}, {address}",
+        "status": rng.choice(STATUSES),
+        "requires_payment_check": card,
+        "payment_verified": card and rng.random() < 0.8,
+        "payment_amount": total if card else None,
+        "client_message_id": rng.randint(1, 10**6),
+        "sheet_synced": True,
+        "created_at": created_at,
+        "updated_at": created_at + timedelta(minutes=rng.randint(1, 90)),
+    }
+    fmt = rng.random()
+    if fmt < 0.2:
+        doc["contact"] = f"{name}, {phone}, {address}"
+    elif fmt < 0.5:
+        doc.update(name=name, phone=phone, address=address)
+    else:
+        doc.update(customer_name=name, customer_phone=phone, customer_address=address)
+    return doc
+
+
+def iter_order_docs(count: int, days: int = 90, seed: int = 1,
+                    now: Optional[datetime] = None) -> Iterator[Dict]:
+    """Yield `count` orders spread uniformly over the last `days` days."""
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    span = days * 86400
+    for _ in range(count):
+        yield make_order_doc(rng, now - timedelta(seconds=rng.random() * span))
+
+
+def order_docs(count: int, days: int = 90, seed: int = 1) -> List[Dict]:
+    return list(iter_order_docs(count, days, seed))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare analytics_summary's aggregation pipeline against the Python fallback.
+
+Seeds a throwaway database (default `samsariya_bench`, dropped afterwards) on
+the server from MONGODB_URI with synthetic orders, checks that both paths
+return identical results for today/week/month and prints their timings.
+
+Usage:
+    python scripts/benchmark_analytics.py --orders 20000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from data.database import db
+from data.operations import _analytics_summary_pipeline, _analytics_summary_python, _period_start
+from scripts.bench_data import iter_order_docs
+
+
+async def _seed(count: int) -> None:
+    batch = []
+    for doc in iter_order_docs(count, days=60):
+        batch.append(doc)
+        if len(batch) == 1000:
+            await db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch)
+    await db.ensure_indexes()
+
+
+async def _time(fn, period, start, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = await fn(period, start)
+        samples.append(time.perf_counter() - began)
+    return result, statistics.median(samples) * 1000
+
+
+async def run(orders: int, repeat: int, database: str, keep: bool) -> int:
+    if database == "samsariya":
+        print("Refusing to seed and drop the production database")
+        return 2
+    load_dotenv()
+    # Connect straight to the throwaway database, so indexes are never built on production
+    await db.connect(database)
+    mismatches = 0
+    try:
+        await db.db.orders.drop()
+        print(f"Seeding {orders} orders into {database}...")
+        await _seed(orders)
+        print(f"{'period':<8}{'python ms':>12}{'pipeline ms':>14}{'speedup':>10}  match")
+        for period in ("today", "week", "month"):
+            start = _period_start(period)
+            expected, python_ms = await _time(_analytics_summary_python, period, start, repeat)
+            actual, pipeline_ms = await _time(_analytics_summary_pipeline, period, start, repeat)
+            same = expected == actual
+            mismatches += not same
+            print(f"{period:<8}{python_ms:>12.1f}{pipeline_ms:>14.1f}{python_ms / pipeline_ms:>9.1f}x  {'✅' if same else '❌'}")
+            if not same:
+                print(f"  python:   {expected}\n  pipeline: {actual}")
+    finally:
+        if not keep:
+            await db.client.drop_database(database)
+        await db.disconnect()
+    return 1 if mismatches else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark analytics_summary implementations")
+    parser.add_argument("--orders", type=int, default=20000, help="Synthetic orders to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    parser.add_argument("--database", default="samsariya_bench", help="Throwaway database name")
+    parser.add_argument("--keep", action="store_true", help="Don't drop the database afterwards")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(asyncio.run(run(args.orders, args.repeat, args.database, args.keep)))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Measure the client-notification leg of the status-change callback
+(`_notify_client_status`) with a Bot created per call (old behaviour) versus the
+long-lived client bot created at startup.
+
+By default runs offline against a local fake Bot API. With --token it calls the
+real api.telegram.org (getMe only, nothing is sent), where the per-call variant
+also pays the TLS handshake.
+
+Usage:
+    python scripts/benchmark_client_notify.py --iterations 200
+    python scripts/benchmark_client_notify.py --token CLIENT_BOT_TOKEN --iterations 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+
+import bot.handlers as handlers
+from data.models import Order, OrderStatus
+from utils.testing.fake_telegram import CLIENT_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+
+
+def _order() -> Order:
+    return Order(
+        _id="0" * 24,
+        user_id=1001,
+        items={"картошка": 2, "мясо": 1},
+        total=28000,
+        customer_name="Benchmark",
+        delivery="Самовывоз",
+        time="12:00",
+        method="Наличные",
+        client_message_id=1,
+    )
+
+
+def _stats(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+async def _run(token: str, make_session, notify, iterations: int):
+    per_call, shared = [], []
+
+    for _ in range(iterations):
+        started = time.perf_counter()
+        bot = Bot(token=token, session=make_session())
+        await notify(bot)
+        await bot.session.close()
+        per_call.append(time.perf_counter() - started)
+
+    bot = Bot(token=token, session=make_session())
+    await notify(bot)  # first call opens the pooled connection, like startup does
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await notify(bot)
+        shared.append(time.perf_counter() - started)
+    await bot.session.close()
+    return per_call, shared
+
+
+async def main(token: str, iterations: int):
+    order = _order()
+    if token:
+        make_session = AiohttpSession
+
+        async def notify(bot):
+            await bot.get_me()
+        server = None
+    else:
+        token = CLIENT_BOT_TOKEN
+        server = await FakeTelegramAPI().start()
+
+        def make_session():
+            return fake_telegram_session(server.url)
+
+        async def notify(bot):
+            await handlers._notify_client_status(order, OrderStatus.READY, bot)
+
+    # Silence the per-message prints of _notify_client_status
+    real_stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        per_call, shared = await _run(token, make_session, notify, iterations)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"{'mode':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, samples in (("Bot per call (before)", per_call), ("long-lived bot (after)", shared)):
+        s = _stats(samples)
+        print(f"{name:<22}{s['mean_ms']:>10}{s['p50_ms']:>10}{s['p95_ms']:>10}")
+    if server:
+        print(f"TCP connections opened: {server.connections} for {len(server.calls)} requests")
+        await server.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark client status notifications")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per mode")
+    parser.add_argument("--token", default="", help="Real client bot token (calls getMe on api.telegram.org)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(main(args.token, args.iterations))
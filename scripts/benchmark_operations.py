@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for data/operations.py and the order formatting helpers.
+
+Seeds a synthetic order history (bench_data: legacy `contact`, `name`/`phone`
+and `customer_*` contact formats) into the in-memory stand-in from
+utils/testing/fake_mongo.py (default) or a throwaway database on MONGODB_URI
+(--mongo; default `samsariya_bench`, dropped afterwards), then times:
+
+- analytics_summary per period, computed (cache cleared each run) and cached,
+  without and then with the daily_stats rollup
+- get_active_orders (full and card projections), get_orders_by_period,
+  get_inventory_keys
+- build_row, _split_items and render_order (cold render cache) per order
+
+Results are written as JSON; --compare checks them against an earlier file
+and exits with 1 when a benchmark got slower than --threshold.
+
+Usage:
+    python scripts/benchmark_operations.py --orders 10000 --output bench.json
+    python scripts/benchmark_operations.py --orders 200000 --mongo --output bench.json
+    python scripts/benchmark_operations.py --compare bench-main.json --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.cards import render_cache, render_order
+from data.database import db
+from data.operations import (
+    analytics_cache,
+    analytics_summary,
+    get_active_orders,
+    get_inventory_keys,
+    get_orders_by_period,
+    rebuild_daily_stats,
+)
+from scripts.bench_data import ITEM_KEYS, iter_order_docs
+from utils.sheets import _split_items, build_row
+
+VALID_STATUSES = {"new", "accepted", "in_progress", "ready", "completed", "cancelled", "payment_failed"}
+PERIODS = ("today", "week", "month")
+# Per-order helpers run over at most this many orders per measurement
+HELPER_SAMPLE = 2000
+
+
+def _order_docs(count: int, days: int):
+    # Orders with legacy statuses the Order model rejects are left out
+    docs = (doc for doc in iter_order_docs(count * 2, days=days) if doc["status"] in VALID_STATUSES)
+    return itertools.islice(docs, count)
+
+
+def _inventory_docs():
+    return [{"key": key, "display_name": key.capitalize(), "price": 10000} for key in ITEM_KEYS]
+
+
+def _stats(samples: List[float], items: int = 1) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "min_ms": ordered[0] * 1000,
+        "runs": len(ordered),
+        "items": items,
+    }
+
+
+async def _time_async(fn: Callable[[], Awaitable], repeat: int, before: Optional[Callable[[], None]] = None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        # The pipeline fallback and slow-query log print; keep that out of the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            began = time.perf_counter()
+            await fn()
+            samples.append(time.perf_counter() - began)
+    return samples
+
+
+def _time_sync(fn: Callable[[], None], repeat: int, before: Optional[Callable[[], None]] = None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        began = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+async def _bench_analytics(results: Dict, repeat: int, label: str) -> None:
+    for period in PERIODS:
+        samples = await _time_async(lambda: analytics_summary(period), repeat, before=analytics_cache.invalidate)
+        results[f"analytics_summary[{period}{label}]"] = _stats(samples)
+    with contextlib.redirect_stdout(io.StringIO()):
+        await analytics_summary("week")
+    samples = await _time_async(lambda: analytics_summary("week"), repeat)
+    results[f"analytics_summary[week{label},cached]"] = _stats(samples)
+
+
+async def run_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    await _bench_analytics(results, repeat, "")
+    with contextlib.redirect_stdout(io.StringIO()):
+        await rebuild_daily_stats()
+    await _bench_analytics(results, repeat, ",rollup")
+
+    active = await get_active_orders()
+    for projection in ("full", "card"):
+        samples = await _time_async(lambda: get_active_orders(projection=projection), repeat)
+        results[f"get_active_orders[{projection}]"] = _stats(samples, len(active))
+    for period in ("today", "week"):
+        orders = await get_orders_by_period(period)
+        samples = await _time_async(lambda: get_orders_by_period(period), repeat)
+        results[f"get_orders_by_period[{period}]"] = _stats(samples, len(orders))
+    samples = await _time_async(get_inventory_keys, repeat)
+    results["get_inventory_keys"] = _stats(samples, len(await get_inventory_keys()))
+
+    sample = (await get_orders_by_period("month"))[:HELPER_SAMPLE]
+
+    def rows():
+        for order in sample:
+            build_row(order)
+
+    def split():
+        for order in sample:
+            _split_items(order.items)
+
+    def render():
+        for order in sample:
+            render_order(order, "summary")
+            render_order(order, "detail")
+
+    results["build_row"] = _stats(_time_sync(rows, repeat), len(sample))
+    results["_split_items"] = _stats(_time_sync(split, repeat), len(sample))
+    results["render_order[cold]"] = _stats(_time_sync(render, repeat, before=render_cache.clear), len(sample))
+    return results
+
+
+async def run_memory(orders: int, days: int, repeat: int) -> Dict:
+    from utils.testing.fake_mongo import FakeDatabase
+
+    db.db = FakeDatabase()
+    db.db.orders.load(_order_docs(orders, days))
+    db.db.inventory.load(_inventory_docs())
+    return await run_benchmarks(repeat)
+
+
+async def run_mongo(orders: int, days: int, repeat: int, database: str) -> Dict:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    # Connect straight to the throwaway database, so indexes are never built on production
+    await db.connect(database)
+    try:
+        await db.db.orders.drop()
+        await db.db.inventory.drop()
+        await db.db.daily_stats.drop()
+        batch = []
+        for doc in _order_docs(orders, days):
+            batch.append(doc)
+            if len(batch) == 1000:
+                await db.orders.insert_many(batch)
+                batch = []
+        if batch:
+            await db.orders.insert_many(batch)
+        await db.inventory.insert_many(_inventory_docs())
+        await db.ensure_indexes()
+        return await run_benchmarks(repeat)
+    finally:
+        await db.client.drop_database(database)
+        await db.disconnect()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'benchmark':<38}{'median ms':>11}{'p95 ms':>10}{'items':>8}{'µs/item':>10}")
+    for name, row in results.items():
+        per_item = row["median_ms"] * 1000 / row["items"] if row["items"] else 0
+        print(f"{name:<38}{row['median_ms']:>11.2f}{row['p95_ms']:>10.2f}{row['items']:>8}{per_item:>10.1f}")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> int:
+    """Print median ratios against a baseline file; number of regressions"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    regressions = 0
+    for name, row in results.items():
+        old = baseline["results"].get(name)
+        if not old or not old["median_ms"]:
+            continue
+        ratio = row["median_ms"] / old["median_ms"]
+        slower = ratio > threshold
+        regressions += slower
+        print(f"{name:<38}{old['median_ms']:>11.2f} -> {row['median_ms']:>9.2f}  {ratio:>5.2f}x{'  ❌' if slower else ''}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark data/operations.py on synthetic order history")
+    parser.add_argument("--orders", type=int, default=10000, help="Synthetic orders to seed (10k-1M)")
+    parser.add_argument("--days", type=int, default=90, help="Days of history the orders are spread over")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    parser.add_argument("--mongo", action="store_true", help="Use MONGODB_URI instead of the in-memory stand-in")
+    parser.add_argument("--database", default="samsariya_bench", help="Throwaway database name for --mongo")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Slowdown ratio counted as a regression with --compare")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.mongo and args.database == "samsariya":
+        print("Refusing to seed and drop the production database")
+        return 2
+    backend = "mongo" if args.mongo else "memory"
+    print(f"Seeding {args.orders} orders over {args.days} days ({backend})...")
+    if args.mongo:
+        results = asyncio.run(run_mongo(args.orders, args.days, args.repeat, args.database))
+    else:
+        results = asyncio.run(run_memory(args.orders, args.days, args.repeat))
+    print_results(results)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "backend": backend,
+            "orders": args.orders,
+            "days": args.days,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Compare order list reads with the "full", "notify" and "card" projections.
+
+Offline by default: synthetic orders are projected the way the server would,
+BSON-encoded (wire bytes) and then decoded into Order models, which is the
+client-side cost of each list query. With --mongo the same orders are seeded
+into a throwaway database on MONGODB_URI (default `samsariya_bench`, dropped
+afterwards) and get_active_orders() is timed end to end.
+
+Usage:
+    python scripts/benchmark_projections.py --orders 2000
+    python scripts/benchmark_projections.py --orders 2000 --mongo
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+
+from data.models import Order
+from data.operations import ORDER_PROJECTIONS, _stringify_mongo_id
+from scripts.bench_data import iter_order_docs
+
+PROJECTIONS = ("full", "notify", "card")
+# What get_active_orders() returns
+ACTIVE_STATUSES = {"new", "accepted", "in_progress", "ready"}
+
+
+def _project(doc, projection):
+    if projection is None:
+        return doc
+    return {key: value for key, value in doc.items() if key == "_id" or key in projection}
+
+
+def _median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - began)
+    return statistics.median(samples) * 1000
+
+
+def run_offline(orders: int, repeat: int) -> None:
+    docs = [dict(doc, _id=ObjectId()) for doc in iter_order_docs(orders * 4, days=3)
+            if doc["status"] in ACTIVE_STATUSES][:orders]
+    print(f"{len(docs)} active orders, median of {repeat} runs")
+    print(f"{'projection':<12}{'KiB on wire':>12}{'decode+model ms':>17}")
+    baseline = None
+    for name in PROJECTIONS:
+        raw = [bson.encode(_project(doc, ORDER_PROJECTIONS[name])) for doc in docs]
+        size = sum(len(b) for b in raw) / 1024
+
+        def decode():
+            for data in raw:
+                Order(**_stringify_mongo_id(bson.decode(data)))
+
+        ms = _median_ms(decode, repeat)
+        baseline = baseline or (size, ms)
+        print(f"{name:<12}{size:>12.0f}{ms:>17.1f}   ({size / baseline[0]:.0%} bytes, {ms / baseline[1]:.0%} time)")
+
+
+async def run_mongo(orders: int, repeat: int, database: str) -> int:
+    from dotenv import load_dotenv
+    from data.database import db
+    from data.operations import get_active_orders
+
+    if database == "samsariya":
+        print("Refusing to seed and drop the production database")
+        return 2
+    load_dotenv()
+    # Connect straight to the throwaway database, so indexes are never built on production
+    await db.connect(database)
+    try:
+        await db.db.orders.drop()
+        await db.db.orders.insert_many(list(iter_order_docs(orders, days=3)))
+        await db.ensure_indexes()
+        print(f"{'projection':<12}{'get_active_orders ms':>22}")
+        for name in PROJECTIONS:
+            samples = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                await get_active_orders(projection=name)
+                samples.append(time.perf_counter() - began)
+            print(f"{name:<12}{statistics.median(samples) * 1000:>22.1f}")
+    finally:
+        await db.client.drop_database(database)
+        await db.disconnect()
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark order list projections")
+    parser.add_argument("--orders", type=int, default=2000, help="Synthetic orders in the list")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    parser.add_argument("--mongo", action="store_true", help="Also time get_active_orders against MONGODB_URI")
+    parser.add_argument("--database", default="samsariya_bench", help="Throwaway database name for --mongo")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_offline(args.orders, args.repeat)
+    if args.mongo:
+        sys.exit(asyncio.run(run_mongo(args.orders, args.repeat, args.database)))
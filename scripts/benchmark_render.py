@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for order card rendering (bot/cards.py).
+
+Renders the summary and detail views of synthetic orders with a cold render
+cache, then again with a warm one (what re-listing and expanding/collapsing
+cards costs).
+
+Usage:
+    python scripts/benchmark_render.py --orders 200 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from bot.cards import render_cache, render_order
+from data.models import Order
+from scripts.bench_data import iter_order_docs
+
+VALID_STATUSES = {"new", "accepted", "in_progress", "ready", "completed", "cancelled", "payment_failed"}
+
+
+def _orders(count: int):
+    docs = (doc for doc in iter_order_docs(count * 2, days=3) if doc["status"] in VALID_STATUSES)
+    return [Order(**dict(doc, _id=str(ObjectId()))) for doc, _ in zip(docs, range(count))]
+
+
+def _render_all(orders):
+    for order in orders:
+        render_order(order, "summary")
+        render_order(order, "detail")
+
+
+def main(count: int, repeat: int) -> None:
+    orders = _orders(count)
+    cold, warm = [], []
+    for _ in range(repeat):
+        render_cache.clear()
+        started = time.perf_counter()
+        _render_all(orders)
+        cold.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        _render_all(orders)
+        warm.append(time.perf_counter() - started)
+
+    cards = len(orders) * 2
+    print(f"{cards} cards ({len(orders)} orders x summary/detail), median of {repeat} runs")
+    for name, samples in (("cold cache", cold), ("warm cache", warm)):
+        total = statistics.median(samples)
+        print(f"{name:<12}{total * 1000:>9.2f} ms  {total / cards * 1e6:>7.2f} µs/card")
+    print(f"speedup: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark order card rendering")
+    parser.add_argument("--orders", type=int, default=200, help="Synthetic orders (2 cards each; keep within RENDER_CACHE_SIZE)")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (median is reported)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.orders, args.repeat)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Verify that every hot query in data/operations.py is served by an index.
+
+Connects (which creates the declared indexes), runs explain() for each query
+below and exits with status 1 if any winning plan contains a COLLSCAN.
+Whole-collection reads that are fine by design are listed in FULL_SCANS and
+not explained. tests/test_check_indexes.py fails when the test suite issues
+a filter shape that neither list covers, so a new query can't skip the check.
+
+Usage:
+    python scripts/check_indexes.py
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from data.database import db
+from data.models import OrderStatus
+from data.operations import (
+    ACTIVE_STATUSES,
+    AVAILABILITY_DOC_ID,
+    DAILY_STATS_BUILT_KEY,
+    _claimable_notifications,
+    _created_between,
+    _days_between,
+    _held_notifications,
+    _keyset_filter,
+    _local_days_filter,
+    _period_start,
+    _sheet_backlog_filter,
+    _unnotified_filter,
+)
+from utils.helpers import parse_period
+
+# (operation, collection, filter, sort)
+Query = Tuple[str, str, dict, Optional[List[Tuple[str, int]]]]
+
+# (operation, collection) reading the whole collection on purpose: small
+# collections, or a full rebuild that has to see every order anyway
+FULL_SCANS = [
+    ("get_admins", "admins"),
+    ("seed_availability_from_inventory", "inventory"),
+    ("rebuild_daily_stats", "orders"),
+]
+
+
+def hot_queries() -> List[Query]:
+    """The filters come from the same helpers data/operations.py queries with, so they can't drift apart"""
+    now = datetime.utcnow()
+    week = parse_period("week")
+    lease_id = f"check:{ObjectId()}"
+    order_id = ObjectId()
+    claim = _unnotified_filter(now)
+    del claim["status"]
+    return [
+        ("get_order", "orders", {"_id": order_id}, None),
+        ("claim_order_notification", "orders", {**claim, "_id": order_id}, None),
+        ("record_admin_alerted", "orders", {"_id": order_id, "admin_notify_lease": lease_id}, None),
+        ("apply_order_to_daily_stats", "orders", {"_id": order_id, "stats_status": None}, None),
+        ("get_new_orders", "orders", {"status": OrderStatus.NEW}, [("created_at", -1)]),
+        ("get_unnotified_new_orders", "orders", _unnotified_filter(now), [("created_at", 1), ("_id", 1)]),
+        ("get_active_orders", "orders", {"status": {"$in": ACTIVE_STATUSES}}, [("created_at", -1)]),
+        ("count_orders", "orders",
+         {"status": {"$in": ACTIVE_STATUSES}, **_keyset_filter((now, str(order_id)), "$gt")}, None),
+        ("bulk_update_order_status", "orders", {"status": OrderStatus.READY}, [("created_at", 1)]),
+        ("bulk_update_order_status (ids)", "orders", {"_id": {"$in": [order_id]}}, None),
+        ("bulk_update_order_status (write)", "orders",
+         {"_id": order_id, "status": OrderStatus.NEW, "stats_status": "new"}, None),
+        ("reconcile_daily_stats (stamp)", "orders", {"_id": order_id, "status": OrderStatus.NEW}, None),
+        ("rebuild_daily_stats (moved)", "orders",
+         {"_id": {"$in": [order_id]}, "stats_status": "new", "status": {"$ne": "new"}}, None),
+        ("get_orders_page", "orders",
+         {"status": {"$in": ACTIVE_STATUSES}, **_keyset_filter((now, str(order_id)), "$lt")},
+         [("created_at", -1), ("_id", -1)]),
+        ("get_orders_by_period", "orders", _local_days_filter(week), [("created_at", -1)]),
+        ("demand_matrix (orders)", "orders", _local_days_filter(week), None),
+        ("iter_orders_between (export)", "orders",
+         {"created_at": {"$gte": week.start, "$lt": week.end}}, [("created_at", 1)]),
+        ("analytics_summary", "orders", {"created_at": _created_between(_period_start("month"), None)}, None),
+        ("reconcile_daily_stats", "orders", {"created_at": {"$gte": week.start}}, None),
+        ("backfill_local_dates", "orders", {"local_date": None}, None),
+        ("get_sheet_backlog", "orders", _sheet_backlog_filter(now), [("created_at", 1)]),
+        ("daily_stats (reports)", "daily_stats", {"_id": _days_between(week.start, week.end)}, None),
+        ("daily_stats (to date)", "daily_stats", {"_id": _days_between(_period_start("month"), None)}, None),
+        ("demand_matrix (rollup)", "daily_stats",
+         {"_id": {"$gte": week.local_dates[0], "$lte": week.local_dates[-1]}}, None),
+        ("apply_order_to_daily_stats (day)", "daily_stats", {"_id": week.local_dates[-1]}, None),
+        ("get_inventory", "inventory", {"key": {"$exists": True}}, None),
+        ("get_inventory_keys", "inventory", {}, [("key", 1)]),
+        ("inventory_key_exists", "inventory", {"key": "картошка"}, None),
+        ("is_admin", "admins", {"user_id": 1}, None),
+        ("get_config", "config", {"key": DAILY_STATS_BUILT_KEY}, None),
+        ("get_availability_dict", "availability", {"_id": AVAILABILITY_DOC_ID}, None),
+        ("get_pending_notifications", "notifications", {"sent": False}, [("created_at", 1)]),
+        ("claim_notifications", "notifications", _claimable_notifications(now), [("created_at", 1)]),
+        ("claim_notifications (batch)", "notifications", {"lease_id": lease_id}, [("created_at", 1)]),
+        ("claim_notifications (update)", "notifications",
+         {"_id": {"$in": [ObjectId()]}, **_claimable_notifications(now)}, None),
+        ("renew_notification_lease", "notifications", _held_notifications(lease_id), None),
+        ("finish_notifications", "notifications", {"_id": ObjectId(), "lease_id": lease_id}, None),
+        ("mark_notification_sent", "notifications", {"_id": ObjectId()}, None),
+    ]
+
+
+def _stages(plan) -> Iterator[str]:
+    """Yield every stage name in an explain() plan tree (classic and SBE formats)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+async def check() -> int:
+    load_dotenv()
+    await db.connect()
+    failures = 0
+    try:
+        for name, collection, flt, sort in hot_queries():
+            cursor = db.db[collection].find(flt)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.explain()
+            stages = list(_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+            ok = "COLLSCAN" not in stages
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name:<28} {collection:<14} {' > '.join(stages)}")
+    finally:
+        await db.disconnect()
+    if failures:
+        print(f"{failures} queries do a collection scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check()))
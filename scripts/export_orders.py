@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Export orders created between two dates to a compressed CSV or Parquet file.
+
+Same schema and streaming writer as the /export admin command (utils/export.py):
+orders are read from a batched cursor and written chunk by chunk, so memory
+stays flat for any range. Dates are Uzbekistan-local calendar days, both
+inclusive. Parquet needs the optional pyarrow package.
+
+Usage:
+    python scripts/export_orders.py --from 2025-01-01 --to 2025-12-31
+    python scripts/export_orders.py --from 01.01.2025 --to 31.01.2025 --format parquet --output jan.parquet
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from data.database import db
+from utils.export import EXPORT_FORMATS, export_filename, export_orders
+from utils.helpers import local_day_start_utc, parse_local_date
+
+
+async def run(first_day, last_day, fmt: str, output: str) -> int:
+    load_dotenv()
+    await db.connect()
+    try:
+        started = time.perf_counter()
+        count = await export_orders(
+            output, local_day_start_utc(first_day), local_day_start_utc(last_day + timedelta(days=1)), fmt
+        )
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        await db.disconnect()
+    size = os.path.getsize(output) / 1024
+    print(f"✅ Exported {count} orders to {output} ({size:.0f} KiB) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export orders to CSV.gz or Parquet")
+    parser.add_argument("--from", dest="first_day", type=parse_local_date, required=True,
+                        help="First day (YYYY-MM-DD or DD.MM.YYYY), inclusive")
+    parser.add_argument("--to", dest="last_day", type=parse_local_date, required=True,
+                        help="Last day (YYYY-MM-DD or DD.MM.YYYY), inclusive")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="Output format")
+    parser.add_argument("--output", help="Output file (default: orders_<from>_<to>.csv.gz / .parquet)")
+    args = parser.parse_args()
+    if args.last_day < args.first_day:
+        parser.error("--to is before --from")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = args.output or export_filename(args.first_day, args.last_day, args.format)
+    sys.exit(asyncio.run(run(args.first_day, args.last_day, args.format, output)))
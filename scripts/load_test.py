@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test of the admin bot.
+
+Everything runs in one process: the in-memory MongoDB stand-in
+(utils/testing/fake_mongo.py, with change streams) and a local fake Bot API
+(utils/testing/fake_telegram.py) replace the real services, while the bot code under
+test is the production code path:
+
+- a simulated client bot inserts NEW orders into db.orders at --rate per second
+- the order monitor (bot.main.order_monitor, stream or poll mode) alerts every
+  admin through the rate-limited OutboundSender
+- simulated admins react to each alert after --think-ms and click through
+  order:open, then order:confirm / order:set for each status in --statuses,
+  fed to the real dispatcher (access middleware + handlers), which messages
+  the client through the client bot
+
+Reported: insert-to-alert latency (first and last admin), status-change-to-
+client-message latency, throughput and MongoDB operations per order.
+
+Usage:
+    python scripts/load_test.py --orders 500 --rate 20 --admins 3
+    python scripts/load_test.py --orders 2000 --rate 50 --monitor poll --telegram-latency 40
+    python scripts/load_test.py --orders 500 --rate 20 --output load.json
+
+At the default Telegram limits every admin chat takes about TELEGRAM_CHAT_RATE
+alerts per second, so rates above that measure the alert queue; --chat-rate
+overrides the limit for what-if runs.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import bot.main as main
+from bot.handlers import router
+from bot.middlewares import AdminAccessMiddleware, AdminSet
+from data.config import TELEGRAM_CHAT_BURST, TELEGRAM_CHAT_RATE, TELEGRAM_GLOBAL_RATE
+from data.database import db
+from scripts.bench_data import make_order_doc
+from utils.testing.fake_mongo import FakeDatabase
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, CLIENT_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+from utils.sender import OutboundSender
+
+FIRST_ADMIN_ID = 5000
+ALERT_ID = re.compile(r"🆔 (\w+)")
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": pick(0.5),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.admin_ids = [FIRST_ADMIN_ID + i for i in range(args.admins)]
+        self.statuses = [s for s in args.statuses.split(",") if s]
+        self.rng = random.Random(args.seed)
+        self.update_ids = itertools.count(1)
+        # order id -> insert time / client user id
+        self.inserted_at: Dict[str, float] = {}
+        self.user_of: Dict[str, int] = {}
+        # order id -> alert times (one per admin)
+        self.alerted_at: Dict[str, List[float]] = {}
+        self.client_latency: List[float] = []
+        self.admin_queue: asyncio.Queue = asyncio.Queue()
+        self.done = 0
+        self.all_done = asyncio.Event()
+
+    # -- simulated client bot ------------------------------------------------
+    async def client(self) -> None:
+        interval = 1 / self.args.rate
+        started = time.perf_counter()
+        for i in range(self.args.orders):
+            # Hold the schedule (open-loop arrivals) instead of sleeping a fixed interval
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            user_id = 100_000 + i
+            doc = make_order_doc(self.rng, datetime.utcnow(), user_id=user_id)
+            doc.update(status="new", sheet_synced=False, client_message_id=i + 1)
+            result = await db.orders.insert_one(doc)
+            order_id = str(result.inserted_id)
+            self.inserted_at[order_id] = time.perf_counter()
+            self.user_of[order_id] = user_id
+
+    # -- alert watcher ---------------------------------------------------------
+    async def watch_alerts(self, server: FakeTelegramAPI) -> None:
+        """Turn admin alerts seen by the fake Bot API into admin work items"""
+        seen = 0
+        while True:
+            calls = server.calls
+            for call in calls[seen:]:
+                if call["token"] != ADMIN_BOT_TOKEN or call["method"].lower() != "sendmessage":
+                    continue
+                text = call["payload"].get("text", "")
+                match = ALERT_ID.search(text)
+                if not text.startswith("🆕") or not match:
+                    continue
+                order_id = match.group(1)
+                times = self.alerted_at.setdefault(order_id, [])
+                times.append(call["time"])
+                if len(times) == 1:
+                    # The first admin to see the alert handles the order
+                    admin_id = int(call["payload"]["chat_id"])
+                    self.admin_queue.put_nowait((order_id, admin_id))
+            seen = len(calls)
+            await asyncio.sleep(0.002)
+
+    # -- simulated admins ------------------------------------------------------
+    def _callback(self, admin_id: int, data: str) -> Update:
+        update_id = next(self.update_ids)
+        user = User(id=admin_id, is_bot=False, first_name="Admin")
+        message = Message(message_id=update_id, date=datetime.utcnow(),
+                          chat=Chat(id=admin_id, type="private"), text="🆕 Новый заказ!")
+        return Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id), from_user=user, chat_instance="load", data=data, message=message))
+
+    async def admin(self, dp: Dispatcher, bot: Bot, server: FakeTelegramAPI) -> None:
+        think = self.args.think_ms / 1000
+        while True:
+            order_id, admin_id = await self.admin_queue.get()
+            await asyncio.sleep(think)
+            await dp.feed_update(bot, self._callback(admin_id, f"order:open:{order_id}"))
+            user_id = self.user_of[order_id]
+            for status in self.statuses:
+                await asyncio.sleep(think)
+                await dp.feed_update(bot, self._callback(admin_id, f"order:confirm:{order_id}:{status}"))
+                before = len(server.calls)
+                clicked = time.perf_counter()
+                await dp.feed_update(bot, self._callback(admin_id, f"order:set:{order_id}:{status}"))
+                sent = next((c["time"] for c in server.calls[before:]
+                             if c["token"] == CLIENT_BOT_TOKEN and int(c["payload"].get("chat_id") or 0) == user_id),
+                            None)
+                if sent is not None:
+                    self.client_latency.append(sent - clicked)
+            self.done += 1
+            if self.done == self.args.orders:
+                self.all_done.set()
+
+    # -- run -------------------------------------------------------------------
+    async def run(self) -> Dict:
+        args = self.args
+        fake = FakeDatabase(supports_change_streams=args.monitor == "stream")
+        db.db = fake
+        for admin_id in self.admin_ids:
+            await fake.admins.insert_one({"user_id": admin_id, "name": f"Admin {admin_id}"})
+        main.ADMIN_IDS = self.admin_ids
+        main.ORDER_MONITOR_MODE = args.monitor
+        main.ORDER_POLL_INTERVAL = args.poll_interval
+
+        server = await FakeTelegramAPI(latency=args.telegram_latency / 1000).start()
+        admin_bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        client_bot = Bot(token=CLIENT_BOT_TOKEN, session=fake_telegram_session(server.url))
+        dp = Dispatcher()
+        dp.include_router(router)
+        admins = AdminSet()
+        await admins.refresh()
+        dp.update.outer_middleware(AdminAccessMiddleware(admins))
+        dp["client_bot"] = client_bot
+        dp["client_sender"] = OutboundSender(client_bot)
+        sender = OutboundSender(admin_bot, global_rate=args.global_rate,
+                                chat_rate=args.chat_rate, chat_burst=args.chat_burst)
+
+        tasks = [
+            asyncio.create_task(main.order_monitor(sender)),
+            asyncio.create_task(self.watch_alerts(server)),
+        ]
+        tasks += [asyncio.create_task(self.admin(dp, admin_bot, server)) for _ in self.admin_ids]
+        ops_before = dict(fake.ops)
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            await self.client()
+            try:
+                await asyncio.wait_for(self.all_done.wait(), args.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+        finally:
+            elapsed = time.perf_counter() - started
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await admin_bot.session.close()
+            await client_bot.session.close()
+            await server.stop()
+
+        orders = len(self.inserted_at)
+        ops = {key: value - ops_before.get(key, 0) for key, value in fake.ops.items()
+               if value != ops_before.get(key, 0)}
+        first_alert = [times[0] - self.inserted_at[oid] for oid, times in self.alerted_at.items()
+                       if oid in self.inserted_at]
+        all_alerts = [times[-1] - self.inserted_at[oid] for oid, times in self.alerted_at.items()
+                      if oid in self.inserted_at and len(times) >= len(self.admin_ids)]
+        return {
+            "config": {
+                "orders": args.orders, "rate": args.rate, "admins": args.admins, "monitor": args.monitor,
+                "statuses": self.statuses, "think_ms": args.think_ms, "telegram_latency_ms": args.telegram_latency,
+                "global_rate": args.global_rate, "chat_rate": args.chat_rate, "chat_burst": args.chat_burst,
+            },
+            "completed_orders": self.done,
+            "timed_out": timed_out,
+            "elapsed_s": round(elapsed, 2),
+            "orders_per_s": round(self.done / elapsed, 2) if elapsed else 0,
+            "insert_to_first_alert": _percentiles(first_alert),
+            "insert_to_all_alerts": _percentiles(all_alerts),
+            "status_change_to_client": _percentiles(self.client_latency),
+            "telegram_calls": len(server.calls),
+            "mongo_ops_per_order": round(sum(ops.values()) / orders, 2) if orders else 0,
+            "mongo_ops": {key: round(value / orders, 2) for key, value in sorted(ops.items())} if orders else {},
+        }
+
+
+def print_report(report: Dict) -> None:
+    config = report["config"]
+    print(f"{report['completed_orders']}/{config['orders']} orders handled in {report['elapsed_s']}s "
+          f"({report['orders_per_s']}/s), {config['admins']} admins, monitor={config['monitor']}"
+          + ("  ⚠️ timed out" if report["timed_out"] else ""))
+    print(f"Alert limits: {config['global_rate']:g} msg/s overall, {config['chat_rate']:g} msg/s per admin chat "
+          f"(burst {config['chat_burst']:g}); alerts queue up once rate exceeds chat_rate")
+    print(f"\n{'latency':<28}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in ("insert_to_first_alert", "insert_to_all_alerts", "status_change_to_client"):
+        row = report[name]
+        if not row["count"]:
+            print(f"{name:<28}{0:>7}")
+            continue
+        print(f"{name:<28}{row['count']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    print(f"\nTelegram API calls: {report['telegram_calls']}")
+    print(f"MongoDB ops per order: {report['mongo_ops_per_order']} "
+          "(orders.insert is the simulated client bot)")
+    for key, value in report["mongo_ops"].items():
+        print(f"  {key:<28}{value:>8.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test of the admin bot")
+    parser.add_argument("--orders", type=int, default=300, help="Orders the simulated client bot inserts")
+    parser.add_argument("--rate", type=float, default=10, help="Orders inserted per second")
+    parser.add_argument("--admins", type=int, default=3, help="Simulated admins (each one gets every alert)")
+    parser.add_argument("--statuses", default="accepted,in_progress,ready,completed",
+                        help="Comma-separated statuses each order is moved through")
+    parser.add_argument("--think-ms", type=float, default=20, help="Admin delay before each click")
+    parser.add_argument("--monitor", choices=("stream", "poll"), default="stream", help="Order monitor mode")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Poll interval for --monitor poll")
+    parser.add_argument("--telegram-latency", type=float, default=0, help="Fake Bot API latency per call, ms")
+    parser.add_argument("--global-rate", type=float, default=TELEGRAM_GLOBAL_RATE,
+                        help="Alert messages per second overall (TELEGRAM_GLOBAL_RATE)")
+    parser.add_argument("--chat-rate", type=float, default=TELEGRAM_CHAT_RATE,
+                        help="Alert messages per second per admin chat (TELEGRAM_CHAT_RATE)")
+    parser.add_argument("--chat-burst", type=float, default=TELEGRAM_CHAT_BURST,
+                        help="Per-chat burst allowance (TELEGRAM_CHAT_BURST)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for the last order")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for synthetic orders")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own log output")
+    return parser.parse_args()
+
+
+def main_cli() -> int:
+    args = parse_args()
+    load = LoadTest(args)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        report = asyncio.run(load.run())
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 1 if report["timed_out"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
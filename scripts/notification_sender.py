@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
 """
-Notification sender script for the client bot.
-This script should be called periodically by the client bot to send pending notifications.
+Notification sender for the client bot.
+
+Delivers pending notifications from the `notifications` collection. Each
+batch is leased atomically, so any number of copies (one-shot runs or
+daemons) can run at the same time without sending duplicates. Sends go
+through the shared rate limiter and each batch is marked with one bulk_write.
+
+By default sends what is pending and exits (e.g. from cron). With --daemon it
+keeps running and wakes on a change stream as notifications are inserted,
+falling back to polling every --interval seconds where change streams are
+unavailable.
 
 Usage:
     python scripts/notification_sender.py --bot-token YOUR_CLIENT_BOT_TOKEN
+    python scripts/notification_sender.py --bot-token YOUR_CLIENT_BOT_TOKEN --daemon
 """
 
 import asyncio
@@ -18,47 +28,29 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 from aiogram import Bot
 from data.database import db
-from data.operations import get_pending_notifications, mark_notification_sent
+from utils.notifications import NotificationDispatcher
+from utils.sender import OutboundSender
 
 load_dotenv()
 
 
-async def send_pending_notifications(bot_token: str):
-    """Send all pending notifications to clients."""
+async def send_pending_notifications(bot_token: str, daemon: bool, batch_size: int, interval: float):
+    """Send pending notifications to clients (once, or continuously with daemon=True)."""
     bot = Bot(token=bot_token)
-    
+    dispatcher = NotificationDispatcher(OutboundSender(bot), batch_size=batch_size, poll_interval=interval)
+
     try:
         # Connect to database
         await db.connect()
-        
-        # Get pending notifications
-        notifications = await get_pending_notifications()
-        
-        if not notifications:
-            print("No pending notifications found.")
-            return
-        
-        print(f"Found {len(notifications)} pending notifications.")
-        
-        sent_count = 0
-        for notification in notifications:
-            try:
-                # Send the notification to the client
-                await bot.send_message(notification.user_id, notification.message)
-                
-                # Mark as sent
-                await mark_notification_sent(notification.id)
-                sent_count += 1
-                
-                print(f"✅ Sent notification to user {notification.user_id} for order {notification.order_id}")
-                
-            except Exception as e:
-                print(f"❌ Failed to send notification to user {notification.user_id}: {e}")
-                # Don't mark as sent if delivery failed
-                continue
-        
-        print(f"Successfully sent {sent_count}/{len(notifications)} notifications.")
-        
+
+        if daemon:
+            print(f"Notification sender {dispatcher.worker_id} is running...")
+            await dispatcher.run()
+        else:
+            claimed = await dispatcher.drain()
+            if not claimed:
+                print("No pending notifications found.")
+
     finally:
         await db.disconnect()
         await bot.session.close()
@@ -71,9 +63,15 @@ def parse_args():
         required=True,
         help="Client bot token for sending notifications"
     )
+    parser.add_argument("--daemon", action="store_true", help="Keep running and send notifications as they arrive")
+    parser.add_argument("--batch-size", type=int, default=50, help="Notifications leased per batch")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between polls in daemon mode")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    asyncio.run(send_pending_notifications(args.bot_token))
+    try:
+        asyncio.run(send_pending_notifications(args.bot_token, args.daemon, args.batch_size, args.interval))
+    except KeyboardInterrupt:
+        print("\n👋 Notification sender stopped")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily_stats rollup from the full order history.
+
+Stamps `local_date` (its Uzbekistan calendar day) on orders created before the
+field existed, recomputes every day from scratch into daily_stats_staging,
+marks each order with the status it was counted under (stats_status), swaps
+the new rollup in and flags it as built, after which reports read daily_stats
+instead of scanning orders. Reports keep reading the previous rollup until the
+swap, and orders whose status changed during the scan are re-accounted after
+it. Safe to re-run.
+
+Usage:
+    python scripts/rebuild_daily_stats.py
+    python scripts/rebuild_daily_stats.py --dry-run
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Ensure project root is on sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from data.database import db
+from data.operations import backfill_local_dates, collect_daily_stats, rebuild_daily_stats
+
+
+async def rebuild(dry_run: bool) -> None:
+    load_dotenv()
+    await db.connect()
+    try:
+        if dry_run:
+            days = await collect_daily_stats()
+            unstamped = await db.orders.count_documents({"local_date": None})
+            print(f"[DRY RUN] Would stamp local_date on {unstamped} orders and write {len(days)} days. No changes made.")
+            return
+        stamped = await backfill_local_dates()
+        print(f"✅ Stamped local_date on {stamped} orders")
+        count = await rebuild_daily_stats()
+        print(f"✅ Rebuilt daily_stats for {count} days")
+    finally:
+        await db.disconnect()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the daily_stats rollup from all orders")
+    parser.add_argument("--dry-run", action="store_true", help="Scan and report without writing")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(rebuild(dry_run=args.dry_run))
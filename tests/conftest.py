@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.orders import chart_cache
+from data.database import db
+from data.operations import analytics_cache, catalog_cache
+from utils.testing.fake_mongo import FakeDatabase
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "run_last: run after every other test (needs the whole suite's queries)")
+
+
+def pytest_collection_modifyitems(items):
+    items.sort(key=lambda item: item.get_closest_marker("run_last") is not None)
+
+
+@pytest.fixture(scope="session")
+def suite_queries():
+    """Query shapes issued by data.operations over the whole session (see FakeDatabase.record_query)."""
+    return set()
+
+
+@pytest.fixture
+def fake_db(monkeypatch, suite_queries):
+    """Point the global Database at an in-memory replica-set stand-in."""
+    fake = FakeDatabase(record_queries=True)
+    monkeypatch.setattr(db, "db", fake)
+    # Cached results belong to the previous test's database
+    analytics_cache.invalidate()
+    catalog_cache.invalidate()
+    chart_cache.invalidate()
+    yield fake
+    suite_queries.update(fake.queries)
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """Dispatcher with the admin router; the router is detached again afterwards."""
+    from aiogram import Dispatcher
+    from bot.handlers import router
+
+    # monkeypatch restores the router's (empty) parent on teardown
+    monkeypatch.setattr(router, "_parent_router", None)
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
@@ -0,0 +1,329 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from data.operations import analytics_summary
+
+# Awkward stored values both analytics paths must read the same way
+ODD_VALUES = [" 3 ", "+3", "1_000", "3.0", "007", "", "  ", "abc", 3.7, -2, True, False, None,
+              float("nan"), {"x": 1}, [1], {}, [], "1__000", "_1", "-0", " +3\n", "+-3", "- 3", -0.0,
+              float("inf"), 2 ** 40]
+
+
+def test_summary_tolerates_unknown_statuses_and_bad_values(fake_db):
+    now = datetime.utcnow()
+    docs = [
+        {"status": "completed", "total": 20000, "items": {"мясо": 2, "картошка": 1}},
+        {"status": "Completed", "total": "10000", "items": {"картошка": "2"}},
+        {"status": "pending_admin_confirmation", "total": 5000, "items": {"тыква": 3}},
+        {"status": "canceled", "total": 99999, "items": {"мясо": 50}},
+        {"status": "payment_failed", "total": 1, "items": {"мясо": 50}},
+        {"status": "new", "items": {"зелень": None, "мясо": "x"}},
+        {"status": "completed", "total": None, "items": "legacy"},
+        {"status": "completed", "total": 100, "created_at": now - timedelta(days=40)},
+    ]
+    for doc in docs:
+        doc.setdefault("created_at", now)
+        asyncio.run(fake_db.orders.insert_one(doc))
+
+    # The in-memory stand-in has no aggregation, so this exercises the Python fallback
+    summary = asyncio.run(analytics_summary("week"))
+    assert summary["orders_total"] == 5
+    assert summary["orders_completed"] == 3
+    assert summary["revenue_completed"] == 30000
+    assert summary["avg_check_completed"] == 10000
+    # Ties are ordered by key
+    assert summary["top_items"] == [("картошка", 3), ("тыква", 3), ("мясо", 2)]
+
+
+def test_int_normalisation():
+    from data.operations import _safe_int
+
+    # Exactly what the original `int(qty or 0)` accepted
+    assert [_safe_int(v) for v in ODD_VALUES] == [3, 3, 1000, None, 7, 0, None, None, 3, -2, 1, 0, 0,
+                                                  None, None, None, 0, 0, None, None, 0, 3, None, None, 0,
+                                                  None, 2 ** 40]
+
+
+def test_int_expr_matches_safe_int():
+    from bson import Decimal128
+
+    from data.operations import _int_expr, _safe_int
+    from utils.testing.fake_aggregate import evaluate
+
+    values = ODD_VALUES + [Decimal128("3"), datetime(2025, 1, 1)]
+    assert [evaluate(_int_expr("$v"), {"v": v}) for v in values] == [_safe_int(v) for v in values]
+    assert evaluate(_int_expr("$v"), {}) == 0
+
+
+def _odd_orders(now):
+    docs = [{"status": status, "total": value, "items": {"мясо": value, "тыква": 1, f"k{i}": value},
+             "created_at": now}
+            for i, value in enumerate(ODD_VALUES) for status in ("completed", "new", "Cancelled")]
+    docs.append({"status": None, "total": 5, "items": "legacy", "created_at": now})
+    return docs
+
+
+def test_pipeline_matches_python_path_without_mongod(fake_db):
+    """The analytics pipeline, run by the in-memory evaluator, against the Python path"""
+    from data.operations import _analytics_summary_pipeline, _analytics_summary_python, _period_start
+
+    fake_db.supports_aggregation = True
+
+    async def scenario():
+        await fake_db.orders.insert_many(_odd_orders(datetime.utcnow()))
+        start = _period_start("week")
+        return (await _analytics_summary_pipeline("week", start),
+                await _analytics_summary_python("week", start))
+
+    pipeline, python = asyncio.run(scenario())
+    assert pipeline == python
+    assert python["orders_total"] == 2 * len(ODD_VALUES) + 1
+
+
+def test_pipeline_matches_python_path(monkeypatch):
+    """The same check against a real mongod (MONGODB_TEST_URI), which the evaluator models"""
+    uri = os.getenv("MONGODB_TEST_URI")
+    if not uri:
+        pytest.skip("MONGODB_TEST_URI is not set")
+    from uuid import uuid4
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from data.database import db
+    from data.operations import _analytics_summary_pipeline, _analytics_summary_python, _period_start
+
+    async def scenario():
+        client = AsyncIOMotorClient(uri)
+        database = client[f"samsariya_test_{uuid4().hex[:8]}"]
+        monkeypatch.setattr(db, "db", database)
+        try:
+            await database.orders.insert_many(_odd_orders(datetime.utcnow()))
+            start = _period_start("week")
+            return (await _analytics_summary_pipeline("week", start),
+                    await _analytics_summary_python("week", start))
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+
+    pipeline, python = asyncio.run(scenario())
+    assert pipeline == python
+
+
+def test_daily_stats_rollup_tracks_status_changes_and_matches_rebuild(fake_db):
+    from data.models import Order, OrderStatus
+    from data.operations import (
+        DAILY_STATS_BUILT_KEY,
+        _analytics_summary_python,
+        _period_start,
+        analytics_earnings,
+        create_order,
+        rebuild_daily_stats,
+        record_order_stats,
+        update_order_status,
+    )
+
+    def order(**fields):
+        base = dict(user_id=1, items={"мясо": 2, "тыква": 1}, total=30000,
+                    delivery="Самовывоз", time="12:00", method="Наличные")
+        base.update(fields)
+        return Order(**base)
+
+    async def scenario():
+        ids = [await create_order(order()) for _ in range(3)]
+        ids.append(await create_order(order(items={"картошка": 5}, total=40000, created_at=datetime.utcnow() - timedelta(days=3))))
+        # An order inserted directly (client bot) is picked up by the monitor path
+        raw = order(items={"зелень": 1}, total=8000).dict(exclude={"id"})
+        raw["_id"] = (await fake_db.orders.insert_one(raw)).inserted_id
+        await record_order_stats(order(_id=str(raw["_id"]), items={"зелень": 1}, total=8000))
+        await record_order_stats(order(_id=str(raw["_id"]), items={"зелень": 1}, total=8000))  # idempotent
+
+        for status in (OrderStatus.ACCEPTED, OrderStatus.READY, OrderStatus.COMPLETED):
+            await update_order_status(ids[0], status)
+        await update_order_status(ids[1], OrderStatus.CANCELLED)
+        await update_order_status(ids[3], OrderStatus.COMPLETED)
+
+        expected = await _analytics_summary_python("week", _period_start("week"))
+        await fake_db.config.insert_one({"key": DAILY_STATS_BUILT_KEY, "value": "now"})
+        incremental = {d["_id"]: d for d in fake_db.daily_stats.docs}
+        from data.operations import analytics_summary
+        rolled_up = await analytics_summary("week")
+        earnings = await analytics_earnings("week")
+        await rebuild_daily_stats()
+        rebuilt = {d["_id"]: d for d in fake_db.daily_stats.docs}
+        return expected, rolled_up, earnings, incremental, rebuilt
+
+    expected, rolled_up, earnings, incremental, rebuilt = asyncio.run(scenario())
+    assert rolled_up == expected
+    assert earnings == 70000
+    assert fake_db.ops["daily_stats.find"] == 2  # one small read per report
+
+    def nonzero(day):
+        return ({k: v for k, v in day["counts"].items() if v},
+                day.get("revenue_completed", 0),
+                {k: v for k, v in day["items"].items() if v})
+    assert incremental.keys() == rebuilt.keys()
+    assert all(nonzero(incremental[d]) == nonzero(rebuilt[d]) for d in rebuilt)
+
+
+def test_rebuild_swaps_in_a_whole_rollup_and_keeps_changes_made_meanwhile(fake_db, monkeypatch):
+    import data.operations as operations
+    from data.models import Order, OrderStatus
+    from data.operations import _analytics_summary_python, _period_start, create_order, rebuild_daily_stats
+
+    collect = operations.collect_daily_stats
+    during = {}
+
+    async def collect_then_change(*args, **kwargs):
+        days = await collect(*args, **kwargs)
+        # Reports still read the previous rollup while the new one is built...
+        during["summary"] = await operations._analytics_summary_rollup("week", _period_start("week"))
+        # ...and an admin completes an order after the scan counted it as new
+        await operations.update_order_status(during["order_id"], OrderStatus.COMPLETED)
+        return days
+
+    async def scenario():
+        for total in (20000, 9000):
+            during["order_id"] = await create_order(Order(user_id=1, items={"мясо": 2}, total=total,
+                                                          delivery="Самовывоз", time="12:00", method="Наличные"))
+        await rebuild_daily_stats()
+        before = await operations._analytics_summary_rollup("week", _period_start("week"))
+        monkeypatch.setattr(operations, "collect_daily_stats", collect_then_change)
+        await rebuild_daily_stats()
+        after = await operations._analytics_summary_rollup("week", _period_start("week"))
+        expected = await _analytics_summary_python("week", _period_start("week"))
+        return before, after, expected
+
+    before, after, expected = asyncio.run(scenario())
+    assert during["summary"] == before and before["orders_total"] == 2
+    assert after == expected and expected["revenue_completed"] == 9000
+    assert {d["stats_status"] for d in fake_db.orders.docs} == {"new", "completed"}
+    assert fake_db.daily_stats_staging.docs == []
+
+
+def test_rollup_matches_pipeline_on_awkward_item_keys(fake_db, monkeypatch):
+    import data.operations as operations
+    from data.models import OrderStatus
+    from data.operations import (
+        _analytics_summary_pipeline,
+        _analytics_summary_rollup,
+        _period_start,
+        rebuild_daily_stats,
+        update_order_status,
+    )
+
+    fake_db.supports_aggregation = True
+    # Compare every item, not just the top 3
+    monkeypatch.setattr(operations, "TOP_ITEMS_LIMIT", 20)
+    now = datetime.utcnow()
+    docs = [
+        {"status": "new", "items": {"1.5 кг": 2, "$x": "3", "a%2Eb": 1, "ноль": 0}},
+        {"status": "completed", "total": 9000, "items": {"1.5 кг": 1, "a.b": 4, "%": 0}},
+        {"status": "new", "items": {"отменят": 5, "$x": 1}},
+    ]
+
+    async def scenario():
+        ids = [(await fake_db.orders.insert_one({**doc, "created_at": now})).inserted_id for doc in docs]
+        await rebuild_daily_stats()
+        # The incremental path takes the keys out again
+        await update_order_status(str(ids[2]), OrderStatus.CANCELLED)
+        start = _period_start("week")
+        return await _analytics_summary_rollup("week", start), await _analytics_summary_pipeline("week", start)
+
+    rollup, pipeline = asyncio.run(scenario())
+    assert rollup == pipeline
+    assert dict(rollup["top_items"]) == {"1.5 кг": 3, "$x": 3, "a%2Eb": 1, "a.b": 4, "ноль": 0, "%": 0}
+
+
+def test_reconcile_picks_up_orders_changed_outside_the_bot(fake_db):
+    from data.models import Order
+    from data.operations import (
+        _analytics_summary_python,
+        _period_start,
+        create_order,
+        rebuild_daily_stats,
+        reconcile_daily_stats,
+    )
+
+    async def scenario():
+        await create_order(Order(user_id=1, items={"мясо": 2}, total=20000, delivery="Самовывоз",
+                                 time="12:00", method="Наличные"))
+        await create_order(Order(user_id=1, items={"тыква": 1}, total=9000, delivery="Самовывоз", time="12:00",
+                                       method="Наличные", created_at=datetime.utcnow() - timedelta(days=1)))
+        await rebuild_daily_stats()
+        # The client bot inserts and moves orders without this bot seeing them
+        await fake_db.orders.insert_one({"user_id": 2, "items": {"зелень": 3}, "total": 6000,
+                                         "status": "pending_admin_confirmation", "created_at": datetime.utcnow()})
+        await fake_db.orders.update_one({"_id": fake_db.orders.docs[0]["_id"]}, {"$set": {"status": "payment_failed"}})
+        await fake_db.orders.update_one({"_id": fake_db.orders.docs[1]["_id"]}, {"$set": {"status": "completed"}})
+        drifted = await analytics_summary("week")
+        reaccounted = await reconcile_daily_stats(2)
+        reconciled = await analytics_summary("week")
+        expected = await _analytics_summary_python("week", _period_start("week"))
+        return drifted, reaccounted, reconciled, expected
+
+    drifted, reaccounted, reconciled, expected = asyncio.run(scenario())
+    assert drifted != expected
+    assert reconciled == expected
+    assert expected["revenue_completed"] == 9000 and expected["orders_total"] == 2
+    assert reaccounted == 3
+    assert asyncio.run(reconcile_daily_stats(2)) == 0
+
+
+def test_analytics_cache_is_shared_by_aliases_and_dropped_on_status_change(fake_db):
+    from data.models import Order, OrderStatus
+    from data.operations import analytics_cache, create_order, update_order_status
+
+    async def scenario():
+        order_id = await create_order(Order(user_id=1, items={"мясо": 2}, total=20000, delivery="Самовывоз",
+                                            time="12:00", method="Наличные"))
+        before = await analytics_summary("week")
+        alias = await analytics_summary("неделя")
+        scans = fake_db.ops["orders.find"]
+        await update_order_status(order_id, OrderStatus.COMPLETED)
+        after = await analytics_summary("week")
+        return before, alias, scans, after
+
+    before, alias, scans, after = asyncio.run(scenario())
+    assert alias["period"] == "неделя" and alias["revenue_completed"] == before["revenue_completed"] == 0
+    assert scans == 1
+    assert after["revenue_completed"] == 20000
+    assert analytics_cache.stats()["hits"] == 1
+
+
+def test_periods_follow_local_days_and_local_date(fake_db):
+    from data.operations import (
+        analytics_earnings,
+        analytics_summary,
+        backfill_local_dates,
+        get_orders_by_period,
+    )
+    from utils.helpers import local_day_start_utc, local_today
+
+    today_start = local_day_start_utc(local_today())
+    docs = [
+        # 00:30 local today is still the previous UTC day
+        {"status": "completed", "total": 100, "created_at": today_start + timedelta(minutes=30)},
+        {"status": "completed", "total": 20, "created_at": today_start - timedelta(minutes=30)},
+        {"status": "completed", "total": 3, "created_at": today_start - timedelta(days=1, minutes=30)},
+    ]
+    for doc in docs:
+        doc.update(user_id=1, items={"мясо": 1}, delivery="Самовывоз", time="12:00", method="Наличные")
+        asyncio.run(fake_db.orders.insert_one(doc))
+
+    assert asyncio.run(analytics_earnings("today")) == 100
+    assert asyncio.run(analytics_earnings("yesterday")) == 20
+    yesterday = (local_today() - timedelta(days=1)).strftime("%d.%m.%Y")
+    two_days = (local_today() - timedelta(days=2)).strftime("%Y-%m-%d")
+    assert asyncio.run(analytics_summary(f"{two_days}..{yesterday}"))["revenue_completed"] == 23
+
+    # Unstamped orders are found by created_at, stamped ones by local_date
+    before = [o.total for o in asyncio.run(get_orders_by_period("week"))]
+    assert asyncio.run(backfill_local_dates()) == 3
+    assert asyncio.run(backfill_local_dates()) == 0
+    assert all(doc["local_date"] for doc in fake_db.orders.docs)
+    assert [o.total for o in asyncio.run(get_orders_by_period("week"))] == before == [100, 20, 3]
+    assert [o.total for o in asyncio.run(get_orders_by_period("yesterday"))] == [20]
+    assert asyncio.run(get_orders_by_period("decade")) == []
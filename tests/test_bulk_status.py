@@ -0,0 +1,130 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from data.models import OrderStatus
+from data.operations import bulk_update_order_status, collect_daily_stats, rebuild_daily_stats
+from scripts.bench_data import make_order_doc
+
+
+def _seed(fake_db, statuses, seed=6):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    ids = []
+    for i, status in enumerate(statuses):
+        doc = make_order_doc(rng, now - timedelta(hours=i * 7)) | {"status": status, "user_id": 100 + i}
+        doc.pop("client_message_id", None)
+        ids.append(str(asyncio.run(fake_db.orders.insert_one(doc)).inserted_id))
+    return ids
+
+
+def _rollup(fake_db):
+    days = {}
+    for doc in fake_db.daily_stats.docs:
+        fields = {f"counts.{k}": v for k, v in doc.get("counts", {}).items()}
+        fields.update({f"items.{k}": v for k, v in doc.get("items", {}).items()})
+        fields.update({f"item_orders.{k}": v for k, v in doc.get("item_orders", {}).items()})
+        fields["revenue_completed"] = doc.get("revenue_completed", 0)
+        days[doc["_id"]] = {k: v for k, v in fields.items() if v}
+    return days
+
+
+def test_bulk_update_is_one_write_and_reports_skips(fake_db):
+    ids = _seed(fake_db, ["ready"] * 4 + ["completed", "new"])
+    asyncio.run(rebuild_daily_stats())
+    fake_db.ops.clear()
+
+    result = asyncio.run(bulk_update_order_status(None, OrderStatus.COMPLETED, from_status=OrderStatus.READY))
+    assert sorted(o.id for o in result.changed) == sorted(ids[:4])
+    assert all(o.status == OrderStatus.COMPLETED for o in result.changed) and not result.skipped
+    assert fake_db.ops["orders.bulkWrite"] == 1 and fake_db.ops["daily_stats.bulkWrite"] == 1
+    expected = {day: {k: v for k, v in fields.items() if v} for day, fields in asyncio.run(collect_daily_stats()).items()}
+    assert _rollup(fake_db) == expected
+
+    missing = str(ObjectId())
+    result = asyncio.run(bulk_update_order_status(
+        [ids[0], ids[4], ids[5], "bad", missing], OrderStatus.CANCELLED, from_status=OrderStatus.READY))
+    assert result.changed == []
+    assert result.skipped == {"bad": "invalid_id", missing: "not_found", ids[0]: "closed",
+                              ids[4]: "closed", ids[5]: "wrong_status"}
+
+    result = asyncio.run(bulk_update_order_status([ids[5], ids[5]], OrderStatus.NEW))
+    assert result.skipped == {ids[5]: "same_status"}
+
+
+def test_multi_select_applies_one_status_and_notifies_clients(fake_db, dispatcher):
+    from aiogram import Bot
+    from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+    from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, CLIENT_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+    from utils.sender import OutboundSender
+
+    ids = _seed(fake_db, ["new", "new", "new", "ready"])
+    user = User(id=1, is_bot=False, first_name="Admin")
+    chat = Chat(id=1, type="private")
+    now = datetime.utcnow()
+
+    def buttons(call):
+        markup = call["payload"]["reply_markup"]
+        rows = (json.loads(markup) if isinstance(markup, str) else markup)["inline_keyboard"]
+        return [b["callback_data"] for row in rows for b in row]
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        client_bot = Bot(token=CLIENT_BOT_TOKEN, session=fake_telegram_session(server.url))
+        dispatcher["client_sender"] = OutboundSender(client_bot, chat_rate=100, chat_burst=10)
+        update_ids = iter(range(1, 100))
+
+        async def click(data):
+            await dispatcher.feed_update(bot, Update(update_id=next(update_ids), callback_query=CallbackQuery(
+                id=data, from_user=user, chat_instance="1", data=data,
+                message=Message(message_id=7, date=now, chat=chat, text="list"))))
+            return server.calls_to("editMessageText")[-1]
+
+        try:
+            await dispatcher.feed_update(bot, Update(update_id=next(update_ids), message=Message(
+                message_id=1, date=now, chat=chat, from_user=user, text="/new_orders")))
+            listed = server.calls[-1]
+            assert "ol:n:s" in buttons(listed)
+            page = await click("ol:n:s")
+            assert "ol:b:accepted" not in buttons(page)
+            await click(f"ol:t:{ids[0]}")
+            await click(f"ol:t:{ids[1]}")
+            await click(f"ol:t:{ids[2]}")
+            page = await click(f"ol:t:{ids[2]}")
+            assert "Выбрано: 2" in page["payload"]["text"] and "ol:b:accepted" in buttons(page)
+            confirm = await click("ol:b:accepted")
+            assert "(2)" in confirm["payload"]["text"]
+            report = await click("ol:B:accepted")
+            # The selection is gone once applied
+            await dispatcher.feed_update(bot, Update(update_id=next(update_ids), callback_query=CallbackQuery(
+                id="stale", from_user=user, chat_instance="1", data=f"ol:t:{ids[2]}",
+                message=Message(message_id=7, date=now, chat=chat, text="list"))))
+
+            await dispatcher.feed_update(bot, Update(update_id=next(update_ids), message=Message(
+                message_id=2, date=now, chat=chat, from_user=user, text=f"/bulk_status completed {ids[0]}, {ids[3]}")))
+            command = server.calls_to("sendMessage")[-1]
+        finally:
+            await bot.session.close()
+            await client_bot.session.close()
+            await server.stop()
+        return server, report, command
+
+    server, report, command = asyncio.run(scenario())
+    assert report["payload"]["text"].startswith("📦 Статус «принят»: изменено 2, пропущено 0")
+    assert "Клиенты уведомлены: 2 из 2" in report["payload"]["text"]
+    statuses = {str(d["_id"]): d["status"] for d in fake_db.orders.docs}
+    assert [statuses[i] for i in ids] == ["completed", "accepted", "new", "completed"]
+
+    client_messages = [c for c in server.calls_to("sendMessage") if c["token"] == CLIENT_BOT_TOKEN]
+    assert sorted(int(c["payload"]["chat_id"]) for c in client_messages) == [100, 101, 103]
+    # The second update edits the message the client already got
+    client_edits = [c for c in server.calls_to("editMessageText") if c["token"] == CLIENT_BOT_TOKEN]
+    assert [int(c["payload"]["chat_id"]) for c in client_edits] == [100]
+    assert server.calls_to("answerCallbackQuery")[-1]["payload"]["show_alert"] in (True, "true")
+    assert all(d.get("client_message_id") for d in fake_db.orders.docs if str(d["_id"]) != ids[2])
+    assert "изменено 2, пропущено 0" in command["payload"]["text"]
@@ -0,0 +1,63 @@
+import asyncio
+
+from utils.cache import ResultCache
+
+
+def test_concurrent_callers_share_one_computation_and_lru_evicts():
+    cache = ResultCache(ttl=60, maxsize=2)
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key * 10
+
+    async def scenario():
+        results = await asyncio.gather(*[cache.get_or_compute(1, lambda: compute(1)) for _ in range(5)])
+        await cache.get_or_compute(2, lambda: compute(2))
+        await cache.get_or_compute(1, lambda: compute(1))  # 1 becomes most recent
+        await cache.get_or_compute(3, lambda: compute(3))  # evicts 2
+        await cache.get_or_compute(2, lambda: compute(2))
+        return results
+
+    assert asyncio.run(scenario()) == [10] * 5
+    assert calls == [1, 2, 3, 2]
+    assert cache.stats() == {"hits": 5, "misses": 4, "size": 2}
+
+
+def test_expired_and_invalidated_entries_are_recomputed():
+    cache = ResultCache(ttl=0.05, maxsize=8)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        # An order written while this runs must not leave a stale entry behind
+        if len(calls) == 2:
+            cache.invalidate(lambda key: key == "a")
+        return len(calls)
+
+    async def scenario():
+        first = await cache.get_or_compute("a", compute)
+        await asyncio.sleep(0.06)
+        second = await cache.get_or_compute("a", compute)
+        third = await cache.get_or_compute("a", compute)
+        fourth = await cache.get_or_compute("a", compute)
+        return first, second, third, fourth
+
+    assert asyncio.run(scenario()) == (1, 2, 3, 3)
+
+
+def test_failed_computation_is_not_cached():
+    cache = ResultCache(ttl=60, maxsize=8)
+
+    async def boom():
+        raise RuntimeError("db down")
+
+    async def scenario():
+        outcomes = await asyncio.gather(cache.get_or_compute("k", boom), cache.get_or_compute("k", boom),
+                                        return_exceptions=True)
+        return outcomes, len(cache)
+
+    outcomes, size = asyncio.run(scenario())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert size == 0
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+from bot.cards import RenderCache, customer_contacts, customer_name, render_cache, render_order
+from data.models import Order
+
+
+def _order(**fields):
+    base = dict(_id="64b000000000000000000001", user_id=1, items={"мясо": 2, "тыква": 1}, total=30000,
+                delivery="🚚 Доставка", time="12:30", method="💳 Карта",
+                created_at=datetime(2026, 3, 1, 7, 0), updated_at=datetime(2026, 3, 1, 7, 5))
+    base.update(fields)
+    return Order(**base)
+
+
+def test_contact_formats_resolve_the_same_way():
+    latest = _order(customer_name="Азиз", customer_phone="+998901", customer_address="Навои, 1")
+    split = _order(name="Азиз", phone="+998901", address="Навои, 1")
+    legacy = _order(contact="Азиз, +998901, Навои")
+    assert {customer_name(o) for o in (latest, split, legacy)} == {"Азиз"}
+    assert customer_contacts(split) == ("+998901", "Навои, 1")
+    assert customer_contacts(legacy) == ("+998901", "Навои")
+    assert customer_name(_order()) is None and customer_contacts(_order()) == (None, None)
+
+
+def test_summary_and_detail_views():
+    order = _order(customer_name="Азиз", customer_phone="+998901", requires_payment_check=True,
+                   payment_amount=30000, summary="<b>Комментарий:</b> без лука")
+    summary = render_order(order)
+    assert summary.splitlines() == [
+        "⚠️ ТРЕБУЕТ ПРОВЕРКИ ОПЛАТЫ",
+        "🆔 64b000000000000000000001",
+        "👤 Азиз",
+        "💰 30,000 сум",
+        "💳 💳 Оплата картой ⏳",
+        "⚠️ Клиент указал: 30,000 сум",
+        "📦 2 позиций",
+        "📅 01.03.2026 12:00",
+    ]
+    detail = render_order(order, "detail")
+    assert detail.startswith("👤 Азиз\n🆔 64b000000000000000000001\n💰 30,000 сум\n💳 ⏳ Требует проверки оплаты")
+    assert "📞 +998901" in detail and "📍" not in detail
+    assert "🚚 Доставка\n⏰ 12:30\n💳 Карта" in detail
+    assert detail.endswith("• мясо: 2 шт\n• тыква: 1 шт\n\n📄 Комментарий: без лука")
+    assert "👤 Имя не указано" in render_order(_order(_id=None, method="Наличные"), "detail")
+
+
+def test_render_cache_is_keyed_by_updated_at_and_bounded():
+    render_cache.clear()
+    order = _order(customer_name="Азиз", method="Наличные")
+    first = render_order(order)
+    before = render_cache.stats()
+    assert render_order(order.model_copy()) is first
+    assert render_cache.stats()["hits"] == before["hits"] + 1
+
+    changed = order.model_copy(update={"customer_name": "Рустам", "updated_at": order.updated_at + timedelta(seconds=1)})
+    assert "👤 Рустам" in render_order(changed)
+
+    # A confirmed card payment bumps updated_at like any other write
+    card = _order(requires_payment_check=True, payment_amount=30000, updated_at=datetime(2026, 3, 1, 8, 0))
+    assert "⏳" in render_order(card) and "⏳" in render_order(card, "detail")
+    verified = card.model_copy(update={"payment_verified": True, "updated_at": card.updated_at + timedelta(seconds=1)})
+    assert "Оплата картой ✅" in render_order(verified)
+    assert "Оплата подтверждена" in render_order(verified, "detail")
+
+    cache = RenderCache(maxsize=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_render(key, lambda: key.upper())
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 2}
+    assert cache.get_or_render("b", lambda: "again") == "again"
+
+
+def test_order_writes_bump_updated_at(fake_db):
+    import asyncio
+
+    from data.models import OrderStatus
+    from data.operations import (
+        bulk_update_order_status,
+        mark_order_sheet_synced,
+        mark_orders_sheet_synced,
+        update_order_message_id,
+        update_order_message_ids,
+        update_order_status,
+    )
+
+    stale = datetime(2026, 3, 1, 7, 5)
+    writes = [
+        lambda order_id: update_order_status(order_id, OrderStatus.ACCEPTED),
+        lambda order_id: bulk_update_order_status([order_id], OrderStatus.READY),
+        lambda order_id: update_order_message_id(order_id, 7),
+        lambda order_id: update_order_message_ids({order_id: 8}),
+        lambda order_id: mark_order_sheet_synced(order_id),
+        lambda order_id: mark_orders_sheet_synced([order_id]),
+    ]
+
+    async def scenario():
+        doc = _order().model_dump(exclude={"id"})
+        order_id = str((await fake_db.orders.insert_one(doc)).inserted_id)
+        bumped = []
+        for write in writes:
+            await fake_db.orders.update_one({}, {"$set": {"updated_at": stale, "sheet_synced": False}})
+            await write(order_id)
+            bumped.append(fake_db.orders.docs[0]["updated_at"] > stale)
+        return bumped
+
+    assert asyncio.run(scenario()) == [True] * len(writes)
@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+from data.query_log import _shape
+from scripts.check_indexes import FULL_SCANS, hot_queries
+
+
+def _filter_shape(flt):
+    return json.dumps(_shape(flt), ensure_ascii=False, separators=(",", ":"))
+
+
+def test_hot_queries_build_without_a_database():
+    names = [name for name, _, _, _ in hot_queries()]
+    assert len(names) == len(set(names))
+    assert {"count_orders", "iter_orders_between (export)", "demand_matrix (rollup)",
+            "bulk_update_order_status (ids)"} <= set(names)
+
+
+@pytest.mark.run_last
+def test_every_query_the_suite_issued_is_index_checked(suite_queries):
+    # Runs after the rest of the suite: every filter data.operations sent to the
+    # fake database must be explained by check_indexes.py or be a known full scan
+    checked = {(collection, _filter_shape(flt)) for _, collection, flt, _ in hot_queries()}
+    checked |= {(collection, _filter_shape({})) for _, collection in FULL_SCANS}
+    issued = {(collection, shape) for module, collection, shape in suite_queries if module == "data.operations"}
+    assert sorted(issued - checked) == []
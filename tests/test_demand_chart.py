@@ -0,0 +1,112 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+from aiogram import Bot
+from aiogram.types import Chat, Message, Update, User
+
+import bot.orders as orders
+from data.operations import demand_matrix, invalidate_analytics, rebuild_daily_stats
+from scripts.bench_data import make_order_doc
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+from utils.helpers import to_local_date
+
+
+def _seed(fake_db, count, days=6, seed=11):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for _ in range(count):
+        created_at = now - timedelta(hours=rng.random() * 24 * days)
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, created_at)))
+
+
+def _expected(fake_db, days):
+    expected = {}
+    for doc in fake_db.orders.docs:
+        day = to_local_date(doc["created_at"])
+        if day not in days or doc["status"] in ("cancelled", "payment_failed"):
+            continue
+        for key, qty in doc["items"].items():
+            expected[(key, day)] = expected.get((key, day), 0) + qty
+    return expected
+
+
+def test_demand_matrix_matches_orders_and_rollup(fake_db):
+    _seed(fake_db, 300)
+    matrix = asyncio.run(demand_matrix("week"))
+    assert len(matrix.days) == 7 and matrix.days[-1] == to_local_date(datetime.utcnow())
+    actual = {(key, day): int(matrix.quantities[i, j])
+              for i, key in enumerate(matrix.items) for j, day in enumerate(matrix.days) if matrix.quantities[i, j]}
+    assert actual == _expected(fake_db, matrix.days)
+    assert list(matrix.totals) == sorted(matrix.totals, reverse=True)
+
+    asyncio.run(rebuild_daily_stats())
+    rollup = asyncio.run(demand_matrix("week"))
+    assert rollup.items == matrix.items and np.array_equal(rollup.quantities, matrix.quantities)
+    assert rollup.version == matrix.version
+
+
+def _message(update_id, text):
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.utcnow(), chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="Admin"), text=text))
+
+
+def test_chart_is_rendered_once_per_version_and_reuses_file_id(fake_db, dispatcher, monkeypatch):
+    _seed(fake_db, 100, days=2)
+    renders = []
+    real_render = orders.render_demand_chart
+
+    def counting_render(matrix):
+        renders.append(matrix.version)
+        return real_render(matrix)
+
+    monkeypatch.setattr(orders, "render_demand_chart", counting_render)
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        try:
+            await dispatcher.feed_update(bot, _message(1, "/demand_chart week"))
+            await dispatcher.feed_update(bot, _message(2, "/demand_chart week"))
+            # A new order changes the data version: the chart is drawn and uploaded again
+            await fake_db.orders.insert_one(make_order_doc(random.Random(1), datetime.utcnow()) | {"status": "new"})
+            invalidate_analytics(datetime.utcnow())
+            await dispatcher.feed_update(bot, _message(3, "/demand_chart week"))
+            await fake_db.orders.delete_many({})
+            invalidate_analytics()
+            await dispatcher.feed_update(bot, _message(4, "/demand_chart week"))
+        finally:
+            await bot.session.close()
+            await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+    photos = [call["payload"]["photo"] for call in server.calls_to("sendPhoto")]
+    assert photos[0].startswith("attach://")  # uploaded
+    assert photos[1].startswith("photo-")     # same chart sent by file_id
+    assert photos[2].startswith("attach://")  # new data version, uploaded again
+    assert len(renders) == 2 and renders[0] != renders[1]
+    assert "заказов нет" in server.calls_to("sendMessage")[-1]["payload"]["text"]
+
+
+def test_unknown_period_gets_usage_and_caption_names_the_period(fake_db, dispatcher):
+    from bot.handlers import DEMAND_CHART_USAGE
+
+    _seed(fake_db, 20, days=2)
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        try:
+            await dispatcher.feed_update(bot, _message(1, "/demand_chart decade"))
+            await dispatcher.feed_update(bot, _message(2, "/demand_chart Неделя"))
+        finally:
+            await bot.session.close()
+            await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+    assert [c["payload"]["text"] for c in server.calls_to("sendMessage")] == [DEMAND_CHART_USAGE]
+    assert server.calls_to("sendPhoto")[0]["payload"]["caption"].startswith("📊 Спрос (week): ")
@@ -0,0 +1,111 @@
+import asyncio
+import csv
+import gzip
+import io
+import random
+from datetime import date, datetime, timedelta
+
+from aiogram import Bot
+from aiogram.types import Chat, Message, Update, User
+
+import utils.export as export
+from scripts.bench_data import make_order_doc
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+from utils.export import EXPORT_COLUMNS, export_orders, flatten_contact
+from utils.helpers import local_day_start_utc, parse_local_date, to_local_date
+
+
+def test_contact_formats_are_flattened():
+    assert flatten_contact({"contact": "Азиз, +998901112233, Ташкент, ул. Навои, 5"}) == (
+        "Азиз", "+998901112233", "Ташкент, ул. Навои, 5")
+    assert flatten_contact({"name": "Мадина", "phone": "+99890"}) == ("Мадина", "+99890", "")
+    assert flatten_contact({"customer_name": "Тимур", "name": "old", "customer_address": "Бабура 1"}) == (
+        "Тимур", "", "Бабура 1")
+    assert flatten_contact({}) == ("", "", "")
+    assert parse_local_date("31.01.2025") == parse_local_date("2025-01-31") == date(2025, 1, 31)
+
+
+def test_export_streams_a_day_range_in_chunks(fake_db, monkeypatch, tmp_path):
+    rng = random.Random(4)
+    now = datetime.utcnow()
+    for i in range(120):
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, now - timedelta(hours=i * 2))))
+    first = parse_local_date(to_local_date(now - timedelta(days=4)))
+    last = parse_local_date(to_local_date(now - timedelta(days=2)))
+    start, end = local_day_start_utc(first), local_day_start_utc(last + timedelta(days=1))
+    expected = sorted((d for d in fake_db.orders.docs if start <= d["created_at"] < end), key=lambda d: d["created_at"])
+
+    chunks = []
+    real_writer = export.CsvGzWriter
+
+    class RecordingWriter(real_writer):
+        def write(self, rows):
+            chunks.append(len(rows))
+            super().write(rows)
+
+    monkeypatch.setitem(export.WRITERS, "csv", RecordingWriter)
+    path = tmp_path / "orders.csv.gz"
+    count = asyncio.run(export_orders(str(path), start, end, "csv", chunk_rows=10))
+
+    with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert count == len(rows) == len(expected) == 36
+    assert chunks == [10, 10, 10, 6]
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    assert [r["order_id"] for r in rows] == [str(d["_id"]) for d in expected]
+    assert all(r["customer_name"] and r["customer_phone"].startswith("+998") for r in rows)
+    assert {r["local_date"] for r in rows} == {str(first + timedelta(days=i)) for i in range(3)}
+
+
+def test_export_command_sends_a_document(fake_db, dispatcher):
+    rng = random.Random(5)
+    for _ in range(5):
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, datetime.utcnow())))
+    today = to_local_date(datetime.utcnow())
+
+    def message(update_id, text):
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.utcnow(), chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="Admin"), text=text))
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        try:
+            await dispatcher.feed_update(bot, message(1, f"/export {today} {today}"))
+            await dispatcher.feed_update(bot, message(2, "/export yesterday"))
+        finally:
+            await bot.session.close()
+            await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+    documents = server.calls_to("sendDocument")
+    assert len(documents) == 1
+    assert documents[0]["payload"]["caption"].startswith("📤 Заказов: 5")
+    assert server.calls_to("sendMessage")[-1]["payload"]["text"].startswith("Использование: /export")
+
+
+def test_csv_neutralizes_formulas_and_reads_quantities_like_analytics(tmp_path):
+    from utils.export import CsvGzWriter, flatten_order
+
+    row = flatten_order({
+        "customer_name": "=HYPERLINK(\"http://x\",\"y\")", "customer_phone": "+998 90 111-22-33",
+        "customer_address": "@SUM(A1)", "delivery": "-2+3", "time": "+cmd|' /C calc'!A0",
+        "items": {"мясо": "+3", "тыква": " 2 ", "зелень": "abc", "лук": None},
+        "total": -5000, "status": "new",
+    })
+    assert row["items"] == "мясо: 3; тыква: 2; лук: 0" and row["items_quantity"] == 5
+
+    path = tmp_path / "orders.csv.gz"
+    writer = CsvGzWriter(str(path))
+    writer.write([row])
+    writer.close()
+    with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+        written = next(csv.DictReader(f))
+    assert written["customer_name"] == "'=HYPERLINK(\"http://x\",\"y\")"
+    assert written["customer_address"] == "'@SUM(A1)"
+    assert written["delivery"] == "'-2+3"
+    assert written["time"].startswith("'+cmd")
+    # Phone numbers and numbers stay as they are
+    assert written["customer_phone"] == "+998 90 111-22-33" and written["total"] == "-5000"
@@ -1,6 +1,27 @@
 import pytest
 from utils.helpers import is_admin
 
-def test_is_admin():
+def test_is_admin(monkeypatch):
+    # The admin list of env.example, whatever ADMIN_IDS the environment has
+    monkeypatch.setattr("utils.helpers.ADMIN_IDS", [123456789, 987654321])
     assert is_admin(123456789) is True
-    assert is_admin(111111111) is False 
\ No newline at end of file
+    assert is_admin(111111111) is False 
+
+def test_parse_period_returns_local_day_bounds():
+    from datetime import date, datetime
+
+    from utils.helpers import parse_period
+
+    today = date(2025, 3, 10)
+    week = parse_period("неделя", today)
+    assert (week.first_day, week.last_day, week.days) == (date(2025, 3, 4), today, 7)
+    # Tashkent midnight is 19:00 UTC the day before; the end is exclusive
+    assert (week.start, week.end) == (datetime(2025, 3, 3, 19), datetime(2025, 3, 10, 19))
+    assert parse_period("yesterday", today).local_dates == ["2025-03-09"]
+    assert parse_period("month", today).days == 30
+    custom = parse_period("28.02.2025..2025-03-02", today)
+    assert custom.local_dates == ["2025-02-28", "2025-03-01", "2025-03-02"]
+    assert parse_period("2025-03-01", today).days == 1
+    for bad in ("decade", "2025-03-02..2025-03-01", ""):
+        with pytest.raises(ValueError):
+            parse_period(bad, today)
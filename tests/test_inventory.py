@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import bot.main as main
+from data.operations import AVAILABILITY_DOC_ID, get_catalog
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+
+ADMIN = 1
+
+
+def _user():
+    return User(id=ADMIN, is_bot=False, first_name="Admin")
+
+
+def _inventory_command(update_id):
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.utcnow(), chat=Chat(id=ADMIN, type="private"),
+        from_user=_user(), text="/inventory"))
+
+
+def _toggle(update_id, key, to):
+    message = Message(message_id=1, date=datetime.utcnow(), chat=Chat(id=ADMIN, type="private"), text="📦")
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=_user(), chat_instance="1", message=message, data=f"avail:{key}:{to}"))
+
+
+def test_toggles_do_one_write_and_no_reads_and_follow_external_changes(fake_db, dispatcher):
+    async def scenario():
+        for key in ("мясо", "картошка", "тыква"):
+            await fake_db.inventory.insert_one({"key": key, "price": 10000})
+        await fake_db.availability.insert_one({"_id": AVAILABILITY_DOC_ID, "мясо": True, "картошка": False})
+
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        monitor = asyncio.create_task(main.catalog_monitor())
+        try:
+            await asyncio.sleep(0.05)
+            await dispatcher.feed_update(bot, _inventory_command(1))
+            ops_before = dict(fake_db.ops)
+            for i, (key, to) in enumerate([("мясо", 0), ("картошка", 1), ("тыква", 0), ("мясо", 1), ("нет", 1)]):
+                await dispatcher.feed_update(bot, _toggle(10 + i, key, to))
+            toggle_ops = {k: v - ops_before.get(k, 0) for k, v in fake_db.ops.items() if v != ops_before.get(k, 0)}
+
+            # The client bot switches an item off: applied in place, no reload
+            await fake_db.availability.update_one({"_id": AVAILABILITY_DOC_ID}, {"$set": {"тыква": True}})
+            await asyncio.sleep(0.05)
+            external = dict((await get_catalog()).availability)
+            reads_after_external = fake_db.ops.get("availability.find", 0)
+
+            # A new inventory item drops the snapshot
+            await fake_db.inventory.insert_one({"key": "зелень", "price": 3000})
+            await asyncio.sleep(0.05)
+            keys = (await get_catalog()).keys
+        finally:
+            monitor.cancel()
+            await bot.session.close()
+            await server.stop()
+        return server, toggle_ops, external, reads_after_external, keys, fake_db.ops
+
+    server, toggle_ops, external, reads_after_external, keys, ops = asyncio.run(scenario())
+    assert toggle_ops == {"availability.update": 4}
+    edits = server.calls_to("editMessageText")
+    assert len(edits) == 4 and "✔️ мясо" in edits[-1]["payload"]["text"]
+    assert server.calls_to("answerCallbackQuery")[-1]["payload"]["text"] == "Нет такого товара"
+    assert external == {"мясо": True, "картошка": True, "тыква": True}
+    assert reads_after_external == 1
+    assert keys == ["зелень", "картошка", "мясо", "тыква"]
+    assert ops["availability.find"] == 2
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+
+import bot.main as main
+from bot.handlers import router
+from scripts.load_test import LoadTest
+
+
+def test_load_test_runs_offline_end_to_end(fake_db, monkeypatch):
+    # LoadTest wires the real router, monitor and admin list; restore them afterwards
+    monkeypatch.setattr(router, "_parent_router", None)
+    for name in ("ADMIN_IDS", "ORDER_MONITOR_MODE", "ORDER_POLL_INTERVAL"):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    args = argparse.Namespace(
+        orders=20, rate=200, admins=2, statuses="accepted,completed", think_ms=0, monitor="stream",
+        poll_interval=1.0, telegram_latency=0, timeout=30, seed=1,
+        global_rate=1000, chat_rate=1000, chat_burst=1000,
+    )
+
+    report = asyncio.run(LoadTest(args).run())
+
+    assert not report["timed_out"] and report["completed_orders"] == 20
+    assert report["insert_to_first_alert"]["count"] == 20
+    assert report["insert_to_all_alerts"]["count"] == 20
+    assert report["status_change_to_client"]["count"] == 40
+    assert report["mongo_ops"]["orders.insert"] == 1
+    # The notification claim plus the two status changes
+    assert report["mongo_ops"]["orders.findAndModify"] == 3
@@ -0,0 +1,142 @@
+import asyncio
+import random
+from datetime import datetime
+
+import aiohttp
+from aiogram import Bot
+from aiogram.types import Chat, Message, Update, User
+from aiohttp import web
+
+from scripts.bench_data import make_order_doc
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+from utils.metrics import (
+    HandlerMetricsMiddleware,
+    TelegramMetricsMiddleware,
+    create_metrics_app,
+    handler_errors,
+    handler_latency,
+    instrument_operations,
+    operation_errors,
+    operation_latency,
+    registry,
+    telegram_latency,
+)
+
+
+def _message(update_id, text):
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.utcnow(), chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="Admin"), text=text))
+
+
+def test_handlers_operations_and_telegram_calls_are_measured(fake_db, dispatcher):
+    registry.reset()
+    rng = random.Random(7)
+    for _ in range(3):
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, datetime.utcnow()) | {"status": "new"}))
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        bot.session.middleware(TelegramMetricsMiddleware("admin"))
+        dispatcher.message.middleware(HandlerMetricsMiddleware())
+        runner = web.AppRunner(create_metrics_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        try:
+            for i, text in enumerate(["/start", "/new_orders", "/new_orders", "/metrics"]):
+                await dispatcher.feed_update(bot, _message(i, text))
+            async with aiohttp.ClientSession() as http:
+                async with http.get(f"http://{host}:{port}/metrics") as resp:
+                    exported = await resp.text()
+        finally:
+            await runner.cleanup()
+            await bot.session.close()
+            await server.stop()
+        return server, exported
+
+    server, exported = asyncio.run(scenario())
+    assert handler_latency.count(handler="cmd_new_orders") == 2
+    assert handler_latency.count(handler="cmd_start") == 1
+    assert operation_latency.count(operation="get_orders_page") == 2
+    assert telegram_latency.count(bot="admin", method="sendMessage") == 4
+
+    report = server.calls_to("sendMessage")[-1]["payload"]["text"]
+    assert "cmd_new_orders: 2 ×" in report and "get_orders_page: 2 ×" in report
+    assert "admin/sendMessage: 3 ×" in report
+
+    assert "# TYPE samsariya_handler_seconds histogram" in exported
+    assert 'samsariya_handler_seconds_bucket{handler="cmd_new_orders",le="+Inf"} 2' in exported
+    assert 'samsariya_operation_seconds_count{operation="get_orders_page"} 2' in exported
+    assert 'samsariya_telegram_request_seconds_count{bot="admin",method="sendMessage"} 4' in exported
+
+
+def test_errors_are_counted_per_operation_and_handler():
+    registry.reset()
+
+    async def broken_read():
+        raise ValueError("boom")
+
+    async def _private():
+        return 1
+
+    namespace = {"__name__": __name__, "broken_read": broken_read, "_private": _private}
+    instrument_operations(namespace)
+    assert namespace["_private"] is _private
+
+    async def scenario():
+        try:
+            await namespace["broken_read"]()
+        except ValueError:
+            pass
+
+        async def explode(event, data):
+            raise RuntimeError("handler failed")
+        middleware = HandlerMetricsMiddleware()
+        try:
+            await middleware(explode, _message(1, "/x"), {})
+        except RuntimeError:
+            pass
+
+    asyncio.run(scenario())
+    assert operation_errors.get(operation="broken_read", error="ValueError") == 1
+    assert operation_latency.count(operation="broken_read") == 1
+    assert handler_errors.get(handler="unknown", error="RuntimeError") == 1
+
+
+def test_async_generators_are_timed_without_the_consumer():
+    registry.reset()
+
+    async def iter_rows():
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def iter_broken():
+        yield 1
+        raise ValueError("cursor died")
+
+    namespace = {"__name__": __name__, "iter_rows": iter_rows, "iter_broken": iter_broken}
+    instrument_operations(namespace)
+
+    async def scenario():
+        rows = []
+        async for row in namespace["iter_rows"]():
+            rows.append(row)
+            await asyncio.sleep(0.05)  # consumer work is not the operation's
+        # Abandoning the iteration still records it
+        async for _ in namespace["iter_rows"]():
+            break
+        try:
+            async for _ in namespace["iter_broken"]():
+                pass
+        except ValueError:
+            pass
+        return rows
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert operation_latency.count(operation="iter_rows") == 2
+    assert 0.03 <= operation_latency.series[(("operation", "iter_rows"),)][2] < 0.1
+    assert operation_errors.get(operation="iter_broken", error="ValueError") == 1
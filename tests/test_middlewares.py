@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import bot.middlewares as middlewares
+from bot.middlewares import ACCESS_DENIED_ALERT, ACCESS_DENIED_TEXT, AdminAccessMiddleware, AdminSet
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+
+ADMIN, STRANGER, DB_ADMIN, CLICKER = 1, 666, 2, 777
+GROUP = -100500
+
+
+def _message(update_id, user_id, text, chat_id=None):
+    user = User(id=user_id, is_bot=False, first_name="Test")
+    chat = Chat(id=chat_id, type="supergroup") if chat_id else Chat(id=user_id, type="private")
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.utcnow(), chat=chat, from_user=user, text=text))
+
+
+def _callback(update_id, user_id, data):
+    user = User(id=user_id, is_bot=False, first_name="Test")
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=user, chat_instance="1", data=data))
+
+
+def test_non_admins_are_rejected_without_database_calls(fake_db, dispatcher, monkeypatch):
+    monkeypatch.setattr(middlewares, "ADMIN_IDS", [ADMIN])
+    monkeypatch.setattr("data.operations.ADMIN_IDS", [ADMIN])
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        admins = AdminSet(refresh_interval=60)
+        dispatcher.update.outer_middleware(AdminAccessMiddleware(admins))
+        refresher = asyncio.create_task(admins.run())
+        try:
+            await asyncio.sleep(0.05)
+            ops_before = dict(fake_db.ops)
+            for i in range(20):
+                await dispatcher.feed_update(bot, _message(i, STRANGER, "/new_orders"))
+            await dispatcher.feed_update(bot, _message(50, STRANGER + 1, "привет"))
+            await dispatcher.feed_update(bot, _message(51, STRANGER + 2, "/start", chat_id=GROUP))
+            for i in range(3):
+                await dispatcher.feed_update(bot, _callback(100 + i, CLICKER, "order:open:" + "0" * 24))
+            stranger_ops = {k: v - ops_before.get(k, 0) for k, v in fake_db.ops.items() if v != ops_before.get(k, 0)}
+
+            await dispatcher.feed_update(bot, _message(200, ADMIN, "/start"))
+            # A new admin stored in MongoDB is picked up through the change stream
+            await fake_db.admins.insert_one({"user_id": DB_ADMIN, "name": "Второй"})
+            await asyncio.sleep(0.05)
+            await dispatcher.feed_update(bot, _message(201, DB_ADMIN, "/start"))
+        finally:
+            refresher.cancel()
+            await bot.session.close()
+            await server.stop()
+        return server, stranger_ops
+
+    server, stranger_ops = asyncio.run(scenario())
+    assert stranger_ops == {}
+    texts = [c["payload"]["text"] for c in server.calls_to("sendMessage")]
+    # One denial per user and interval; plain text and group messages get none
+    assert texts[:1] == [ACCESS_DENIED_TEXT]
+    alerts = server.calls_to("answerCallbackQuery")
+    assert [c["payload"]["text"] for c in alerts] == [ACCESS_DENIED_ALERT]
+    assert all(text.startswith("👋 Привет") for text in texts[1:]) and len(texts) == 3
+
+
+def test_denials_are_rate_limited_per_user(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(middlewares.time, "monotonic", lambda: clock[0])
+    middleware = AdminAccessMiddleware(AdminSet(), denial_interval=60)
+    assert middleware._should_deny(STRANGER) and middleware._should_deny(STRANGER + 1)
+    assert not middleware._should_deny(STRANGER)
+    clock[0] += 61
+    assert middleware._should_deny(STRANGER)
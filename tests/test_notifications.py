@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from data.models import ClientNotification, OrderStatus
+from utils.notifications import NotificationDispatcher
+from utils.sender import OutboundSender
+
+BLOCKED_USER = 13
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+        self.event = asyncio.Event()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.001)
+        if chat_id == BLOCKED_USER:
+            raise TelegramForbiddenError(method=SendMessage(chat_id=chat_id, text=text),
+                                         message="bot was blocked by the user")
+        self.sent.append((chat_id, text))
+        self.event.set()
+
+
+def _dispatcher(bot, worker_id, **kwargs):
+    sender = OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=100)
+    return NotificationDispatcher(sender, worker_id=worker_id, **kwargs)
+
+
+def _notification(user_id):
+    return ClientNotification(user_id=user_id, order_id="0" * 24, status=OrderStatus.READY,
+                              message=f"Заказ готов {user_id}").dict(exclude={"id"})
+
+
+def test_concurrent_workers_deliver_each_notification_once(fake_db):
+    async def scenario():
+        await fake_db.notifications.insert_many([_notification(user_id) for user_id in range(60)])
+        bot = RecordingBot()
+        workers = [_dispatcher(bot, f"w{i}", batch_size=10) for i in range(3)]
+        claimed = await asyncio.gather(*(w.drain() for w in workers))
+        # Nothing is left to claim right away: the failure waits for its retry delay
+        again = await workers[0].drain()
+        return bot, claimed, again
+
+    bot, claimed, again = asyncio.run(scenario())
+    delivered = [chat_id for chat_id, _ in bot.sent]
+    assert sorted(delivered) == [u for u in range(60) if u != BLOCKED_USER]
+    assert sum(claimed) == 60 and again == 0
+    # One bulk_write per batch to record the outcome
+    assert fake_db.ops["notifications.bulkWrite"] == 6
+    docs = {d["user_id"]: d for d in fake_db.notifications.docs}
+    assert all(docs[u]["sent"] and docs[u]["attempts"] == 1 for u in range(60) if u != BLOCKED_USER)
+    blocked = docs[BLOCKED_USER]
+    assert not blocked["sent"] and "blocked" in blocked["last_error"] and blocked["lease_until"] > datetime.utcnow()
+
+
+def test_daemon_wakes_on_insert(fake_db):
+    async def scenario():
+        bot = RecordingBot()
+        task = asyncio.create_task(_dispatcher(bot, "daemon", poll_interval=30).run())
+        await asyncio.sleep(0.05)
+        loop = asyncio.get_running_loop()
+        inserted_at = loop.time()
+        await fake_db.notifications.insert_one(_notification(7))
+        await asyncio.wait_for(bot.event.wait(), 2)
+        latency = loop.time() - inserted_at
+        task.cancel()
+        return bot, latency
+
+    bot, latency = asyncio.run(scenario())
+    assert [chat_id for chat_id, _ in bot.sent] == [7]
+    assert latency < 1
+
+
+def test_slow_batch_keeps_its_lease_and_a_stale_worker_cannot_finish(fake_db, monkeypatch):
+    from datetime import timedelta
+
+    import data.operations as operations
+    from data.operations import claim_notifications, finish_notifications
+
+    monkeypatch.setattr(operations, "NOTIFICATION_LEASE", timedelta(seconds=0.2))
+
+    class SlowBot(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            await asyncio.sleep(0.5)
+            await super().send_message(chat_id, text, **kwargs)
+
+    async def scenario():
+        await fake_db.notifications.insert_many([_notification(user_id) for user_id in range(3)])
+        bot = SlowBot()
+        slow = asyncio.create_task(_dispatcher(bot, "slow", lease_renew_interval=0.05).dispatch_batch())
+        await asyncio.sleep(0.3)
+        # Past the original lease, but it has been renewed
+        stolen = await claim_notifications("other")
+        await slow
+
+        # A worker whose lease really expired and was taken over records nothing
+        await fake_db.notifications.insert_one(_notification(99))
+        stale = await claim_notifications("stale")
+        await asyncio.sleep(0.25)
+        current = await claim_notifications("current")
+        changed = await finish_notifications(stale[0].lease_id, [], {stale[0].id: "timeout"}, {stale[0].id: 9})
+        return bot, stolen, current, changed
+
+    bot, stolen, current, changed = asyncio.run(scenario())
+    assert stolen == [] and len(bot.sent) == 3
+    assert [n.user_id for n in current] == [99] and changed == 0
+    late = next(d for d in fake_db.notifications.docs if d["user_id"] == 99)
+    assert late["lease_id"] == current[0].lease_id and not late.get("failed") and late.get("last_error") is None
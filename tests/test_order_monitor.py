@@ -0,0 +1,320 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import bot.main as main
+from utils.sender import OutboundSender
+
+
+class RecordingBot:
+    """Collects send_message calls with the loop time they happened at."""
+
+    def __init__(self):
+        self.sent = []
+        self.event = asyncio.Event()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((asyncio.get_running_loop().time(), chat_id, text))
+        self.event.set()
+
+
+def _sender(bot):
+    # Generous limits: these tests measure detection latency, not throttling
+    return OutboundSender(bot, global_rate=1000, chat_rate=1000, chat_burst=100)
+
+
+def _order_doc(**extra):
+    doc = {
+        "user_id": 42,
+        "items": {"картошка": 2},
+        "total": 16000,
+        "customer_name": "Test",
+        "delivery": "Самовывоз",
+        "time": "12:00",
+        "method": "Наличные",
+        "status": "new",
+        "created_at": datetime.utcnow(),
+    }
+    doc.update(extra)
+    return doc
+
+
+async def _wait_sent(bot, timeout=2.0):
+    await asyncio.wait_for(bot.event.wait(), timeout)
+    bot.event.clear()
+
+
+def _setup(monkeypatch, mode="stream", interval=10.0):
+    monkeypatch.setattr(main, "ADMIN_IDS", [1])
+    monkeypatch.setattr(main, "ORDER_MONITOR_MODE", mode)
+    monkeypatch.setattr(main, "ORDER_POLL_INTERVAL", interval)
+
+
+def test_change_stream_notifies_well_below_poll_interval(fake_db, monkeypatch):
+    from utils.metrics import monitor_event_lag, monitor_tick_latency, registry
+
+    _setup(monkeypatch)
+    registry.reset()
+
+    async def scenario():
+        bot = RecordingBot()
+        task = asyncio.create_task(main.order_monitor(_sender(bot)))
+        await asyncio.sleep(0.05)
+        latencies = []
+        for _ in range(5):
+            started = asyncio.get_running_loop().time()
+            await fake_db.orders.insert_one(_order_doc())
+            await _wait_sent(bot)
+            latencies.append(bot.sent[-1][0] - started)
+        # An order switched to NEW after being inserted is picked up too
+        result = await fake_db.orders.insert_one(_order_doc(status="pending_admin_confirmation"))
+        await fake_db.orders.update_one({"_id": result.inserted_id}, {"$set": {"status": "new"}})
+        await _wait_sent(bot)
+        task.cancel()
+        return latencies
+
+    latencies = asyncio.run(scenario())
+    # Polling would average ORDER_POLL_INTERVAL / 2 = 5 s
+    assert max(latencies) < 0.5
+    token = asyncio.run(fake_db.config.find_one({"key": f"resume_token:{main.ORDER_STREAM}"}))
+    assert token["value"] is not None
+    # The stream path is measured like the polling one: one tick per event
+    assert monitor_tick_latency.count(path="stream") == 6 and monitor_event_lag.count() == 6
+
+
+def test_stream_resumes_from_stored_token(fake_db, monkeypatch):
+    _setup(monkeypatch)
+
+    async def scenario():
+        bot = RecordingBot()
+        task = asyncio.create_task(main.order_monitor(_sender(bot)))
+        await asyncio.sleep(0.05)
+        await fake_db.orders.insert_one(_order_doc())
+        await _wait_sent(bot)
+        task.cancel()
+        await asyncio.sleep(0)
+
+        # Orders arriving while the bot is down are replayed on restart
+        await fake_db.orders.insert_one(_order_doc(customer_name="While offline"))
+        bot = RecordingBot()
+        task = asyncio.create_task(main.order_monitor(_sender(bot)))
+        await _wait_sent(bot)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    assert len(sent) == 1
+    assert "While offline" in sent[0][2]
+
+
+def test_falls_back_to_polling_without_change_streams(fake_db, monkeypatch):
+    _setup(monkeypatch, interval=0.05)
+    fake_db.supports_change_streams = False
+
+    async def scenario():
+        bot = RecordingBot()
+        task = asyncio.create_task(main.order_monitor(_sender(bot)))
+        await asyncio.sleep(0.05)
+        await fake_db.orders.insert_one(_order_doc())
+        await _wait_sent(bot)
+        task.cancel()
+        return bot.sent
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+def test_restart_does_not_renotify(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+
+    async def scenario():
+        bot = RecordingBot()
+        sender = _sender(bot)
+        for _ in range(3):
+            await fake_db.orders.insert_one(_order_doc())
+        await main.check_new_orders(sender)
+        # A restarted process has no in-memory state; the ledger still holds
+        await main.check_new_orders(sender)
+        await fake_db.orders.insert_one(_order_doc(customer_name="Later"))
+        await main.check_new_orders(sender)
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    assert len(sent) == 4
+    assert "Later" in sent[-1][2]
+    assert all(d["admin_notified"] and "admin_notify_until" not in d for d in fake_db.orders.docs)
+
+
+def test_orders_turning_new_late_are_announced(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+
+    async def scenario():
+        bot = RecordingBot()
+        sender = _sender(bot)
+        await fake_db.orders.insert_one(_order_doc(customer_name="Fresh"))
+        await main.check_new_orders(sender)
+        # Created half an hour ago, confirmed (pending -> new) only now
+        result = await fake_db.orders.insert_one(_order_doc(
+            status="pending_admin_confirmation", customer_name="Confirmed late",
+            created_at=datetime.utcnow() - timedelta(minutes=30)))
+        await main.check_new_orders(sender)
+        await fake_db.orders.update_one({"_id": result.inserted_id}, {"$set": {"status": "new"}})
+        await main.check_new_orders(sender)
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    assert len(sent) == 2 and "Confirmed late" in sent[-1][2]
+
+
+def test_alert_nobody_received_is_retried(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+
+    class FailingBot(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+
+    async def scenario():
+        await fake_db.orders.insert_one(_order_doc())
+        await main.check_new_orders(_sender(FailingBot()))
+        doc = fake_db.orders.docs[0]
+        assert not doc.get("admin_notified") and doc["admin_notify_until"] > datetime.utcnow()
+        # Not retried before the retry time...
+        bot = RecordingBot()
+        await main.check_new_orders(_sender(bot))
+        assert bot.sent == []
+        # ...but once it (or a dead notifier's lease) has passed
+        doc["admin_notify_until"] = datetime.utcnow() - timedelta(seconds=1)
+        await main.check_new_orders(_sender(bot))
+        return bot.sent
+
+    assert len(asyncio.run(scenario())) == 1
+    assert fake_db.orders.docs[0]["admin_notified"] is True
+
+
+def test_retry_only_alerts_admins_who_missed_it(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+    monkeypatch.setattr(main, "ADMIN_IDS", [1, 2, 3])
+
+    class BlockedByTwo(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            if chat_id == 2:
+                raise RuntimeError("Forbidden: bot was blocked by the user")
+            await super().send_message(chat_id, text, **kwargs)
+
+    async def scenario():
+        await fake_db.orders.insert_one(_order_doc())
+        first = BlockedByTwo()
+        await main.check_new_orders(_sender(first))
+        doc = fake_db.orders.docs[0]
+        # Two of three admins got it: not notified yet, but they are recorded
+        assert not doc.get("admin_notified") and sorted(doc["admin_notified_to"]) == [1, 3]
+        assert "admin_notify_lease" not in doc
+        doc["admin_notify_until"] = datetime.utcnow() - timedelta(seconds=1)
+        second = RecordingBot()
+        await main.check_new_orders(_sender(second))
+        return first.sent, second.sent
+
+    first, second = asyncio.run(scenario())
+    assert sorted(chat_id for _, chat_id, _ in first) == [1, 3]
+    assert [chat_id for _, chat_id, _ in second] == [2]
+    assert fake_db.orders.docs[0]["admin_notified"] is True
+
+
+def test_gives_up_after_max_attempts(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+    monkeypatch.setattr(main, "ADMIN_IDS", [1, 2])
+
+    class BlockedByTwo(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            if chat_id == 2:
+                raise RuntimeError("Forbidden: bot was blocked by the user")
+            await super().send_message(chat_id, text, **kwargs)
+
+    async def scenario():
+        bot = BlockedByTwo()
+        await fake_db.orders.insert_one(_order_doc())
+        for _ in range(main.ORDER_NOTIFY_MAX_ATTEMPTS):
+            fake_db.orders.docs[0]["admin_notify_until"] = None
+            await main.check_new_orders(_sender(bot))
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    # Admin 1 got it once; admin 2 never can, and the order stops being retried
+    assert [chat_id for _, chat_id, _ in sent] == [1]
+    doc = fake_db.orders.docs[0]
+    assert doc["admin_notified"] is True and doc["admin_notify_attempts"] == main.ORDER_NOTIFY_MAX_ATTEMPTS
+
+
+def test_expired_lease_holder_cannot_finish(fake_db, monkeypatch):
+    from data.operations import claim_order_notification, finish_order_notification, record_admin_alerted
+
+    _setup(monkeypatch, mode="poll")
+
+    async def scenario():
+        result = await fake_db.orders.insert_one(_order_doc())
+        order_id = str(result.inserted_id)
+        stale = await claim_order_notification(order_id, "stale")
+        # Held leases can't be claimed twice
+        assert await claim_order_notification(order_id, "other") is None
+        # The stale notifier stalls past its lease and another one takes over
+        fake_db.orders.docs[0]["admin_notify_until"] = datetime.utcnow() - timedelta(seconds=1)
+        fresh = await claim_order_notification(order_id, "fresh")
+        assert fresh is not None and fresh.attempts == 2
+        assert not await record_admin_alerted(stale, 1)
+        assert not await finish_order_notification(stale, complete=False)
+        doc = fake_db.orders.docs[0]
+        # The stale holder neither released nor rescheduled the fresh lease
+        assert doc["admin_notify_lease"] == fresh.lease_id and "admin_notified_to" not in doc
+        assert await finish_order_notification(fresh, complete=True)
+
+    asyncio.run(scenario())
+    assert fake_db.orders.docs[0]["admin_notified"] is True
+
+
+def test_lease_is_renewed_during_a_slow_send(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+    monkeypatch.setattr(main, "ORDER_NOTIFY_RENEW_INTERVAL", 0.01)
+
+    class SlowBot(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            until = fake_db.orders.docs[0]["admin_notify_until"]
+            await asyncio.sleep(0.05)
+            self.renewed = fake_db.orders.docs[0]["admin_notify_until"] > until
+            await super().send_message(chat_id, text, **kwargs)
+
+    async def scenario():
+        bot = SlowBot()
+        await fake_db.orders.insert_one(_order_doc())
+        await main.check_new_orders(_sender(bot))
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert bot.renewed and len(bot.sent) == 1
+
+
+def test_burst_of_orders_is_announced_concurrently(fake_db, monkeypatch):
+    _setup(monkeypatch, mode="poll")
+    admins = list(range(1, 11))
+    monkeypatch.setattr(main, "ADMIN_IDS", admins)
+
+    class SlowBot(RecordingBot):
+        async def send_message(self, chat_id, text, **kwargs):
+            await asyncio.sleep(0.05)
+            await super().send_message(chat_id, text, **kwargs)
+
+    async def scenario():
+        bot = SlowBot()
+        for i in range(20):
+            await fake_db.orders.insert_one(_order_doc(customer_name=f"Клиент {i}"))
+        # Concurrency well above one order's fan-out, per-chat limits out of the way
+        sender = OutboundSender(bot, concurrency=100, global_rate=1000, chat_rate=1000, chat_burst=100)
+        started = asyncio.get_running_loop().time()
+        await main.check_new_orders(sender)
+        return bot.sent, asyncio.get_running_loop().time() - started
+
+    sent, elapsed = asyncio.run(scenario())
+    assert len(sent) == 200
+    assert {chat_id for _, chat_id, _ in sent} == set(admins)
+    assert all(sum(1 for _, c, _ in sent if c == admin) == 20 for admin in admins)
+    # One order after the other would take 20 x 50 ms
+    assert elapsed < 0.5
+    assert all(d["admin_notified"] for d in fake_db.orders.docs)
@@ -0,0 +1,124 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+from data.operations import (
+    ORDER_PROJECTIONS,
+    get_active_orders,
+    get_new_orders,
+    get_orders_by_period,
+    iter_active_orders,
+    iter_orders_by_period,
+)
+from scripts.bench_data import make_order_doc
+
+
+def test_card_projection_skips_heavy_fields_but_renders(fake_db):
+    from bot.cards import render_order
+
+    rng = random.Random(3)
+    for _ in range(5):
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, datetime.utcnow()) | {"status": "new"}))
+
+    full = asyncio.run(get_new_orders())
+    cards = asyncio.run(get_active_orders(projection="card"))
+    assert [o.id for o in cards] == [o.id for o in full]
+    assert all(o.summary is None and o.customer_phone is None and o.phone is None for o in cards)
+    assert [render_order(o) for o in cards] == [render_order(o) for o in full]
+    assert set(ORDER_PROJECTIONS["card"]) < set(ORDER_PROJECTIONS["notify"])
+    with pytest.raises(ValueError):
+        asyncio.run(get_new_orders(projection="tiny"))
+
+
+def test_iterators_stream_in_batches_and_back_the_lists(fake_db):
+    rng = random.Random(4)
+    for _ in range(25):
+        asyncio.run(fake_db.orders.insert_one(make_order_doc(rng, datetime.utcnow()) | {"status": "accepted"}))
+
+    async def first_of(iterator):
+        async for order in iterator:
+            return order
+
+    async def collect(iterator):
+        return [order async for order in iterator]
+
+    streamed = asyncio.run(collect(iter_active_orders(projection="card", batch_size=10)))
+    assert [o.id for o in streamed] == [o.id for o in asyncio.run(get_active_orders(projection="card"))]
+    assert fake_db.ops["orders.getMore"] == 2  # 25 orders in batches of 10
+
+    fake_db.ops.clear()
+    first = asyncio.run(first_of(iter_active_orders(batch_size=10)))
+    assert first.id == streamed[0].id and "orders.getMore" not in fake_db.ops
+
+    limited = asyncio.run(collect(iter_orders_by_period("week", limit=7)))
+    assert [o.id for o in limited] == [o.id for o in asyncio.run(get_orders_by_period("week"))][:7]
+    assert asyncio.run(collect(iter_orders_by_period("decade"))) == []
+
+
+def test_order_list_pages_by_keyset_in_one_message(fake_db, dispatcher, monkeypatch):
+    import json
+    from datetime import timedelta
+
+    from aiogram import Bot
+    from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+    import bot.handlers as handlers
+    from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+
+    monkeypatch.setattr(handlers, "ORDERS_PAGE_SIZE", 10)
+    rng = random.Random(5)
+    now = datetime.utcnow().replace(microsecond=0)
+    statuses = ["new", "accepted", "in_progress", "ready", "completed"]
+    for i in range(30):
+        # Pairs share created_at so the _id tie-break is exercised
+        doc = make_order_doc(rng, now - timedelta(minutes=i // 2)) | {"status": statuses[i % 5]}
+        asyncio.run(fake_db.orders.insert_one(doc))
+    expected = [str(d["_id"]) for d in sorted(
+        (d for d in fake_db.orders.docs if d["status"] != "completed"),
+        key=lambda d: (d["created_at"], d["_id"]), reverse=True)]
+
+    user = User(id=1, is_bot=False, first_name="Admin")
+    chat = Chat(id=1, type="private")
+
+    def buttons(call):
+        markup = call["payload"]["reply_markup"]
+        rows = (json.loads(markup) if isinstance(markup, str) else markup)["inline_keyboard"]
+        return [b["callback_data"] for row in rows for b in row]
+
+    async def scenario():
+        server = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(server.url))
+        try:
+            await dispatcher.feed_update(bot, Update(update_id=1, message=Message(
+                message_id=1, date=now, chat=chat, from_user=user, text="/all_orders")))
+            seen, pages = [], []
+            call = server.calls[-1]
+            for step in range(10):
+                data = buttons(call)
+                pages.append(call["payload"]["text"])
+                seen += [d.split(":")[2] for d in data if d.startswith("ol:o:")]
+                older = [d for d in data if d.startswith("ol:a:n:")]
+                if not older:
+                    break
+                await dispatcher.feed_update(bot, Update(update_id=10 + step, callback_query=CallbackQuery(
+                    id=str(step), from_user=user, chat_instance="1", data=older[0],
+                    message=Message(message_id=2, date=now, chat=chat, text="list"))))
+                call = server.calls_to("editMessageText")[-1]
+            newer = [d for d in buttons(call) if d.startswith("ol:a:p:")][0]
+            await dispatcher.feed_update(bot, Update(update_id=99, callback_query=CallbackQuery(
+                id="99", from_user=user, chat_instance="1", data=newer,
+                message=Message(message_id=2, date=now, chat=chat, text="list"))))
+            back = server.calls_to("editMessageText")[-1]
+        finally:
+            await bot.session.close()
+            await server.stop()
+        return server, seen, pages, back
+
+    server, seen, pages, back = asyncio.run(scenario())
+    assert seen == expected
+    assert len(server.calls_to("sendMessage")) == 1 and len(server.calls_to("editMessageText")) == 3
+    assert pages[0].startswith("📋 Все активные заказы: 24") and "Показаны 21–24" in pages[-1]
+    assert back["payload"]["text"] == pages[1]
+    assert all(len(d.encode()) <= 64 for call in server.calls if "reply_markup" in call["payload"] for d in buttons(call))
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.monitoring import CommandFailedEvent, CommandStartedEvent, CommandSucceededEvent
+
+from data.query_log import QueryLog, query_shape
+
+CONNECTION = ("localhost", 27017)
+
+
+def _run(log, request_id, command, ms, reply=None, failed=False):
+    name = next(iter(command))
+    log.started(CommandStartedEvent(command, "samsariya", request_id, CONNECTION, request_id))
+    if failed:
+        log.failed(CommandFailedEvent(timedelta(milliseconds=ms), {"ok": 0, "errmsg": "boom"}, name,
+                                      request_id, CONNECTION, request_id, database_name="samsariya"))
+    else:
+        log.succeeded(CommandSucceededEvent(timedelta(milliseconds=ms), reply or {"ok": 1}, name,
+                                            request_id, CONNECTION, request_id, database_name="samsariya"))
+
+
+def test_query_shape_drops_values():
+    command = {
+        "find": "orders",
+        "filter": {"status": {"$in": ["new", "accepted"]}, "customer_phone": "+998901234567",
+                   "$or": [{"created_at": {"$lt": datetime(2026, 1, 1)}}, {"_id": ObjectId()}]},
+        "sort": {"created_at": -1, "_id": -1},
+    }
+    shape = query_shape("find", command)
+    assert "+998" not in shape and "new" not in shape and "2026" not in shape
+    assert json.loads(shape) == {
+        "filter": {"status": {"$in": "?"}, "customer_phone": "?",
+                   "$or": [{"created_at": {"$lt": "?"}}, {"_id": "?"}]},
+        "sort": {"created_at": -1, "_id": -1},
+    }
+    updates = {"update": "orders", "updates": [{"q": {"_id": ObjectId()}, "u": {"$set": {"status": "x"}}}] * 3}
+    assert json.loads(query_shape("update", updates)) == {"filter": {"_id": "?"}}
+
+
+def test_slow_commands_are_logged_and_ranked(capsys):
+    log = QueryLog(slow_ms=50)
+    cursor_id = 123456789
+    for i in range(3):
+        _run(log, i, {"find": "orders", "filter": {"status": f"new{i}"}}, 5 + i)
+    _run(log, 10, {"find": "orders", "filter": {"status": "new"}, "sort": {"created_at": 1}}, 80,
+         reply={"ok": 1, "cursor": {"id": cursor_id, "ns": "samsariya.orders", "firstBatch": []}})
+    _run(log, 11, {"getMore": cursor_id, "collection": "orders"}, 120,
+         reply={"ok": 1, "cursor": {"id": 0, "ns": "samsariya.orders", "nextBatch": []}})
+    _run(log, 12, {"aggregate": "orders", "pipeline": [{"$match": {"created_at": {"$gte": 1}}}, {"$group": {}}]},
+         60, failed=True)
+    _run(log, 13, {"ping": 1}, 500)
+
+    slow_lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(entry["command"], entry["ok"]) for entry in slow_lines] == [
+        ("find", True), ("getMore", True), ("aggregate", False)]
+    assert all(entry["event"] == "slow_query" for entry in slow_lines)
+
+    top = log.top(3)
+    assert [row["command"] for row in top] == ["getMore", "find", "aggregate"]
+    # getMore batches carry the shape of the find that opened the cursor
+    assert top[0]["shape"] == top[1]["shape"] == '{"filter":{"status":"?"},"sort":{"created_at":1}}'
+    assert top[2]["failed"] == 1 and top[2]["slow"] == 1
+    fast = log.top(10)[-1]
+    assert fast["count"] == 3 and fast["slow"] == 0 and fast["max_ms"] == 7
+    assert all(row["command"] != "ping" for row in log.top(10))
+
+
+def test_cursor_shapes_are_forgotten(monkeypatch):
+    import data.query_log as query_log_module
+
+    log = QueryLog(slow_ms=1000)
+
+    def open_cursor(request_id, cursor_id):
+        _run(log, request_id, {"find": "orders", "filter": {"status": "new"}}, 1,
+             reply={"ok": 1, "cursor": {"id": cursor_id, "ns": "samsariya.orders", "firstBatch": []}})
+
+    open_cursor(1, 101)
+    open_cursor(2, 102)
+    _run(log, 3, {"killCursors": "orders", "cursors": [101]}, 1)
+    assert list(log._cursors) == [102]
+
+    monkeypatch.setattr(query_log_module, "MAX_CURSORS", 3)
+    for i in range(5):
+        open_cursor(10 + i, 200 + i)
+    assert list(log._cursors) == [202, 203, 204]
+
+    # Cursors nobody closed expire once unused for CURSOR_TTL
+    monkeypatch.setattr(query_log_module, "CURSOR_TTL", 1e-9)
+    open_cursor(20, 300)
+    assert list(log._cursors) == [300]
@@ -0,0 +1,79 @@
+import asyncio
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from utils.sender import OutboundSender, TokenBucket
+
+
+class FlakyBot:
+    """Fake bot: chat 2 is slow, chat 3 blocked the bot, chat 4 hits a flood wait once."""
+
+    def __init__(self):
+        self.delivered = {}
+        self.flood_hits = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id == 2:
+            await asyncio.sleep(0.3)
+        if chat_id == 3:
+            raise TelegramForbiddenError(method=method, message="bot was blocked by the user")
+        if chat_id == 4 and not self.flood_hits:
+            self.flood_hits += 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+        self.delivered[chat_id] = asyncio.get_running_loop().time()
+        return chat_id
+
+
+def test_send_many_reports_each_recipient_and_retries_after_flood_wait():
+    async def scenario():
+        bot = FlakyBot()
+        sender = OutboundSender(bot, global_rate=100, chat_rate=10, chat_burst=1)
+        started = asyncio.get_running_loop().time()
+        results = await sender.send_many([1, 2, 3, 4], "hi")
+        return bot, started, {r.chat_id: r for r in results}
+
+    bot, started, results = asyncio.run(scenario())
+    assert results[1].ok and results[2].ok
+    assert not results[3].ok and "blocked" in results[3].error
+    assert results[4].ok and results[4].attempts == 2
+    # The slow chat doesn't hold up the others
+    assert bot.delivered[1] - started < 0.1
+    assert bot.delivered[4] - started < 0.2
+
+
+def test_token_bucket_limits_rate_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=5)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(15):
+            await bucket.acquire()
+        return loop.time() - started
+
+    # 5 burst tokens are free, the remaining 10 take ~10 / 50 s
+    elapsed = asyncio.run(scenario())
+    assert 0.15 < elapsed < 0.5
+
+
+def test_burst_of_orders_reaches_all_admins_within_seconds():
+    class CountingBot:
+        sent = 0
+
+        async def send_message(self, chat_id, text, **kwargs):
+            await asyncio.sleep(0.01)
+            CountingBot.sent += 1
+
+    async def scenario():
+        sender = OutboundSender(CountingBot(), global_rate=1000, chat_rate=100, chat_burst=3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(20):
+            await sender.send_many(range(10), "order")
+        return loop.time() - started
+
+    elapsed = asyncio.run(scenario())
+    assert CountingBot.sent == 200
+    # Sequentially this would be 200 * 10 ms = 2 s
+    assert elapsed < 1.0
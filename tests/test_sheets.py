@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+
+from aiohttp import web
+
+from data.models import Order
+from utils.sheets import SheetsSync
+
+
+def _order(i):
+    return Order(
+        user_id=i,
+        items={"картошка": 1, "пакет": 1},
+        total=8000,
+        delivery="Самовывоз",
+        time="12:00",
+        method="💵 Наличные",
+        created_at=datetime(2026, 1, 1, 12, i),
+    )
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_post("/exec", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}/exec"
+
+
+async def _insert(fake_db, order, **extra):
+    order.id = str((await fake_db.orders.insert_one({**order.dict(exclude={"id"}), **extra})).inserted_id)
+    return order
+
+
+def test_rows_are_batched_retried_and_marked_in_one_bulk_write(fake_db):
+    async def scenario():
+        posts = []
+
+        async def webhook(request):
+            posts.append((await request.json())["rows"])
+            # First post fails, forcing a retry of the same batch
+            return web.Response(status=500 if len(posts) == 1 else 200)
+
+        runner, url = await _serve(webhook)
+
+        orders = []
+        for i in range(7):
+            order = _order(i)
+            order.id = str((await fake_db.orders.insert_one(order.dict(exclude={"id"}))).inserted_id)
+            orders.append(order)
+
+        sync = SheetsSync(url=url, batch_size=3, flush_interval=0.05, backoff=0.01)
+        sync.start()
+        for order in orders:
+            assert sync.enqueue(order)
+        assert not sync.enqueue(orders[0])  # already queued
+        await asyncio.sleep(0.3)
+        await sync.stop()
+        await runner.cleanup()
+        return posts
+
+    posts = asyncio.run(scenario())
+    # One failed + three successful batched posts for 7 rows
+    assert [len(rows) for rows in posts] == [3, 3, 3, 1]
+    assert posts[0] == posts[1]
+    assert posts[1][0]["samsa_details"] == "картошка: 1 шт"
+    assert posts[1][0]["packaging_details"] == "пакет: 1 шт"
+    assert all(doc["sheet_synced"] for doc in fake_db.orders.docs)
+    assert fake_db.ops["orders.bulkWrite"] == 3
+
+
+def test_error_body_is_a_failure_and_single_row_mode_posts_rows(fake_db):
+    async def scenario():
+        posts = []
+
+        async def webhook(request):
+            posts.append(await request.json())
+            # Apps Script answers 200 even when doPost fails
+            if len(posts) == 1:
+                return web.json_response({"ok": False, "error": "Sheet not found"})
+            return web.json_response({"ok": True})
+
+        runner, url = await _serve(webhook)
+        orders = [await _insert(fake_db, _order(i)) for i in range(2)]
+        sync = SheetsSync(url=url, batch_size=10, flush_interval=0.05, backoff=0.01, payload="row",
+                          backfill_interval=0)
+        sync.start()
+        for order in orders:
+            sync.enqueue(order)
+        await asyncio.sleep(0.2)
+        await sync.stop()
+        await runner.cleanup()
+        return posts
+
+    posts = asyncio.run(scenario())
+    assert all("rows" not in body for body in posts)
+    assert [body["customer_address"] for body in posts] == [""] * 3
+    assert posts[0] == posts[1] != posts[2]
+    assert all(doc["sheet_synced"] for doc in fake_db.orders.docs)
+
+
+def test_unsynced_orders_are_backfilled_and_flushed_on_stop(fake_db):
+    from datetime import timedelta
+
+    async def scenario():
+        posts = []
+
+        async def webhook(request):
+            posts.append((await request.json())["rows"])
+            return web.json_response({"ok": True})
+
+        runner, url = await _serve(webhook)
+        now = datetime.utcnow()
+        lost = await _insert(fake_db, _order(1), admin_notified=True, created_at=now)
+        await _insert(fake_db, _order(2), admin_notified=True, sheet_synced=True, created_at=now)
+        await _insert(fake_db, _order(3), admin_notified=False, created_at=now)
+        await _insert(fake_db, _order(4), admin_notified=True, created_at=now - timedelta(days=30))
+        queued = await _insert(fake_db, _order(5))
+        # A long flush interval: only stop() gets these rows out
+        sync = SheetsSync(url=url, batch_size=10, flush_interval=60, backfill_interval=60)
+        sync.start()
+        sync.enqueue(queued)
+        await asyncio.sleep(0.05)
+        await sync.stop()
+        await runner.cleanup()
+        return posts, lost, queued
+
+    posts, lost, queued = asyncio.run(scenario())
+    assert sorted(row["order_id"] for rows in posts for row in rows) == sorted([lost.id, queued.id])
+    synced = {str(doc["_id"]) for doc in fake_db.orders.docs if doc.get("sheet_synced")}
+    assert {lost.id, queued.id} <= synced and len(synced) == 3
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import aiohttp
+from aiogram import Bot
+from aiohttp import web
+
+import bot.main as main
+from utils.testing.fake_telegram import ADMIN_BOT_TOKEN, FakeTelegramAPI, fake_telegram_session
+
+SECRET = "test-secret"
+UPDATES = 200
+
+
+def _update(update_id, text="/start"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Admin"},
+            "text": text,
+        },
+    }
+
+
+def test_webhook_feeds_the_dispatcher_and_checks_the_secret(fake_db, dispatcher):
+    async def scenario():
+        telegram = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(telegram.url))
+        runner = web.AppRunner(main.create_webhook_app(dispatcher, bot, SECRET, path="/hook"))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        url = f"http://{host}:{port}/hook"
+        try:
+            async with aiohttp.ClientSession() as http:
+                async with http.post(url, json=_update(0)) as resp:
+                    no_secret = resp.status
+                async with http.post(url, json=_update(0), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+                    wrong_secret = resp.status
+
+                headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+                started = time.perf_counter()
+
+                async def post(i):
+                    async with http.post(url, json=_update(i + 1), headers=headers) as resp:
+                        return resp.status
+
+                statuses = await asyncio.gather(*(post(i) for i in range(UPDATES)))
+                while len(telegram.calls_to("sendMessage")) < UPDATES:
+                    await asyncio.sleep(0.01)
+                elapsed = time.perf_counter() - started
+        finally:
+            await runner.cleanup()
+            await telegram.stop()
+        return no_secret, wrong_secret, statuses, telegram, elapsed
+
+    no_secret, wrong_secret, statuses, telegram, elapsed = asyncio.run(asyncio.wait_for(scenario(), 30))
+    assert no_secret == wrong_secret == 401
+    assert statuses == [200] * UPDATES
+    replies = telegram.calls_to("sendMessage")
+    assert len(replies) == UPDATES and all(c["payload"]["text"].startswith("👋 Привет") for c in replies)
+    # Concurrent updates are each answered exactly once, in any order
+    assert sorted(int(c["payload"]["chat_id"]) for c in replies) == [1] * UPDATES
+    print(f"webhook: {UPDATES} updates handled in {elapsed:.2f}s ({UPDATES / elapsed:.0f} updates/s)")
+
+
+def test_webhook_mode_stops_on_sigterm(fake_db, dispatcher, monkeypatch):
+    import os
+    import signal
+
+    monkeypatch.setattr(main, "WEBHOOK_URL", "https://example.com")
+    monkeypatch.setattr(main, "WEBAPP_HOST", "127.0.0.1")
+    monkeypatch.setattr(main, "WEBAPP_PORT", 0)
+
+    async def scenario():
+        telegram = await FakeTelegramAPI().start()
+        bot = Bot(token=ADMIN_BOT_TOKEN, session=fake_telegram_session(telegram.url))
+        stop = asyncio.Event()
+        main.install_signal_handlers(stop)
+        try:
+            serving = asyncio.create_task(main.run_webhook(dispatcher, bot, stop))
+            while not telegram.calls_to("setWebhook"):
+                await asyncio.sleep(0.01)
+            os.kill(os.getpid(), signal.SIGTERM)
+            return await asyncio.wait_for(serving, 5)
+        finally:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+            await bot.session.close()
+            await telegram.stop()
+
+    assert asyncio.run(scenario()) is True
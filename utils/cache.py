@@ -0,0 +1,98 @@
+"""In-process result cache for expensive reads (analytics).
+
+`ResultCache` keeps up to `maxsize` results for `ttl` seconds, evicting the
+least recently used entry first. Concurrent callers asking for the same
+missing key share one computation. Invalidation during a computation wins:
+the stale result is returned to its callers but not stored.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class ResultCache:
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the live cached value for `key` or None, without counting a hit.
+
+        Lets writers update a cached value in place instead of invalidating it.
+        """
+        return self._lookup(key)[1]
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, computing it once if missing or expired."""
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure isn't logged as "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if generation == self._generation:
+                self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] = None) -> int:
+        """Drop entries whose key matches `predicate` (all when None); returns how many.
+
+        Computations already running are not stored when they finish.
+        """
+        self._generation += 1
+        keys = [key for key in self._entries if predicate is None or predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
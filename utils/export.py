@@ -0,0 +1,176 @@
+"""Streaming order export (CSV.gz or Parquet) used by /export and scripts/export_orders.py.
+
+Orders are read from one batched cursor (iter_orders_between) and written in
+chunks of EXPORT_CHUNK_ROWS, so memory stays flat whatever the range. Chunks
+are compressed and written in a worker thread to keep the event loop free.
+
+Every row has the same flat schema (EXPORT_COLUMNS): the three contact
+formats (legacy `contact`, `name`/`phone`/`address`, `customer_*`) are
+folded into customer_name / customer_phone / customer_address.
+"""
+import asyncio
+import csv
+import gzip
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.operations import _safe_int, iter_orders_between
+from utils.helpers import to_local_date, to_uzbekistan_time
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_COLUMNS = (
+    "order_id", "created_at", "local_date", "status", "user_id",
+    "customer_name", "customer_phone", "customer_address",
+    "total", "payment_method", "payment_verified", "payment_amount",
+    "delivery", "time", "items", "items_quantity",
+)
+# Only what the columns need; the HTML summary and bookkeeping fields stay on the server
+EXPORT_PROJECTION = {
+    "user_id": 1, "status": 1, "created_at": 1, "total": 1, "items": 1,
+    "contact": 1, "name": 1, "phone": 1, "address": 1,
+    "customer_name": 1, "customer_phone": 1, "customer_address": 1,
+    "method": 1, "payment_verified": 1, "payment_amount": 1, "delivery": 1, "time": 1,
+}
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+# Spreadsheets run cells starting with these as formulas (CSV injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Phone numbers and plain numbers: no letters or symbols a formula could use
+PLAIN_NUMBER = re.compile(r"[+-]?[0-9][0-9 ()-]*")
+
+
+def _csv_safe(value: Any) -> Any:
+    """A text cell prefixed with ' when a spreadsheet would run it as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PLAIN_NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_contact(doc: Dict[str, Any]) -> Tuple[str, str, str]:
+    """(name, phone, address) from whichever contact format the order uses"""
+    if doc.get("customer_name") or doc.get("customer_phone") or doc.get("customer_address"):
+        return _text(doc.get("customer_name")), _text(doc.get("customer_phone")), _text(doc.get("customer_address"))
+    if doc.get("name") or doc.get("phone") or doc.get("address"):
+        return _text(doc.get("name")), _text(doc.get("phone")), _text(doc.get("address"))
+    parts = [part.strip() for part in _text(doc.get("contact")).split(",", 2)]
+    parts += [""] * (3 - len(parts))
+    return parts[0], parts[1], parts[2]
+
+
+def flatten_order(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """One export row (EXPORT_COLUMNS) from a raw order document"""
+    name, phone, address = flatten_contact(doc)
+    items = doc.get("items") if isinstance(doc.get("items"), dict) else {}
+    # Read like analytics_summary does: unconvertible quantities are left out
+    quantities = {key: qty for key, qty in ((key, _safe_int(qty)) for key, qty in items.items()) if qty is not None}
+    created_at = doc.get("created_at")
+    if isinstance(created_at, datetime):
+        local_created = to_uzbekistan_time(created_at).isoformat(timespec="seconds")
+        local_date = to_local_date(created_at)
+    else:
+        local_created, local_date = "", ""
+    status = doc.get("status")
+    return {
+        "order_id": str(doc.get("_id", "")),
+        "created_at": local_created,
+        "local_date": local_date,
+        "status": _text(getattr(status, "value", status)),
+        "user_id": _int(doc.get("user_id")),
+        "customer_name": name,
+        "customer_phone": phone,
+        "customer_address": address,
+        "total": _int(doc.get("total")),
+        "payment_method": _text(doc.get("method")).replace("💳", "").replace("💵", "").strip(),
+        "payment_verified": doc.get("payment_verified") if isinstance(doc.get("payment_verified"), bool) else None,
+        "payment_amount": _int(doc.get("payment_amount")),
+        "delivery": _text(doc.get("delivery")).replace("🚚", "").strip(),
+        "time": _text(doc.get("time")),
+        "items": "; ".join(f"{key}: {qty}" for key, qty in quantities.items()),
+        "items_quantity": sum(quantities.values()),
+    }
+
+
+class CsvGzWriter:
+    """gzip-compressed UTF-8 CSV (with BOM, so Excel picks the encoding); formula-like text is neutralized"""
+
+    suffix = ".csv.gz"
+
+    def __init__(self, path: str):
+        self._file = gzip.open(path, "wt", encoding="utf-8-sig", newline="")
+        self._csv = csv.DictWriter(self._file, fieldnames=EXPORT_COLUMNS)
+        self._csv.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._csv.writerows({column: _csv_safe(value) for column, value in row.items()} for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """Parquet file written one row group per chunk (needs the optional pyarrow)"""
+
+    suffix = ".parquet"
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        types = {"user_id": pa.int64(), "total": pa.int64(), "payment_amount": pa.int64(),
+                 "items_quantity": pa.int64(), "payment_verified": pa.bool_()}
+        self._pa = pa
+        self._schema = pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._writer.write_batch(self._pa.RecordBatch.from_pylist(rows, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+WRITERS = {"csv": CsvGzWriter, "parquet": ParquetWriter}
+
+
+def export_filename(start_day, end_day, fmt: str) -> str:
+    return f"orders_{start_day:%Y-%m-%d}_{end_day:%Y-%m-%d}{WRITERS[fmt].suffix}"
+
+
+async def export_orders(path: str, start: datetime, end: datetime, fmt: str = "csv",
+                        chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Write orders created in [start, end) to `path`; returns the number of rows.
+
+    RuntimeError if the format's library is missing (Parquet without pyarrow).
+    """
+    writer = await asyncio.to_thread(WRITERS[fmt], path)
+    count = 0
+    chunk: List[Dict[str, Any]] = []
+    try:
+        async for doc in iter_orders_between(start, end, EXPORT_PROJECTION, batch_size=chunk_rows):
+            chunk.append(flatten_order(doc))
+            if len(chunk) >= chunk_rows:
+                await asyncio.to_thread(writer.write, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            await asyncio.to_thread(writer.write, chunk)
+            count += len(chunk)
+    finally:
+        await asyncio.to_thread(writer.close)
+    return count
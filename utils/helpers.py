@@ -1,6 +1,8 @@
 """Helper utilities for Samsariya Admin Bot."""
 from data.config import ADMIN_IDS
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
 # Uzbekistan timezone offset (UTC+5)
 UZB_TIMEZONE_OFFSET = timedelta(hours=5)
@@ -32,13 +34,105 @@ def format_uzbekistan_datetime(utc_dt: datetime) -> str:
     local_dt = to_uzbekistan_time(utc_dt)
     return local_dt.strftime('%d.%m.%Y %H:%M')
 
+def to_local_date(utc_dt: datetime) -> str:
+    """Return the Uzbekistan calendar day of a UTC datetime as YYYY-MM-DD."""
+    return to_uzbekistan_time(utc_dt).strftime('%Y-%m-%d')
+
+def local_midnight_utc(days_ago: int = 0) -> datetime:
+    """Return the UTC instant of Uzbekistan local midnight `days_ago` days before today."""
+    local_now = to_uzbekistan_time(datetime.utcnow())
+    local_midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    return local_midnight - UZB_TIMEZONE_OFFSET
+
+def parse_local_date(text: str) -> date:
+    """Parse a calendar day given as YYYY-MM-DD or DD.MM.YYYY (ValueError if neither)."""
+    text = (text or "").strip()
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {text!r}")
+
+def local_day_start_utc(day: date) -> datetime:
+    """Return the UTC instant of Uzbekistan local midnight at the start of `day`."""
+    return datetime(day.year, day.month, day.day) - UZB_TIMEZONE_OFFSET
+
 def is_admin(user_id):
     """Check if the user_id is in the admin list."""
     return user_id in ADMIN_IDS
 
-def parse_period(period_str):
-    """Parse period string (today, week, month) and return date range."""
-    pass
+# Named report periods: number of whole local days ending today (or, for
+# yesterday, ending the day before)
+PERIOD_ALIASES = {
+    "today": "today", "day": "today", "сегодня": "today",
+    "yesterday": "yesterday", "вчера": "yesterday",
+    "week": "week", "неделя": "week",
+    "month": "month", "месяц": "month",
+}
+PERIOD_DAYS = {"today": 1, "yesterday": 1, "week": 7, "month": 30}
+# Separators accepted between the two days of a custom range
+PERIOD_RANGE_SEPARATORS = ("..", "—", "–", ":")
+
+@dataclass(frozen=True)
+class Period:
+    """Whole Uzbekistan-local days first_day..last_day (inclusive).
+
+    `start`/`end` are the UTC bounds of the same days as a half-open
+    [start, end) interval, so every report of the period covers exactly the
+    same orders until the day changes.
+    """
+    name: str
+    first_day: date
+    last_day: date
+
+    @property
+    def start(self) -> datetime:
+        return local_day_start_utc(self.first_day)
+
+    @property
+    def end(self) -> datetime:
+        return local_day_start_utc(self.last_day + timedelta(days=1))
+
+    @property
+    def days(self) -> int:
+        return (self.last_day - self.first_day).days + 1
+
+    @property
+    def local_dates(self) -> List[str]:
+        """YYYY-MM-DD of every day in the period (the `local_date` of its orders)"""
+        return [(self.first_day + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(self.days)]
+
+def local_today() -> date:
+    """Return today's date in Uzbekistan."""
+    return to_uzbekistan_time(datetime.utcnow()).date()
+
+def parse_period(period_str: str, today: Optional[date] = None) -> Period:
+    """Parse a report period into whole local days.
+
+    Accepts today, yesterday, week (today and the 6 days before), month (today
+    and the 29 days before), their Russian names, a single date or a custom
+    range "FROM..TO" (dates as in parse_local_date). Raises ValueError for
+    anything else.
+    """
+    text = (period_str or "").strip().lower()
+    today = today or local_today()
+    name = PERIOD_ALIASES.get(text)
+    if name == "yesterday":
+        day = today - timedelta(days=1)
+        return Period(name, day, day)
+    if name:
+        return Period(name, today - timedelta(days=PERIOD_DAYS[name] - 1), today)
+    for separator in PERIOD_RANGE_SEPARATORS:
+        if separator in text:
+            first, _, last = text.partition(separator)
+            break
+    else:
+        first = last = text
+    first_day, last_day = parse_local_date(first), parse_local_date(last)
+    if last_day < first_day:
+        raise ValueError(f"Period ends before it starts: {period_str!r}")
+    return Period(text, first_day, last_day)
 
 def send_broadcast(text, admin_ids):
     """Send a broadcast message to all admins."""
@@ -0,0 +1,317 @@
+"""In-process metrics for the admin bot, exported in the Prometheus text format.
+
+- handler latency and errors (HandlerMetricsMiddleware on the dispatcher)
+- latency and errors of every public data.operations coroutine and async
+  generator (instrument_operations)
+- outbound Telegram API calls (TelegramMetricsMiddleware on a bot session)
+- order monitor tick duration, backlog and change-event lag (bot.main)
+
+Everything lives in the module-level `registry`; `render_prometheus()` is
+served by `start_metrics_server()` and summarized by the /metrics command.
+"""
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+# Seconds; covers a cached read (~0.1 ms) up to a slow Atlas round trip
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(values: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in values.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[_labels(labels)] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram; one series per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), count, sum]
+        self.series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += 1
+        series[2] += value
+
+    def count(self, **labels) -> int:
+        series = self.series.get(_labels(labels))
+        return series[1] if series else 0
+
+    def quantile(self, q: float, labels: Labels) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        counts, total, _ = self.series[labels]
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            if count and seen + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total, value_sum) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels, (('le', _format_value(float(bound))),))} {cumulative}"
+            yield f"{self.name}_count{_format_labels(labels)} {total}"
+            yield f"{self.name}_sum{_format_labels(labels)} {value_sum:g}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        self.metrics.setdefault(metric.name, metric)
+        return self.metrics[metric.name]
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def reset(self) -> None:
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                metric.series.clear()
+            else:
+                metric.values.clear()
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_latency = registry.histogram("samsariya_handler_seconds", "Time spent in aiogram handlers")
+handler_errors = registry.counter("samsariya_handler_errors_total", "Exceptions raised by aiogram handlers")
+operation_latency = registry.histogram("samsariya_operation_seconds", "Time spent in data.operations calls")
+operation_errors = registry.counter("samsariya_operation_errors_total", "Exceptions raised by data.operations calls")
+telegram_latency = registry.histogram("samsariya_telegram_request_seconds", "Outbound Telegram Bot API requests")
+telegram_errors = registry.counter("samsariya_telegram_request_errors_total", "Failed Telegram Bot API requests")
+monitor_tick_latency = registry.histogram("samsariya_order_monitor_tick_seconds", "Duration of one order monitor catch-up")
+monitor_event_lag = registry.histogram("samsariya_order_monitor_event_lag_seconds",
+                                      "Time from an order becoming NEW to its change event being handled")
+monitor_backlog = registry.gauge("samsariya_order_monitor_backlog", "New orders found by the last order monitor catch-up")
+
+
+def render_prometheus() -> str:
+    return registry.render()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: latency and errors per handler function"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, handler=name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: latency and failures per Bot API method"""
+
+    def __init__(self, bot_name: str = "admin"):
+        self.bot_name = bot_name
+
+    async def __call__(self, make_request, bot, method):
+        name = getattr(method, "__api_method__", type(method).__name__)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            telegram_errors.inc(bot=self.bot_name, method=name, error=type(e).__name__)
+            raise
+        finally:
+            telegram_latency.observe(time.perf_counter() - started, bot=self.bot_name, method=name)
+
+
+def _timed_operation(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            operation_errors.inc(operation=name, error=type(e).__name__)
+            raise
+        finally:
+            operation_latency.observe(time.perf_counter() - started, operation=name)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def _timed_generator(fn: Callable[..., AsyncIterator[Any]]) -> Callable[..., AsyncIterator[Any]]:
+    """Like _timed_operation for an async generator: one observation per iteration,
+    counting only the time spent inside the generator, not in the consumer's loop body"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        generator = fn(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await generator.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    operation_errors.inc(operation=name, error=type(e).__name__)
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield item
+        finally:
+            await generator.aclose()
+            operation_latency.observe(elapsed, operation=name)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def instrument_operations(namespace: Dict[str, Any]) -> None:
+    """Wrap every public coroutine function and async generator defined in a module's namespace"""
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (name.startswith("_") or not callable(value) or getattr(value, "__module__", None) != module
+                or getattr(value, "__metrics_wrapped__", False)):
+            continue
+        if inspect.iscoroutinefunction(value):
+            namespace[name] = _timed_operation(value)
+        elif inspect.isasyncgenfunction(value):
+            namespace[name] = _timed_generator(value)
+
+
+def summarize(histogram: Histogram, errors: Counter, limit: int = 8) -> List[str]:
+    """Lines of "name: count, p50/p95, errors" for the series with the most total time"""
+    error_counts: Dict[Labels, float] = {}
+    for labels, value in errors.values.items():
+        key = tuple(pair for pair in labels if pair[0] != "error")
+        error_counts[key] = error_counts.get(key, 0) + value
+    busiest = sorted(histogram.series.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    lines = []
+    for labels, (_, total, _) in busiest:
+        name = "/".join(value for _, value in labels)
+        p50 = histogram.quantile(0.5, labels) * 1000
+        p95 = histogram.quantile(0.95, labels) * 1000
+        line = f"• {name}: {total} × p50 {p50:.1f} / p95 {p95:.1f} мс"
+        failed = int(error_counts.get(labels, 0))
+        if failed:
+            line += f", ошибок {failed}"
+        lines.append(line)
+    return lines
+
+
+async def _metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+def create_metrics_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_endpoint)
+    return app
+
+
+async def start_metrics_server(host: str, port: int) -> Optional[web.AppRunner]:
+    """Serve GET /metrics on host:port; None if the port can't be bound"""
+    runner = web.AppRunner(create_metrics_app())
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        print(f"⚠️ Metrics server failed to start on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    print(f"📈 Metrics: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import socket
+from typing import Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from data.models import ClientNotification
+from data.operations import (
+    CHANGE_STREAM_UNSUPPORTED_CODES,
+    NOTIFICATION_LEASE,
+    claim_notifications,
+    finish_notifications,
+    renew_notification_lease,
+    watch_notifications,
+)
+from utils.sender import OutboundSender
+
+
+class NotificationDispatcher:
+    """Delivers pending client notifications (the `notifications` collection).
+
+    Each round leases a batch (see claim_notifications), sends it through an
+    OutboundSender (bounded concurrency, Telegram rate limits, RetryAfter) and
+    records the outcome with one bulk_write. Any number of dispatchers can run
+    against the same database; a notification is only sent by the worker
+    holding its lease.
+    """
+
+    def __init__(
+        self,
+        sender: OutboundSender,
+        batch_size: int = 50,
+        poll_interval: float = 30.0,
+        worker_id: Optional[str] = None,
+        lease_renew_interval: Optional[float] = None,
+    ):
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_renew_interval = lease_renew_interval or NOTIFICATION_LEASE.total_seconds() / 3
+        self._wakeup = asyncio.Event()
+
+    async def _send(self, notification: ClientNotification):
+        return await self.sender.call(
+            notification.user_id,
+            lambda: self.sender.bot.send_message(notification.user_id, notification.message),
+        )
+
+    async def _renew_lease(self, lease_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_renew_interval)
+            try:
+                await renew_notification_lease(lease_id)
+            except PyMongoError as e:
+                print(f"Failed to renew notification lease {lease_id}: {e}")
+
+    async def dispatch_batch(self) -> int:
+        """Claim, send and record one batch; returns how many were claimed."""
+        batch = await claim_notifications(self.worker_id, self.batch_size)
+        if not batch:
+            return 0
+        lease_id = batch[0].lease_id
+        # Rate limits can stretch a batch past NOTIFICATION_LEASE; keep the
+        # lease alive so no other worker takes the unsent rest over meanwhile
+        renewer = asyncio.create_task(self._renew_lease(lease_id))
+        try:
+            results = await asyncio.gather(*(self._send(n) for n in batch))
+        finally:
+            renewer.cancel()
+        sent: List[str] = []
+        failed: Dict[str, str] = {}
+        for notification, result in zip(batch, results):
+            if result.ok:
+                sent.append(notification.id)
+            else:
+                failed[notification.id] = result.error or "unknown error"
+                print(f"❌ Failed to send notification to user {notification.user_id}: {result.error}")
+        await finish_notifications(lease_id, sent, failed, {n.id: n.attempts for n in batch})
+        print(f"Sent {len(sent)}/{len(batch)} notifications")
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Dispatch batches until nothing is claimable; returns the total claimed."""
+        total = 0
+        while True:
+            claimed = await self.dispatch_batch()
+            total += claimed
+            if claimed < self.batch_size:
+                return total
+
+    async def _watch(self) -> None:
+        """Wake the dispatch loop on every inserted notification."""
+        while True:
+            try:
+                async with watch_notifications() as stream:
+                    print("📡 Notifications change stream is active")
+                    async for _ in stream:
+                        self._wakeup.set()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    print(f"⚠️ Change streams are not supported, polling every {self.poll_interval:g}s")
+                    return
+                print(f"Notifications change stream failed: {e}")
+            except PyMongoError as e:
+                print(f"Notifications change stream failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self) -> None:
+        """Deliver notifications until cancelled.
+
+        Woken by the change stream as notifications are inserted; every
+        poll_interval it also looks on its own, which picks up retries and
+        leases left behind by a crashed worker.
+        """
+        watcher = asyncio.create_task(self._watch())
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    await self.drain()
+                except PyMongoError as e:
+                    print(f"Error dispatching notifications: {e}")
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            watcher.cancel()
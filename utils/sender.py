@@ -0,0 +1,141 @@
+"""Rate-limited outbound Telegram sender.
+
+All bulk sends (new-order alerts, /broadcast, client notifications) go through
+one OutboundSender per bot so that Telegram's global and per-chat limits are
+respected in one place, slow chats don't hold up the rest, and RetryAfter is
+honoured instead of swallowed.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from data.config import (
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_SEND_CONCURRENCY,
+)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity` saved up."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def block_for(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (used for Telegram RetryAfter)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        """True when the bucket is full again, i.e. it can be dropped and recreated."""
+        now = time.monotonic()
+        return now >= self._blocked_until and self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+    async def acquire(self) -> None:
+        # The lock queues waiters FIFO, so messages to one chat keep their order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class SendResult:
+    """Outcome of delivering one message to one chat."""
+    chat_id: int
+    ok: bool
+    result: Any = None
+    error: Optional[str] = None
+    attempts: int = 1
+
+
+class OutboundSender:
+    """Sends Telegram requests with bounded concurrency and rate limiting."""
+
+    # Per-chat buckets are dropped once idle and this many are held
+    MAX_CHAT_BUCKETS = 1000
+
+    def __init__(
+        self,
+        bot: Bot,
+        concurrency: int = TELEGRAM_SEND_CONCURRENCY,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        chat_burst: float = TELEGRAM_CHAT_BURST,
+        max_attempts: int = 3,
+    ):
+        self.bot = bot
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHAT_BUCKETS:
+                for key in [k for k, b in self._chats.items() if b.idle]:
+                    del self._chats[key]
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    async def call(self, chat_id: int, request: Callable[[], Awaitable[Any]]) -> SendResult:
+        """Run `request()` (a Bot API call aimed at chat_id) under the rate limits.
+
+        RetryAfter pauses the chat (and the whole bot when Telegram asks for it)
+        and is retried; network/server errors are retried with backoff; any other
+        error is reported in the result without retrying.
+        """
+        chat_bucket = self._chat_bucket(chat_id)
+        attempt = 0
+        while True:
+            attempt += 1
+            await chat_bucket.acquire()
+            await self._global.acquire()
+            try:
+                async with self._semaphore:
+                    result = await request()
+                return SendResult(chat_id, True, result=result, attempts=attempt)
+            except TelegramRetryAfter as e:
+                chat_bucket.block_for(e.retry_after)
+                self._global.block_for(e.retry_after)
+                error = e
+            except (TelegramNetworkError, TelegramServerError) as e:
+                chat_bucket.block_for(0.5 * 2 ** (attempt - 1))
+                error = e
+            except Exception as e:
+                return SendResult(chat_id, False, error=str(e), attempts=attempt)
+            if attempt >= self.max_attempts:
+                return SendResult(chat_id, False, error=str(error), attempts=attempt)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> SendResult:
+        """Send one message under the rate limits."""
+        return await self.call(chat_id, lambda: self.bot.send_message(chat_id, text, **kwargs))
+
+    async def send_many(self, chat_ids: Iterable[int], text: str, **kwargs) -> List[SendResult]:
+        """Send the same message to several chats concurrently; one result per chat."""
+        return list(await asyncio.gather(*(self.send_message(chat_id, text, **kwargs) for chat_id in chat_ids)))
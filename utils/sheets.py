@@ -1,12 +1,19 @@
 import asyncio
 import json
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
 import aiohttp
 
-from data.config import SHEETS_WEBHOOK_URL
+from data.config import (
+    SHEETS_BACKFILL_INTERVAL,
+    SHEETS_BATCH_SIZE,
+    SHEETS_FLUSH_INTERVAL,
+    SHEETS_PAYLOAD,
+    SHEETS_WEBHOOK_URL,
+)
 from data.models import Order
+from data.operations import get_sheet_backlog, mark_orders_sheet_synced
 
 
 def _split_items(items: Dict[str, int]) -> Tuple[str, str]:
@@ -48,14 +55,192 @@ def build_row(order: Order) -> Dict[str, str]:
     }
 
 
-async def append_order_to_sheet(order: Order) -> bool:
-    if not SHEETS_WEBHOOK_URL:
-        return False
-    payload = build_row(order)
+def _response_error(content_type: str, text: str) -> Optional[str]:
+    """Error reported in a 2xx webhook response body, if any.
+
+    Apps Script answers 200 even when doPost throws: with an HTML error page, or
+    with whatever error JSON the script returns itself.
+    """
+    if content_type == "text/html":
+        return text.strip()[:200] or "HTML error page"
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(SHEETS_WEBHOOK_URL, json=payload, timeout=15) as resp:
-                return 200 <= resp.status < 300
-    except Exception:
+        body = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    if body.get("ok") is False or body.get("success") is False or str(body.get("status", "")).lower() == "error":
+        return str(body.get("error") or body.get("message") or body)
+    if body.get("error"):
+        return str(body["error"])
+    return None
+
+
+class SheetsSync:
+    """Background Google Sheets sync stage.
+
+    Orders are queued with `enqueue()` (never blocks the caller) and flushed by a
+    background task as one `{"rows": [...]}` POST per SHEETS_BATCH_SIZE rows or
+    SHEETS_FLUSH_INTERVAL seconds (or one single-row POST per order with
+    payload="row"), over a single shared HTTP session. Failed posts are retried
+    with exponential backoff; synced orders are then marked in one bulk_write.
+    The queue lives in memory only, so orders left unsynced are re-queued from
+    the database every `backfill_interval` seconds and the queue is flushed by
+    `stop()`.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = SHEETS_WEBHOOK_URL,
+        batch_size: int = SHEETS_BATCH_SIZE,
+        flush_interval: float = SHEETS_FLUSH_INTERVAL,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+        max_pending: int = 5000,
+        payload: str = SHEETS_PAYLOAD,
+        backfill_interval: float = SHEETS_BACKFILL_INTERVAL,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.payload = payload
+        self.backfill_interval = backfill_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._pending: Set[str] = set()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._batch: List[Tuple[str, Dict[str, str]]] = []
+        self._inflight: Optional[asyncio.Future] = None
+
+    def enqueue(self, order: Order) -> bool:
+        """Queue an order for syncing; False if disabled, already queued or the queue is full."""
+        if not self.url or order.sheet_synced or order.id in self._pending:
+            return False
+        try:
+            self._queue.put_nowait((order.id, build_row(order)))
+        except asyncio.QueueFull:
+            print(f"Sheets queue is full, order {order.id} not synced")
+            return False
+        self._pending.add(order.id)
+        return True
+
+    def start(self) -> None:
+        if self.url and self._task is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+            self._task = asyncio.create_task(self._run())
+            if self.backfill_interval > 0:
+                self._backfill_task = asyncio.create_task(self._backfill_loop())
+
+    async def stop(self) -> None:
+        """Finish the batch being posted, flush whatever is queued and close the HTTP session."""
+        for task in (self._backfill_task, self._task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._backfill_task = self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        while self._batch or not self._queue.empty():
+            batch, self._batch = self._batch, []
+            batch += self._drain(self.batch_size - len(batch))
+            await self._flush(batch, max_attempts=2)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _drain(self, limit: int) -> List[Tuple[str, Dict[str, str]]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collected on the instance so stop() can flush a batch still being filled
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            # Shielded so stop() can wait for a post in progress instead of
+            # cutting it off (and losing or duplicating its rows)
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def backfill(self) -> int:
+        """Queue announced orders that never reached the sheet; returns how many were queued."""
+        queued = 0
+        for order in await get_sheet_backlog():
+            if self.enqueue(order):
+                queued += 1
+        return queued
+
+    async def _backfill_loop(self) -> None:
+        while True:
+            try:
+                queued = await self.backfill()
+                if queued:
+                    print(f"Re-queued {queued} orders not yet synced to Sheets")
+            except Exception as e:
+                print(f"Sheets backfill failed: {e}")
+            await asyncio.sleep(self.backfill_interval)
+
+    async def _post(self, rows: List[Dict[str, str]]) -> bool:
+        # Single-row mode only ever posts batches of one (see _flush)
+        body = rows[0] if self.payload == "row" else {"rows": rows}
+        try:
+            async with self._session.post(self.url, json=body) as resp:
+                text = await resp.text()
+                if not 200 <= resp.status < 300:
+                    print(f"Sheets webhook returned HTTP {resp.status}")
+                    return False
+                error = _response_error(resp.content_type, text)
+                if error:
+                    print(f"Sheets webhook reported an error: {error}")
+                    return False
+                return True
+        except Exception as e:
+            print(f"Sheets webhook error: {e}")
+            return False
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, str]]], max_attempts: Optional[int] = None) -> bool:
+        if self.payload == "row" and len(batch) > 1:
+            # One row per request, so a failure never re-sends rows already appended
+            results = [await self._flush([entry], max_attempts) for entry in batch]
+            return all(results)
+        order_ids = [order_id for order_id, _ in batch]
+        rows = [row for _, row in batch]
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            if await self._post(rows):
+                self._pending.difference_update(order_ids)
+                try:
+                    await mark_orders_sheet_synced(order_ids)
+                except Exception as e:
+                    print(f"Failed to mark {len(order_ids)} orders as synced to Sheets: {e}")
+                return True
+            if attempt + 1 < attempts:
+                await asyncio.sleep(min(60, self.backoff * 2 ** attempt))
+        # Leave them unsynced (sheet_synced stays false) and free the queue slots
+        self._pending.difference_update(order_ids)
+        print(f"Failed to sync {len(order_ids)} orders to Sheets after {attempts} attempts")
         return False
 
+
+# Global sync stage, started in bot/main.py
+sheets_sync = SheetsSync()
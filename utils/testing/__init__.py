@@ -0,0 +1,5 @@
+"""In-memory stand-ins for MongoDB and the Telegram Bot API.
+
+Used by the test suite and by the offline modes of scripts/load_test.py,
+scripts/benchmark_operations.py and scripts/benchmark_client_notify.py.
+"""
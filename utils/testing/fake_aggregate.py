@@ -0,0 +1,322 @@
+"""Evaluates the aggregation pipelines data.operations builds, without a mongod.
+
+Only the stages and expression operators those pipelines use are implemented,
+following MongoDB's documented semantics: BSON type names and equality (false
+is not 0), aggregation truthiness, and $convert's rules for "long" and
+"string". Anything else raises NotImplementedError, so a pipeline that grows a
+new operator fails loudly instead of being checked against a guess.
+"""
+import copy
+import math
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from bson import Decimal128, ObjectId
+from pymongo.errors import OperationFailure
+
+from utils.testing.fake_mongo import _MISSING, _get_path, _sort_key, match
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Whitespace $trim removes when no chars are given
+TRIM_WHITESPACE = ("\u0000\u0020\u0009\u000a\u000b\u000c\u000d\u00a0\u1680"
+                   + "".join(chr(c) for c in range(0x2000, 0x200b)) + "\u2028\u2029\u202f\u205f\u3000")
+
+
+class ConversionError(Exception):
+    pass
+
+
+def bson_type(value: Any) -> str:
+    if value is _MISSING:
+        return "missing"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2 ** 31 <= value < 2 ** 31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    raise NotImplementedError(type(value))
+
+
+def _is_number(value: Any) -> bool:
+    return bson_type(value) in ("int", "long", "double", "decimal")
+
+
+def _number(value: Any):
+    return value.to_decimal() if isinstance(value, Decimal128) else value
+
+
+def bson_equal(value: Any, other: Any) -> bool:
+    """Equality as $eq/$in see it: numbers by value across types, otherwise same type and value"""
+    if value is _MISSING:
+        value = None
+    if other is _MISSING:
+        other = None
+    if _is_number(value) and _is_number(other):
+        return _number(value) == _number(other)
+    if bson_type(value) != bson_type(other):
+        return False
+    if isinstance(value, dict):
+        return list(value) == list(other) and all(bson_equal(value[k], other[k]) for k in value)
+    if isinstance(value, list):
+        return len(value) == len(other) and all(bson_equal(a, b) for a, b in zip(value, other))
+    return value == other
+
+
+def truthy(value: Any) -> bool:
+    if value is _MISSING or value is None or value is False:
+        return False
+    if _is_number(value):
+        return _number(value) != 0
+    return True
+
+
+def _to_long(value: Any) -> int:
+    kind = bson_type(value)
+    if kind == "bool":
+        return int(value)
+    if kind in ("int", "long"):
+        return value
+    if kind in ("double", "decimal"):
+        number = _number(value)
+        if isinstance(number, float) and (math.isnan(number) or math.isinf(number)):
+            raise ConversionError(value)
+        if isinstance(number, Decimal) and not number.is_finite():
+            raise ConversionError(value)
+        result = int(number)
+    elif kind == "string":
+        # Base-10 digits with an optional "-"; no whitespace, "+" or underscores
+        if not re.fullmatch(r"-?[0-9]+", value):
+            raise ConversionError(value)
+        result = int(value)
+    elif kind == "date":
+        result = int(value.timestamp() * 1000)
+    else:
+        raise ConversionError(value)
+    if not INT64_MIN <= result <= INT64_MAX:
+        raise ConversionError(value)
+    return result
+
+
+def _to_string(value: Any) -> str:
+    kind = bson_type(value)
+    if kind == "string":
+        return value
+    if kind == "bool":
+        return "true" if value else "false"
+    if kind in ("int", "long", "decimal", "objectId"):
+        return str(value)
+    if kind == "double":
+        return repr(value)
+    if kind == "date":
+        return value.isoformat(timespec="milliseconds") + "Z"
+    raise ConversionError(value)
+
+
+def _convert(spec: dict, doc: dict, variables: dict) -> Any:
+    value = evaluate(spec["input"], doc, variables)
+    if value is _MISSING or value is None:
+        return evaluate(spec["onNull"], doc, variables) if "onNull" in spec else None
+    converter = {"long": _to_long, "string": _to_string}.get(spec["to"])
+    if converter is None:
+        raise NotImplementedError(f"$convert to {spec['to']}")
+    try:
+        return converter(value)
+    except ConversionError:
+        if "onError" in spec:
+            return evaluate(spec["onError"], doc, variables)
+        raise OperationFailure(f"Failed to parse {value!r} as {spec['to']}", code=241)
+
+
+def _string_arg(value: Any, op: str) -> Optional[str]:
+    if value is _MISSING or value is None:
+        return None
+    if not isinstance(value, str):
+        raise OperationFailure(f"{op} requires a string, found {bson_type(value)}")
+    return value
+
+
+def evaluate(expr: Any, doc: dict, variables: Optional[Dict[str, Any]] = None) -> Any:
+    """Value of an aggregation expression for one document"""
+    variables = variables or {}
+    if isinstance(expr, str) and expr.startswith("$$"):
+        name, _, path = expr[2:].partition(".")
+        value = variables[name]
+        return _get_path(value, path) if path else value
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get_path(doc, expr[1:])
+    if isinstance(expr, list):
+        return [evaluate(e, doc, variables) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        out = {}
+        for key, sub in expr.items():
+            value = evaluate(sub, doc, variables)
+            if value is not _MISSING:
+                out[key] = value
+        return out
+
+    op, arg = next(iter(expr.items()))
+
+    def ev(sub):
+        return evaluate(sub, doc, variables)
+
+    if op == "$literal":
+        return copy.deepcopy(arg)
+    if op == "$let":
+        scope = dict(variables)
+        scope.update({name: ev(sub) for name, sub in arg["vars"].items()})
+        return evaluate(arg["in"], doc, scope)
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return ev(arg[1]) if truthy(ev(arg[0])) else ev(arg[2])
+    if op == "$ifNull":
+        for sub in arg:
+            value = ev(sub)
+            if value is not _MISSING and value is not None:
+                return value
+        return value
+    if op == "$eq":
+        return bson_equal(ev(arg[0]), ev(arg[1]))
+    if op == "$in":
+        value, array = ev(arg[0]), ev(arg[1])
+        if not isinstance(array, list):
+            raise OperationFailure("$in requires an array as a second argument")
+        return any(bson_equal(value, item) for item in array)
+    if op == "$not":
+        return not truthy(ev(arg[0] if isinstance(arg, list) else arg))
+    if op == "$convert":
+        return _convert(arg, doc, variables)
+    if op == "$type":
+        return bson_type(ev(arg))
+    if op == "$toLower":
+        value = ev(arg)
+        return "" if value is _MISSING or value is None else _to_string(value).lower()
+    if op == "$trim":
+        value = _string_arg(ev(arg["input"]), op)
+        chars = ev(arg["chars"]) if "chars" in arg else TRIM_WHITESPACE
+        return None if value is None else value.strip(chars)
+    if op == "$regexMatch":
+        value = _string_arg(ev(arg["input"]), op)
+        return value is not None and re.search(arg["regex"], value) is not None
+    if op == "$replaceAll":
+        value = _string_arg(ev(arg["input"]), op)
+        return None if value is None else value.replace(ev(arg["find"]), ev(arg["replacement"]))
+    if op == "$substrCP":
+        value = _string_arg(ev(arg[0]), op) or ""
+        start, length = ev(arg[1]), ev(arg[2])
+        return value[start:start + length]
+    if op == "$strLenCP":
+        return len(_string_arg(ev(arg), op))
+    if op == "$objectToArray":
+        value = ev(arg)
+        if value is _MISSING or value is None:
+            return None
+        return [{"k": key, "v": item} for key, item in value.items()]
+    raise NotImplementedError(op)
+
+
+def _accumulate(op: str, values: List[Any]) -> Any:
+    if op == "$sum":
+        # Non-numeric values (null, strings, ...) are ignored
+        return sum(_number(v) for v in values if _is_number(v))
+    raise NotImplementedError(op)
+
+
+def _stage(docs: List[dict], stage: dict) -> List[dict]:
+    (name, spec), = stage.items()
+    if name == "$match":
+        return [d for d in docs if match(d, spec)]
+    if name == "$project":
+        out = []
+        for doc in docs:
+            projected = {"_id": doc["_id"]} if spec.get("_id", 1) and "_id" in doc else {}
+            for field, sub in spec.items():
+                if field == "_id":
+                    continue
+                value = _get_path(doc, field) if sub in (1, True) else evaluate(sub, doc)
+                if value is not _MISSING:
+                    projected[field] = value
+            out.append(projected)
+        return out
+    if name == "$unwind":
+        field = spec[1:]
+        out = []
+        for doc in docs:
+            value = _get_path(doc, field)
+            if value is _MISSING or value is None or value == []:
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                out.append({**doc, field: item})
+        return out
+    if name == "$group":
+        groups: List[tuple] = []
+        for doc in docs:
+            key = evaluate(spec["_id"], doc)
+            key = None if key is _MISSING else key
+            for existing, members in groups:
+                if bson_equal(existing, key):
+                    members.append(doc)
+                    break
+            else:
+                groups.append((key, [doc]))
+        out = []
+        for key, members in groups:
+            result = {"_id": key}
+            for field, acc in spec.items():
+                if field != "_id":
+                    (op, sub), = acc.items()
+                    result[field] = _accumulate(op, [evaluate(sub, d) for d in members])
+            out.append(result)
+        return out
+    if name == "$sort":
+        return sorted(docs, key=_sort_key(list(spec.items())))
+    if name == "$limit":
+        return docs[:spec]
+    if name == "$facet":
+        return [{field: run_pipeline(docs, sub) for field, sub in spec.items()}]
+    raise NotImplementedError(name)
+
+
+def run_pipeline(docs: List[dict], pipeline: List[dict]) -> List[dict]:
+    """Output documents of `pipeline` over `docs` (which are not modified)"""
+    docs = copy.deepcopy(docs)
+    for stage in pipeline:
+        docs = _stage(docs, stage)
+    return docs
+
+
+class FakeAggregateCursor:
+    def __init__(self, docs: List[dict]):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs[:length] if length else list(self._docs)
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
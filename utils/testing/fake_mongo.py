@@ -0,0 +1,598 @@
+"""In-memory stand-in for the parts of Motor that data.operations uses.
+
+Only the query/update operators used by the bot are implemented. Change
+streams behave like a replica set unless ``supports_change_streams`` is off,
+in which case ``watch()`` fails the way a standalone mongod does.
+``aggregate()`` fails unless ``supports_aggregation`` is on, in which case the
+pipeline runs through utils.testing.fake_aggregate. With ``record_queries`` on,
+the shape of every filter issued from outside this package is collected in
+``queries`` (tests/test_check_indexes.py compares them with the index check).
+"""
+import asyncio
+import copy
+import json
+import itertools
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from data.query_log import _shape
+
+_MISSING = object()
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return _MISSING
+    return doc
+
+
+def _caller_module() -> str:
+    """Module of the innermost frame outside utils.testing, i.e. the code that issued the query"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith("utils.testing"):
+        frame = frame.f_back
+    return frame.f_globals.get("__name__", "") if frame is not None else ""
+
+
+def _set_path(doc: dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _norm(value: Any) -> Any:
+    # Enums (OrderStatus) compare by value, like BSON encoding does
+    return getattr(value, "value", value)
+
+
+def _bson_value(value: Any) -> Any:
+    # Stored like BSON: enums by value, datetimes truncated to milliseconds
+    value = _norm(value)
+    if isinstance(value, datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+def _compare(value: Any, other: Any) -> Optional[int]:
+    value, other = _norm(value), _norm(other)
+    try:
+        return (value > other) - (value < other)
+    except TypeError:
+        return None
+
+
+def _match_op(value: Any, op: str, arg: Any) -> bool:
+    if op == "$eq":
+        return _match_value(value, arg)
+    if op == "$ne":
+        return not _match_value(value, arg)
+    if op == "$in":
+        return any(_match_value(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_match_value(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if value is _MISSING or value is None:
+            return False
+        cmp = _compare(value, arg)
+        if cmp is None:
+            return False
+        return {"$gt": cmp > 0, "$gte": cmp >= 0, "$lt": cmp < 0, "$lte": cmp <= 0}[op]
+    raise NotImplementedError(op)
+
+
+def _match_value(value: Any, cond: Any) -> bool:
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        return all(_match_op(value, op, arg) for op, arg in cond.items())
+    if value is _MISSING:
+        return cond is None
+    if isinstance(value, list) and not isinstance(cond, list):
+        return any(_norm(v) == _norm(cond) for v in value)
+    return _norm(value) == _norm(cond)
+
+
+def match(doc: dict, flt: Optional[dict]) -> bool:
+    for key, cond in (flt or {}).items():
+        if key == "$or":
+            if not any(match(doc, sub) for sub in cond):
+                return False
+        elif key == "$and":
+            if not all(match(doc, sub) for sub in cond):
+                return False
+        elif not _match_value(_get_path(doc, key), cond):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    out = copy.deepcopy(doc)
+    for k, v in projection.items():
+        if not v:
+            out.pop(k, None)
+    return out
+
+
+def _sort_key(spec):
+    def key(doc):
+        parts = []
+        for field, direction in spec:
+            value = _norm(_get_path(doc, field))
+            missing = value is _MISSING or value is None
+            parts.append(_Ordered(missing, None if missing else value, direction))
+        return parts
+    return key
+
+
+class _Ordered:
+    __slots__ = ("missing", "value", "direction")
+
+    def __init__(self, missing, value, direction):
+        self.missing, self.value, self.direction = missing, value, direction
+
+    def __lt__(self, other):
+        a, b = (self, other) if self.direction > 0 else (other, self)
+        if a.missing or b.missing:
+            # null/missing sorts first in ascending order
+            return a.missing and not b.missing
+        return a.value < b.value
+
+    def __eq__(self, other):
+        return self.missing == other.missing and self.value == other.value
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class BulkWriteResult:
+    def __init__(self, inserted_count=0, matched_count=0, modified_count=0, upserted_count=0):
+        self.inserted_count = inserted_count
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_count = upserted_count
+
+
+class FakeCursor:
+    def __init__(self, collection, flt, projection):
+        self._collection = collection
+        self._filter = flt
+        self._projection = projection
+        self._sort = []
+        self._limit = 0
+        self._skip = 0
+        self._batch_size = 0
+        self._iter = None
+        self._yielded = 0
+
+    def sort(self, key, direction=None):
+        if isinstance(key, (list, tuple)):
+            self._sort = list(key)
+        else:
+            self._sort = [(key, direction or 1)]
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def batch_size(self, n):
+        self._batch_size = n
+        return self
+
+    def _results(self) -> List[dict]:
+        docs = [d for d in self._collection.docs if match(d, self._filter)]
+        if self._sort:
+            docs.sort(key=_sort_key(self._sort))
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(d, self._projection) for d in docs]
+
+    def __aiter__(self):
+        self._collection.database.count_op("find", self._collection.name)
+        self._collection.database.record_query(self._collection.name, self._filter)
+        self._iter = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        # Yield like a network round trip would, so concurrent callers interleave
+        await asyncio.sleep(0)
+        try:
+            doc = next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+        # Every further batch costs a getMore round trip, as on a real server
+        if self._batch_size and self._yielded and self._yielded % self._batch_size == 0:
+            self._collection.database.count_op("getMore", self._collection.name)
+        self._yielded += 1
+        return doc
+
+    async def to_list(self, length=None):
+        self._collection.database.count_op("find", self._collection.name)
+        self._collection.database.record_query(self._collection.name, self._filter)
+        docs = self._results()
+        return docs[:length] if length else docs
+
+
+class FakeChangeStream:
+    def __init__(self, collection, pipeline, resume_after):
+        self._collection = collection
+        self._match = {}
+        for stage in pipeline or []:
+            self._match.update(stage.get("$match", {}))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.resume_token = resume_after
+        if resume_after is not None:
+            for event in collection.database.events:
+                if event["_id"]["_data"] > resume_after["_data"]:
+                    self._offer(event)
+
+    def _offer(self, event):
+        if event["ns"]["coll"] == self._collection.name and match(event, self._match):
+            self._queue.put_nowait(copy.deepcopy(event))
+
+    async def __aenter__(self):
+        database = self._collection.database
+        if not database.supports_change_streams:
+            raise OperationFailure(
+                "The $changeStream stage is only supported on replica sets",
+                code=40573,
+            )
+        database.streams.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self in self._collection.database.streams:
+            self._collection.database.streams.remove(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._queue.get()
+        self.resume_token = event["_id"]
+        return event
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.docs: List[dict] = []
+        self.indexes: Dict[str, dict] = {}
+
+    # -- helpers ---------------------------------------------------------
+    def _check_unique(self, doc, ignore=None):
+        for index in self.indexes.values():
+            if not index.get("unique"):
+                continue
+            fields = [f for f, _ in index["key"]]
+            values = [_get_path(doc, f) for f in fields]
+            for other in self.docs:
+                if other is not ignore and [_get_path(other, f) for f in fields] == values:
+                    raise DuplicateKeyError(f"E11000 duplicate key on {index['name']}")
+
+    def _apply_update(self, doc, update, inserting=False):
+        updated = {}
+        for op, fields in update.items():
+            for path, value in fields.items():
+                if op == "$set" or (op == "$setOnInsert" and inserting):
+                    _set_path(doc, path, copy.deepcopy(_norm(value)))
+                    updated[path] = _norm(value)
+                elif op == "$inc":
+                    current = _get_path(doc, path)
+                    new_value = (0 if current is _MISSING else current) + value
+                    _set_path(doc, path, new_value)
+                    updated[path] = new_value
+                elif op in ("$max", "$min"):
+                    current = _get_path(doc, path)
+                    cmp = None if current is _MISSING else _compare(value, current)
+                    if cmp is None or (cmp > 0 if op == "$max" else cmp < 0):
+                        _set_path(doc, path, value)
+                        updated[path] = value
+                elif op == "$unset":
+                    _unset_path(doc, path)
+                elif op == "$addToSet":
+                    current = _get_path(doc, path)
+                    values = list(current) if current is not _MISSING else []
+                    for item in value["$each"] if isinstance(value, dict) and "$each" in value else [value]:
+                        if _norm(item) not in values:
+                            values.append(_norm(item))
+                    _set_path(doc, path, values)
+                    updated[path] = values
+                elif op == "$setOnInsert":
+                    continue
+                else:
+                    raise NotImplementedError(op)
+        return updated
+
+    def _emit(self, op_type, doc, updated_fields=None):
+        database = self.database
+        event = {
+            "_id": {"_data": f"{next(database.event_seq):016d}"},
+            "operationType": op_type,
+            "ns": {"db": database.name, "coll": self.name},
+            "documentKey": {"_id": doc["_id"]},
+            "fullDocument": copy.deepcopy(doc),
+            "clusterTime": datetime.utcnow(),
+        }
+        if updated_fields is not None:
+            event["updateDescription"] = {"updatedFields": copy.deepcopy(updated_fields), "removedFields": []}
+        database.events.append(event)
+        for stream in list(database.streams):
+            stream._offer(event)
+
+    # -- API -------------------------------------------------------------
+    def find(self, flt=None, projection=None):
+        return FakeCursor(self, flt, projection)
+
+    async def find_one(self, flt=None, projection=None, sort=None):
+        self.database.count_op("find", self.name)
+        self.database.record_query(self.name, flt)
+        cursor = FakeCursor(self, flt, projection)
+        if sort:
+            cursor.sort(sort)
+        docs = cursor.limit(1)._results()
+        return docs[0] if docs else None
+
+    async def count_documents(self, flt, limit=0):
+        self.database.count_op("count", self.name)
+        self.database.record_query(self.name, flt)
+        n = sum(1 for d in self.docs if match(d, flt))
+        return min(n, limit) if limit else n
+
+    async def distinct(self, key, flt=None):
+        self.database.count_op("distinct", self.name)
+        self.database.record_query(self.name, flt)
+        values = []
+        for doc in self.docs:
+            value = _get_path(doc, key)
+            if match(doc, flt) and value is not _MISSING and value is not None and value not in values:
+                values.append(value)
+        return values
+
+    async def insert_one(self, doc):
+        self.database.count_op("insert", self.name)
+        doc = {k: _bson_value(v) for k, v in copy.deepcopy(doc).items()}
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(doc)
+        self._emit("insert", doc)
+        return InsertOneResult(doc["_id"])
+
+    async def insert_many(self, docs):
+        return [(await self.insert_one(d)).inserted_id for d in docs]
+
+    def load(self, docs) -> int:
+        """Bulk-load documents without change events or op counts (benchmark seeding)"""
+        count = 0
+        for doc in docs:
+            doc = {k: _bson_value(v) for k, v in doc.items()}
+            doc.setdefault("_id", ObjectId())
+            self.docs.append(doc)
+            count += 1
+        return count
+
+    def _update(self, flt, update, upsert, many):
+        self.database.record_query(self.name, flt)
+        matched = modified = 0
+        upserted_id = None
+        for doc in [d for d in self.docs if match(d, flt)]:
+            matched += 1
+            before = copy.deepcopy(doc)
+            updated = self._apply_update(doc, update)
+            if doc != before:
+                self._check_unique(doc, ignore=doc)
+                modified += 1
+                self._emit("update", doc, updated)
+            if not many:
+                break
+        if not matched and upsert:
+            doc = {k: v for k, v in (flt or {}).items() if not k.startswith("$") and not isinstance(v, dict)}
+            self._apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._check_unique(doc)
+            self.docs.append(doc)
+            upserted_id = doc["_id"]
+            self._emit("insert", doc)
+        return UpdateResult(matched, modified, upserted_id)
+
+    async def update_one(self, flt, update, upsert=False):
+        self.database.count_op("update", self.name)
+        return self._update(flt, update, upsert, many=False)
+
+    async def update_many(self, flt, update, upsert=False):
+        self.database.count_op("update", self.name)
+        return self._update(flt, update, upsert, many=True)
+
+    async def find_one_and_update(self, flt, update, projection=None, sort=None,
+                                  upsert=False, return_document=False):
+        self.database.count_op("findAndModify", self.name)
+        self.database.record_query(self.name, flt)
+        cursor = FakeCursor(self, flt, None)
+        if sort:
+            cursor.sort(sort)
+        candidates = [d for d in self.docs if match(d, flt)]
+        if sort:
+            candidates.sort(key=_sort_key(cursor._sort))
+        if not candidates:
+            if upsert:
+                self._update(flt, update, True, many=False)
+                return _project(self.docs[-1], projection) if return_document else None
+            return None
+        doc = candidates[0]
+        before = copy.deepcopy(doc)
+        updated = self._apply_update(doc, update)
+        if doc != before:
+            self._emit("update", doc, updated)
+        return _project(doc if return_document else before, projection)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.database.count_op("bulkWrite", self.name)
+        result = BulkWriteResult()
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                doc = {k: _norm(v) for k, v in copy.deepcopy(request._doc).items()}
+                doc.setdefault("_id", ObjectId())
+                self._check_unique(doc)
+                self.docs.append(doc)
+                self._emit("insert", doc)
+                result.inserted_count += 1
+                continue
+            if kind not in ("UpdateOne", "UpdateMany"):
+                raise NotImplementedError(kind)
+            res = self._update(request._filter, request._doc, request._upsert, many=kind == "UpdateMany")
+            result.matched_count += res.matched_count
+            result.modified_count += res.modified_count
+            result.upserted_count += 1 if res.upserted_id is not None else 0
+        return result
+
+    async def delete_one(self, flt):
+        self.database.count_op("delete", self.name)
+        self.database.record_query(self.name, flt)
+        for i, doc in enumerate(self.docs):
+            if match(doc, flt):
+                del self.docs[i]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, flt):
+        self.database.count_op("delete", self.name)
+        self.database.record_query(self.name, flt)
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not match(d, flt)]
+        return DeleteResult(before - len(self.docs))
+
+    async def drop(self):
+        self.database.count_op("drop", self.name)
+        self.docs = []
+
+    async def rename(self, new_name, dropTarget=False):
+        self.database.count_op("renameCollection", self.name)
+        collections = self.database.collections
+        target = collections.get(new_name)
+        if target is not None and target.docs and not dropTarget:
+            raise OperationFailure("target namespace exists", code=48)
+        del collections[self.name]
+        self.name = new_name
+        collections[new_name] = self
+
+    def aggregate(self, pipeline, **kwargs):
+        # Callers are expected to fall back unless the database opts in to the
+        # evaluator for the pipelines data.operations builds (fake_aggregate)
+        if not self.database.supports_aggregation:
+            raise OperationFailure("aggregate is not supported by the in-memory stand-in", code=115)
+        from utils.testing.fake_aggregate import FakeAggregateCursor, run_pipeline
+        self.database.count_op("aggregate", self.name)
+        if pipeline and "$match" in pipeline[0]:
+            self.database.record_query(self.name, pipeline[0]["$match"])
+        return FakeAggregateCursor(run_pipeline(self.docs, pipeline))
+
+    async def create_indexes(self, models):
+        self.database.count_op("createIndexes", self.name)
+        names = []
+        for model in models:
+            spec = dict(model.document)
+            spec["key"] = list(spec["key"].items())
+            self.indexes[spec["name"]] = spec
+            self._check_unique_existing(spec)
+            names.append(spec["name"])
+        return names
+
+    def _check_unique_existing(self, spec):
+        if not spec.get("unique"):
+            return
+        seen = set()
+        for doc in self.docs:
+            values = tuple(repr(_get_path(doc, f)) for f, _ in spec["key"])
+            if values in seen:
+                del self.indexes[spec["name"]]
+                raise OperationFailure(f"E11000 duplicate key on {spec['name']}", code=11000)
+            seen.add(values)
+
+    def watch(self, pipeline=None, full_document=None, resume_after=None, **kwargs):
+        return FakeChangeStream(self, pipeline, resume_after)
+
+
+class FakeDatabase:
+    """Container of FakeCollections addressable by attribute, like Motor."""
+
+    def __init__(self, name="samsariya", supports_change_streams=True, supports_aggregation=False,
+                 record_queries=False):
+        self.name = name
+        self.supports_change_streams = supports_change_streams
+        self.supports_aggregation = supports_aggregation
+        self.collections: Dict[str, FakeCollection] = {}
+        self.events: List[dict] = []
+        self.streams: List[FakeChangeStream] = []
+        self.event_seq = itertools.count(1)
+        self.ops: Dict[str, int] = {}
+        self.record_queries = record_queries
+        # (issuing module, collection, filter shape as data.query_log renders it)
+        self.queries: Set[Tuple[str, str, str]] = set()
+
+    def count_op(self, op: str, collection: str) -> None:
+        key = f"{collection}.{op}"
+        self.ops[key] = self.ops.get(key, 0) + 1
+
+    def record_query(self, collection: str, flt: Optional[dict]) -> None:
+        if self.record_queries:
+            shape = json.dumps(_shape(flt or {}), ensure_ascii=False, separators=(",", ":"))
+            self.queries.add((_caller_module(), collection, shape))
+
+    def __getattr__(self, name) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
@@ -0,0 +1,95 @@
+"""Local stand-in for the Telegram Bot API, for tests, benchmarks and load runs.
+
+Serves `/bot<token>/<method>` like api.telegram.org and records every call.
+Point a Bot at it with `fake_telegram_session(server.url)`.
+"""
+import asyncio
+import itertools
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+# Syntactically valid tokens (aiogram validates the format)
+ADMIN_BOT_TOKEN = "123456:ADMIN-fake-token"
+CLIENT_BOT_TOKEN = "654321:CLIENT-fake-token"
+
+
+def fake_telegram_session(base_url: str, **kwargs) -> AiohttpSession:
+    return AiohttpSession(api=TelegramAPIServer.from_base(base_url), **kwargs)
+
+
+class FakeTelegramAPI:
+    """aiohttp server answering Bot API methods with minimal valid results."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: List[dict] = []
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def _message(self, payload: Dict) -> dict:
+        chat_id = int(payload.get("chat_id") or 0)
+        return {
+            "message_id": int(payload.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": payload.get("text") or payload.get("caption") or "",
+        }
+
+    def _result(self, method: str, payload: Dict):
+        method = method.lower()
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method in ("sendmessage", "editmessagetext", "sendphoto", "senddocument"):
+            message = self._message(payload)
+            if method == "sendphoto":
+                message["photo"] = [{"file_id": f"photo-{message['message_id']}",
+                                     "file_unique_id": f"u{message['message_id']}",
+                                     "width": 1, "height": 1}]
+            if method == "senddocument":
+                message["document"] = {"file_id": f"doc-{message['message_id']}",
+                                       "file_unique_id": f"d{message['message_id']}"}
+            return message
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if request.content_type.startswith("multipart/"):
+            payload = {}
+            async for part in (await request.multipart()):
+                payload[part.name] = (await part.read()).decode(errors="replace") if part.filename is None else part.filename
+        else:
+            payload = dict(await request.post()) or (await request.json() if request.can_read_body else {})
+        method = request.match_info["method"]
+        self.calls.append({"method": method, "payload": payload, "time": time.perf_counter(),
+                           "token": request.match_info["token"],
+                           "peer": request.transport.get_extra_info("peername")})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"ok": True, "result": self._result(method, payload)})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeTelegramAPI":
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.url = f"http://{bound_host}:{bound_port}"
+        return self
+
+    @property
+    def connections(self) -> int:
+        """Distinct client TCP connections seen (each one is a new handshake)."""
+        return len({c["peer"] for c in self.calls})
+
+    def calls_to(self, method: str) -> List[dict]:
+        return [c for c in self.calls if c["method"].lower() == method.lower()]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()